@@ -0,0 +1,52 @@
+# benchmark_sentiment.py
+import argparse
+import time
+
+from src.config import Config
+from src.db.handler import DatabaseHandler
+from src.analysis.metrics.scoring import ENGINES, create_scorer
+
+def load_corpus(args) -> list:
+   """Reference texts from a file (one per line) or sampled from comments"""
+   if args.file:
+       with open(args.file, encoding='utf-8') as f:
+           return [line.rstrip('\n') for line in f][:args.sample]
+
+   config = Config()
+   db_handler = DatabaseHandler(config.database)
+   with db_handler.get_read_connection() as conn:
+       with conn.cursor() as cur:
+           cur.execute("""
+               SELECT content FROM comments TABLESAMPLE SYSTEM (1)
+               WHERE content IS NOT NULL
+               LIMIT %s
+           """, (args.sample,))
+           return [row[0] for row in cur.fetchall()]
+
+def benchmark(texts: list, batch_size: int) -> None:
+   for engine in ENGINES:
+       scorer = create_scorer(engine)
+       started = time.perf_counter()
+       for i in range(0, len(texts), batch_size):
+           scorer.score_batch(texts[i:i + batch_size])
+       elapsed = time.perf_counter() - started
+       print(f"{engine:>8}: {len(texts) / elapsed:,.0f} texts/second")
+
+   agreement = create_scorer('lexicon').agreement(texts)
+   print(f"""
+Agreement with polarity_scores over {agreement['texts']} texts:
+Within +/-{agreement['tolerance']} compound: {agreement['within_tolerance']:.2%}
+Mean absolute error: {agreement['mean_abs_error']:.4f}
+Max absolute error: {agreement['max_abs_error']:.4f}""")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description='Sentiment engine benchmark')
+   parser.add_argument('--file', type=str,
+                      help='Reference corpus, one text per line (default: sample comments)')
+   parser.add_argument('--sample', type=int, default=50000,
+                      help='Number of texts to benchmark')
+   parser.add_argument('--batch-size', type=int, default=1000,
+                      help='Texts per scoring batch')
+   
+   args = parser.parse_args()
+   benchmark(load_corpus(args), args.batch_size)
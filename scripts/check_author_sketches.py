@@ -0,0 +1,98 @@
+# check_author_sketches.py
+import argparse
+import uuid
+from datetime import datetime, timedelta
+from src.config import Config
+from src.collector.sketches import (
+   AuthorSketches, DELETED_AUTHOR, SKETCH_STANDARD_ERROR, create_author_sketches
+)
+from src.db.handler import DatabaseHandler
+
+# Relative errors beyond this many standard errors are reported as failures
+TOLERANCE_SIGMAS = 4
+
+def relative_error(estimate: int, exact: int) -> float:
+   return abs(estimate - exact) / exact if exact else float(estimate)
+
+def check_synthetic(sketches: AuthorSketches, sizes: list) -> bool:
+   """Feed known numbers of distinct authors through a scratch sketch"""
+   limit = TOLERANCE_SIGMAS * SKETCH_STANDARD_ERROR
+   ok = True
+   print(f"Synthetic check, failing beyond {limit:.2%}:")
+   for size in sizes:
+      subreddit = f"sketch-check-{uuid.uuid4().hex[:8]}"
+      # Today, older days may already be past their retention
+      day = datetime.combine(datetime.now().date(), datetime.min.time())
+      rows = [{'author': f"user{i}", 'created_utc': day} for i in range(size)]
+      # Every author twice, duplicates must not count
+      for start in range(0, size, 10000):
+         sketches.add(subreddit, rows[start:start + 10000])
+         sketches.add(subreddit, rows[start:start + 10000])
+      estimate = sketches.count(subreddit, day, day + timedelta(days=1))
+      sketches.redis_client.delete(sketches._key(subreddit, day.strftime('%Y%m%d')))
+
+      error = relative_error(estimate, size)
+      ok &= error <= limit
+      print(f"  {size:>9} authors: estimate {estimate:>9}, error {error:.3%}")
+   return ok
+
+def check_database(sketches: AuthorSketches, db_handler: DatabaseHandler,
+                   start: datetime, end: datetime) -> bool:
+   """Compare each subreddit's sketch over [start, end) with COUNT(DISTINCT author)
+
+   Only content collected while sketches were enabled is in the sketches,
+   so use a range collected since then.
+   """
+   with db_handler.get_read_connection() as conn:
+      with conn.cursor() as cur:
+         cur.execute("""
+            SELECT s.name, COUNT(DISTINCT a.author)
+            FROM (
+               SELECT p.subreddit_id, p.author FROM posts p
+               WHERE p.created_utc >= %(start)s AND p.created_utc < %(end)s
+               UNION ALL
+               SELECT p.subreddit_id, c.author FROM comments c
+               JOIN posts p ON p.id = c.post_id
+               WHERE c.created_utc >= %(start)s AND c.created_utc < %(end)s
+            ) a
+            JOIN subreddits s ON s.id = a.subreddit_id
+            WHERE a.author IS NOT NULL AND a.author <> %(deleted)s
+            GROUP BY s.name
+            ORDER BY s.name
+         """, {'start': start, 'end': end, 'deleted': DELETED_AUTHOR})
+         exact_counts = cur.fetchall()
+
+   limit = TOLERANCE_SIGMAS * SKETCH_STANDARD_ERROR
+   ok = True
+   print(f"Database check {start:%Y-%m-%d} to {end:%Y-%m-%d}, failing beyond {limit:.2%}:")
+   for subreddit, exact in exact_counts:
+      estimate = sketches.count(subreddit, start, end)
+      error = relative_error(estimate, exact)
+      ok &= error <= limit
+      print(f"  r/{subreddit}: exact {exact}, estimate {estimate}, error {error:.3%}")
+   return ok
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(
+      description='Check distinct-author sketches against exact counts'
+   )
+   parser.add_argument('--sizes', type=int, nargs='+',
+                       default=[10, 100, 1000, 10000, 100000, 1000000],
+                       help='Synthetic distinct-author counts to check')
+   parser.add_argument('--database', action='store_true',
+                       help='Also compare with COUNT(DISTINCT author) from Postgres')
+   parser.add_argument('--days', type=int, default=7,
+                       help='Whole days, ending yesterday, for the database check')
+   args = parser.parse_args()
+
+   config = Config()
+   sketches = create_author_sketches(config.redis)
+   ok = check_synthetic(sketches, args.sizes)
+
+   if args.database:
+      today = datetime.combine(datetime.now().date(), datetime.min.time())
+      ok &= check_database(sketches, DatabaseHandler(config.database),
+                           today - timedelta(days=args.days), today)
+
+   print("OK" if ok else "FAILED")
+   raise SystemExit(0 if ok else 1)
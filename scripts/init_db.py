@@ -1,103 +1,71 @@
 # init_db.py
-import os
+import argparse
+import logging
 import psycopg2
-from dotenv import load_dotenv
+from src.config import Config
+from src.db.migrations import MigrationRunner
+from src.queue.factory import create_queue_manager
+
+def init_db(target=None):
+    # Config loads .env on import
+    config = Config().database
 
-def init_db():
-    # Load environment variables
-    load_dotenv()
-    
     # Default database connection for creating new database
     conn = psycopg2.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        port=os.getenv('DB_PORT', '5432'),
-        user=os.getenv('DB_USER', 'mm'),
-        password=os.getenv('DB_PASSWORD', ''),
+        host=config.host,
+        port=config.port,
+        user=config.user,
+        password=config.password,
         dbname='postgres'  # Connect to postgres database initially
     )
     conn.autocommit = True
-    
+
     try:
         with conn.cursor() as cur:
             # Create database if it doesn't exist
-            cur.execute("SELECT 1 FROM pg_database WHERE datname='reddit_analyzer'")
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (config.dbname,))
             if not cur.fetchone():
-                cur.execute("CREATE DATABASE reddit_analyzer")
-                print("Created database: reddit_analyzer")
+                cur.execute(f'CREATE DATABASE "{config.dbname}"')
+                print(f"Created database: {config.dbname}")
     except Exception as e:
         print(f"Error creating database: {str(e)}")
         return
     finally:
         conn.close()
 
-    # Connect to the reddit_analyzer database to create tables
+    # Create and evolve tables and indexes through versioned migrations
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', '5432'),
-            dbname='reddit_analyzer',
-            user=os.getenv('DB_USER', 'mm'),
-            password=os.getenv('DB_PASSWORD', '')
-        )
-        conn.autocommit = True
-        
-        with conn.cursor() as cur:
-            # Create tables
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS subreddits (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(50) UNIQUE NOT NULL,
-                    description TEXT,
-                    last_scan_time TIMESTAMP
-                );
-
-                CREATE TABLE IF NOT EXISTS posts (
-                    id VARCHAR(50) PRIMARY KEY,
-                    subreddit_id INTEGER REFERENCES subreddits(id),
-                    author VARCHAR(50),
-                    title TEXT,
-                    content TEXT,
-                    created_utc TIMESTAMP,
-                    score INTEGER,
-                    upvote_ratio FLOAT,
-                    is_deleted BOOLEAN DEFAULT FALSE,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                CREATE TABLE IF NOT EXISTS comments (
-                    id VARCHAR(50) PRIMARY KEY,
-                    post_id VARCHAR(50) REFERENCES posts(id),
-                    parent_comment_id VARCHAR(50) REFERENCES comments(id),
-                    author VARCHAR(50),
-                    content TEXT,
-                    created_utc TIMESTAMP,
-                    score INTEGER,
-                    is_deleted BOOLEAN DEFAULT FALSE,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                CREATE TABLE IF NOT EXISTS collection_progress (
-                    id SERIAL PRIMARY KEY,
-                    subreddit_name VARCHAR(50),
-                    last_collected_timestamp TIMESTAMP,
-                    last_post_id VARCHAR(50),
-                    status VARCHAR(20),
-                    worker_id UUID,
-                    started_at TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(subreddit_name, worker_id)
-                );
+        applied = MigrationRunner(config).migrate(target)
+        if applied:
+            print(f"Applied migrations: {', '.join(map(str, applied))}")
+        else:
+            print("Schema is up to date")
+    except Exception as e:
+        print(f"Error migrating schema: {str(e)}")
 
-                CREATE INDEX IF NOT EXISTS idx_posts_created_utc ON posts(created_utc);
-                CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
-                CREATE INDEX IF NOT EXISTS idx_collection_progress_worker ON collection_progress(worker_id);
-            """)
-            print("Successfully created all tables and indexes")
-            
+    # Convert tasks left in Redis by the earlier queue layout
+    try:
+        converted = create_queue_manager(Config().redis).convert_legacy_tasks()
+        if any(converted.values()):
+            print(f"Converted legacy queue data: {converted}")
     except Exception as e:
-        print(f"Error creating tables: {str(e)}")
-    finally:
-        conn.close()
+        print(f"Error converting queue data: {str(e)}")
+
+def show_status():
+    runner = MigrationRunner(Config().database)
+    applied = runner.applied()
+    for migration in runner.migrations:
+        state = 'applied' if migration.version in applied else 'pending'
+        print(f"{migration.version:>4}  {migration.name:<30} {state}")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Create or migrate the Reddit Analyzer database')
+    parser.add_argument('--target', type=int, help='Migrate up to this version only')
+    parser.add_argument('--status', action='store_true', help='List migrations and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.status:
+        show_status()
+    else:
+        init_db(args.target)
@@ -0,0 +1,61 @@
+# manage_partitions.py
+import argparse
+import logging
+from datetime import datetime
+from src.config import Config
+from src.db.handler import DatabaseHandler
+from src.db.migrations import MigrationRunner
+from src.db.partitions import PartitionManager, TABLE_COLUMNS, add_months, month_start
+
+def setup_logging():
+   logging.basicConfig(
+       level=logging.INFO,
+       format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+   )
+
+def list_partitions(partitions: PartitionManager):
+   for table in TABLE_COLUMNS:
+       print(f"\n{table}:")
+       for name, bound in partitions.list_partitions(table):
+           print(f"  {name}: {bound}")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description='Manage monthly posts/comments partitions')
+   subparsers = parser.add_subparsers(dest='command', required=True)
+
+   ensure = subparsers.add_parser('ensure', help='Create partitions up to N months ahead')
+   ensure.add_argument('--months-ahead', type=int, default=3)
+   ensure.add_argument('--since', type=lambda s: datetime.strptime(s, '%Y-%m-%d'),
+                      help='Also create partitions back to this date (YYYY-MM-DD)')
+
+   migrate = subparsers.add_parser('migrate', help='Convert plain tables to partitioned ones')
+   migrate.add_argument('--months-ahead', type=int, default=3)
+
+   retain = subparsers.add_parser('retain', help='Detach partitions older than N months')
+   retain.add_argument('--months', type=int, required=True,
+                      help='Number of months to keep, including the current one')
+   retain.add_argument('--drop', action='store_true', help='Drop detached partitions')
+
+   subparsers.add_parser('list', help='List partitions and their bounds')
+
+   args = parser.parse_args()
+   setup_logging()
+
+   config = Config()
+   db_handler = DatabaseHandler(config.database)
+   partitions = PartitionManager(db_handler)
+
+   if args.command == 'ensure':
+      created = partitions.ensure_partitions(args.months_ahead, since=args.since)
+      print(f"Created {created} partitions")
+   elif args.command == 'migrate':
+      partitions.migrate(args.months_ahead)
+      # Indexes added by migrations were left on the legacy tables
+      MigrationRunner(config.database).ensure_indexes()
+      print("Migration complete, set DB_PARTITIONED=true and drop the *_legacy tables once verified")
+   elif args.command == 'retain':
+      cutoff = add_months(month_start(datetime.utcnow()), 1 - args.months)
+      detached = partitions.detach_before(cutoff, drop=args.drop)
+      print(f"{'Dropped' if args.drop else 'Detached'} {len(detached)} partitions before {cutoff:%Y-%m}")
+   else:
+      list_partitions(partitions)
@@ -3,13 +3,15 @@ import logging
 from datetime import datetime, timedelta
 from reddit_analyzer.src.config import Config
 from reddit_analyzer.src.db.handler import DatabaseHandler
+from reddit_analyzer.src.db.rollups import RollupManager
+from reddit_analyzer.src.queue.factory import create_queue_manager
 
 def monitor_collectors():
    """Monitor active collectors and their progress"""
    config = Config()
    db_handler = DatabaseHandler(config.database)
    
-   with db_handler.get_connection() as conn:
+   with db_handler.get_read_connection() as conn:
        with conn.cursor() as cur:
            # Get active collectors
            cur.execute("""
@@ -37,32 +39,38 @@ Status: {collector[3]}
 Started: {collector[4]}
 Last Update: {collector[5]}
 ------------------------""")
-           
-           # Get collection statistics
-           cur.execute("""
-               SELECT 
-                   s.name as subreddit,
-                   COUNT(DISTINCT p.id) as post_count,
-                   COUNT(DISTINCT c.id) as comment_count,
-                   MAX(p.created_utc) as latest_post,
-                   MIN(p.created_utc) as earliest_post
-               FROM subreddits s
-               LEFT JOIN posts p ON s.id = p.subreddit_id
-               LEFT JOIN comments c ON p.id = c.post_id
-               GROUP BY s.name
-               ORDER BY s.name
-           """)
-           
-           stats = cur.fetchall()
-           
-           print("\nCollection Statistics:")
-           for stat in stats:
-               print(f"""
-Subreddit: {stat[0]}
-Posts: {stat[1]}
-Comments: {stat[2]}
-Date Range: {stat[4]} to {stat[3]}
+
+   # Collection statistics come from the hourly rollups instead of
+   # joining posts and comments
+   print("\nCollection Statistics:")
+   for stat in RollupManager(db_handler).subreddit_totals():
+       avg_sentiment = stat['avg_sentiment']
+       print(f"""
+Subreddit: {stat['subreddit']}
+Posts: {stat['post_count']}
+Comments: {stat['comment_count']}
+Average Sentiment: {f'{avg_sentiment:.3f}' if avg_sentiment is not None else '-'}
+Date Range: {stat['earliest_hour']} to {stat['latest_hour']}
+------------------------""")
+
+def monitor_queues(minutes: int = 15):
+   """Print queue depth, latency and throughput over the last few minutes"""
+   config = Config()
+   queue_manager = create_queue_manager(config.redis)
+
+   print(f"\nQueue Metrics (last {minutes} minutes):")
+   for queue_name, metrics in queue_manager.get_queue_metrics(minutes).items():
+       oldest = metrics['oldest_pending_age']
+       print(f"""
+Queue: {queue_name}
+Enqueued / Claimed: {metrics['enqueued']} / {metrics['claimed']}
+Completed: {metrics['completed']} ({metrics['completed_per_minute']:.1f}/min)
+Retry Rate: {metrics['retry_rate']:.1%}, Failure Rate: {metrics['failure_rate']:.1%}
+Wait p50/p95: {metrics['wait']['p50']}s / {metrics['wait']['p95']}s
+Processing p50/p95: {metrics['processing']['p50']}s / {metrics['processing']['p95']}s
+Oldest Pending: {f'{oldest:.0f}s' if oldest is not None else '-'}
 ------------------------""")
 
 if __name__ == "__main__":
    monitor_collectors()
+   monitor_queues()
@@ -0,0 +1,33 @@
+# rebuild_rollups.py
+import argparse
+import logging
+from datetime import datetime
+from src.config import Config
+from src.db.handler import DatabaseHandler
+from src.db.rollups import RollupManager
+
+def setup_logging():
+   logging.basicConfig(
+       level=logging.INFO,
+       format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+   )
+
+def parse_date(value: str) -> datetime:
+   return datetime.strptime(value, '%Y-%m-%d')
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(
+       description='Recompute hourly subreddit rollups from posts, comments and sentiment'
+   )
+   parser.add_argument('--start', type=parse_date, required=True,
+                      help='First day to rebuild (YYYY-MM-DD)')
+   parser.add_argument('--end', type=parse_date, default=datetime.utcnow(),
+                      help='Day to stop before (YYYY-MM-DD), default now')
+   parser.add_argument('--subreddit', help='Only rebuild this subreddit')
+   args = parser.parse_args()
+   setup_logging()
+
+   config = Config()
+   db_handler = DatabaseHandler(config.database)
+   written = RollupManager(db_handler).rebuild(args.start, args.end, subreddit=args.subreddit)
+   print(f"Rebuilt {written} hourly rollups")
@@ -1,13 +1,23 @@
 # run_analyzer.py
 import argparse
 import logging
-import time
+import os
+import signal
+import threading
 from datetime import datetime
 
+import redis
+
 from src.config import Config
-from src.db.handler import DatabaseHandler
+from src.db.handler import DatabaseHandler, NEW_CONTENT_CHANNEL
+from src.db.notify import NotificationListener
+from src.analysis.metrics.cache import SentimentCache
+from src.analysis.metrics.scoring import ENGINES
 from src.analysis.metrics.sentiment import SentimentAnalyzer
 
+# Idle waits back off up to this multiple of --sleep-time
+MAX_WAIT_MULTIPLIER = 12
+
 def setup_logging():
    logging.basicConfig(
        level=logging.INFO,
@@ -18,31 +28,86 @@ def setup_logging():
        ]
    )
 
-def run_analyzer(batch_size: int, sleep_time: int):
+def run_analyzer(batch_size: int, sleep_time: int, workers: int = 1,
+                cache_size: int = 100000, shared_cache: bool = False,
+                engine: str = 'vader'):
    """Run continuous sentiment analysis"""
    config = Config()
    db_handler = DatabaseHandler(config.database)
-   analyzer = SentimentAnalyzer(db_handler)
+
+   cache = None
+   if cache_size > 0:
+       redis_client = None
+       if shared_cache:
+           redis_client = redis.Redis(
+               host=config.redis.host,
+               port=config.redis.port,
+               db=config.redis.db
+           )
+       cache = SentimentCache(max_entries=cache_size, redis_client=redis_client,
+                              engine=engine)
+
+   analyzer = SentimentAnalyzer(db_handler, workers=workers, cache=cache, engine=engine)
+   listener = NotificationListener(config.database, NEW_CONTENT_CHANNEL)
+
+   stop_event = threading.Event()
+   def request_stop(signum, frame):
+       logging.info(f"Received signal {signum}, finishing in-flight batch")
+       stop_event.set()
+   signal.signal(signal.SIGTERM, request_stop)
+   signal.signal(signal.SIGINT, request_stop)
    
-   logging.info(f"Starting sentiment analysis with batch size {batch_size}")
+   logging.info(
+       f"Starting {engine} sentiment analysis with batch size {batch_size}, "
+       f"{workers} worker(s)"
+   )
    
-   while True:
-       try:
-           analyzer.process_batch(batch_size)
-           time.sleep(sleep_time)  # Wait between batches
-           
-       except Exception as e:
-           logging.error(f"Analyzer error: {str(e)}")
-           time.sleep(sleep_time * 2)  # Wait longer after error
+   # Collectors NOTIFY after committing new rows, so an idle analyzer
+   # blocks on the channel instead of polling. The wait still times out,
+   # growing up to max_wait while idle, to pick up expired claims and rows
+   # written by anything that doesn't notify.
+   max_wait = sleep_time * MAX_WAIT_MULTIPLIER
+   wait_time = sleep_time
+   try:
+       while not stop_event.is_set():
+           try:
+               # Drain everything pending before waiting for new content
+               processed = analyzer.process_available(batch_size, stop_event)
+               if processed:
+                   wait_time = sleep_time
+                   if cache:
+                       logging.info(f"Processed {processed} items, cache stats: {cache.stats()}")
+               if listener.wait(wait_time, stop_event):
+                   wait_time = sleep_time
+               else:
+                   wait_time = min(wait_time * 2, max_wait)
+               
+           except Exception as e:
+               logging.error(f"Analyzer error: {str(e)}")
+               stop_event.wait(sleep_time * 2)  # Wait longer after error
+   finally:
+       listener.close()
+       analyzer.close()
+       logging.info("Sentiment analyzer stopped")
 
 if __name__ == "__main__":
    parser = argparse.ArgumentParser(description='Reddit Sentiment Analyzer')
    parser.add_argument('--batch-size', type=int, default=100,
                       help='Number of items to process in each batch')
    parser.add_argument('--sleep-time', type=int, default=5,
-                      help='Seconds to sleep between batches')
+                      help='Seconds to wait for new content before re-checking')
+   parser.add_argument('--workers', type=int, default=1,
+                      help='Scoring processes to run (default: 1, in-process)')
+   parser.add_argument('--cache-size', type=int, default=100000,
+                      help='In-process sentiment cache entries, 0 disables caching')
+   parser.add_argument('--shared-cache', action='store_true',
+                      help='Share cached scores across analyzers through Redis')
+   parser.add_argument('--engine', choices=ENGINES,
+                      default=os.getenv('SENTIMENT_ENGINE', 'vader'),
+                      help='Scoring engine (default: $SENTIMENT_ENGINE or vader)')
    
    args = parser.parse_args()
    
    setup_logging()
-   run_analyzer(args.batch_size, args.sleep_time)
+   run_analyzer(args.batch_size, args.sleep_time, args.workers,
+                args.cache_size, args.shared_cache, args.engine)
@@ -2,9 +2,14 @@
 import argparse
 import logging
 from datetime import datetime, timedelta
+import redis
 from reddit_analyzer.src.config import Config
 from reddit_analyzer.src.collector.reddit import RedditCollector
+from reddit_analyzer.src.collector.sketches import create_author_sketches
 from reddit_analyzer.src.db.handler import DatabaseHandler
+from reddit_analyzer.src.db.partitions import PartitionManager
+from reddit_analyzer.src.queue.factory import create_queue_manager
+from reddit_analyzer.src.queue.scheduler import FairScheduler, SharedBudget
 
 def setup_logging():
    logging.basicConfig(
@@ -20,7 +25,17 @@ def run_collector(subreddits: list, start_date: datetime, end_date: datetime):
    """Run collector for specified subreddits"""
    config = Config()
    db_handler = DatabaseHandler(config.database)
-   collector = RedditCollector(config.reddit, db_handler)
+   # Draw from the budget queue workers use, so running both stays in limits
+   budget = SharedBudget(
+       redis.Redis(host=config.redis.host, port=config.redis.port, db=config.redis.db),
+       config.scheduler.budget_per_minute / 60.0
+   )
+   collector = RedditCollector(config.reddit, db_handler,
+                               author_sketches=create_author_sketches(config.redis),
+                               rate_limiter=budget)
+   if config.database.partitioned:
+       # Backfills can reach months before the ones kept ready by workers
+       PartitionManager(db_handler).ensure_partitions(since=start_date)
    
    for subreddit in subreddits:
        try:
@@ -34,6 +49,26 @@ def run_collector(subreddits: list, start_date: datetime, end_date: datetime):
            logging.info(f"Completed collection for r/{subreddit}")
        except Exception as e:
            logging.error(f"Failed to collect r/{subreddit}: {str(e)}")
+   collector.close()
+
+   logging.info(f"Connection pool stats: {db_handler.get_pool_stats()}")
+
+def enqueue_collection(subreddits: list, start_date: datetime, end_date: datetime):
+   """Queue subreddits for run_worker.py instead of collecting here
+
+   Each subreddit goes into its own scheduler flow, so workers dispatch
+   them by share and API budget rather than all at once.
+   """
+   config = Config()
+   scheduler = FairScheduler(create_queue_manager(config.redis), config.scheduler)
+   for subreddit in subreddits:
+       scheduler.submit('subreddit_collection', subreddit, [{
+           'type': 'subreddit_collection',
+           'subreddit': subreddit,
+           'start_date': start_date.isoformat(),
+           'end_date': end_date.isoformat()
+       }], dedupe_keys=[f"{subreddit}:{start_date.isoformat()}:{end_date.isoformat()}"])
+   logging.info(f"Submitted {len(subreddits)} subreddits for collection")
 
 if __name__ == "__main__":
    parser = argparse.ArgumentParser(description='Reddit Data Collector')
@@ -45,6 +80,8 @@ if __name__ == "__main__":
                       help='Start date (YYYY-MM-DD) - overrides days parameter')
    parser.add_argument('--end-date', type=str,
                       help='End date (YYYY-MM-DD) - defaults to yesterday')
+   parser.add_argument('--enqueue', action='store_true',
+                      help='Queue the subreddits for queue workers instead of collecting here')
    
    args = parser.parse_args()
    
@@ -64,4 +101,7 @@ if __name__ == "__main__":
    logging.info(f"Starting collection for subreddits: {args.subreddits}")
    logging.info(f"Date range: {start_date} to {end_date}")
    
-   run_collector(args.subreddits, start_date, end_date)
+   if args.enqueue:
+       enqueue_collection(args.subreddits, start_date, end_date)
+   else:
+       run_collector(args.subreddits, start_date, end_date)
@@ -0,0 +1,145 @@
+# run_worker.py
+import argparse
+import logging
+import os
+import signal
+from datetime import datetime
+
+import redis
+
+from src.analysis.metrics.scoring import ENGINES
+from src.config import Config
+from src.db.handler import DatabaseHandler
+from src.db.partitions import PartitionManager
+from src.queue.factory import create_queue_manager
+from src.queue.reaper import QueueReaper
+from src.queue.scheduler import FairScheduler, SharedBudget
+from src.queue.worker import QueueWorker
+
+# Queues with a handler, post_collection has no producer or task format yet
+WORKER_QUEUES = ('subreddit_collection', 'comment_collection', 'sentiment_analysis')
+
+def setup_logging():
+   logging.basicConfig(
+       level=logging.INFO,
+       format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+       handlers=[
+           logging.FileHandler('queue_worker.log'),
+           logging.StreamHandler()
+       ]
+   )
+
+def build_handlers(config: Config, db_handler: DatabaseHandler, queues: list,
+                  budget: SharedBudget, engine: str = 'vader',
+                  cache_size: int = 100000, shared_cache: bool = False) -> dict:
+   """Map each queue to a function running one of its tasks
+
+   Collectors take every API request from budget, shared by all workers.
+   Sentiment is scored with engine and cached as by run_analyzer.py.
+   """
+   handlers = {}
+
+   if 'subreddit_collection' in queues or 'comment_collection' in queues:
+       from src.collector.reddit import RedditCollector
+       from src.collector.sketches import create_author_sketches
+       collector = RedditCollector(config.reddit, db_handler,
+                                   author_sketches=create_author_sketches(config.redis),
+                                   rate_limiter=budget)
+
+       def collect_subreddit(task):
+           collector.collect_subreddit_posts(
+               subreddit_name=task['subreddit'],
+               start_date=datetime.fromisoformat(task['start_date']),
+               end_date=datetime.fromisoformat(task['end_date']),
+               batch_size=100
+           )
+
+       def collect_comments(task):
+           collector.collect_post_comments(task['post_id'])
+
+       handlers['subreddit_collection'] = collect_subreddit
+       handlers['comment_collection'] = collect_comments
+
+   if 'sentiment_analysis' in queues:
+       from src.analysis.metrics.cache import SentimentCache
+       from src.analysis.metrics.sentiment import SentimentAnalyzer
+       cache = None
+       if cache_size > 0:
+           redis_client = None
+           if shared_cache:
+               redis_client = redis.Redis(
+                   host=config.redis.host,
+                   port=config.redis.port,
+                   db=config.redis.db
+               )
+           cache = SentimentCache(max_entries=cache_size, redis_client=redis_client,
+                                  engine=engine)
+       analyzer = SentimentAnalyzer(db_handler, cache=cache, engine=engine)
+
+       def analyze_pending(task):
+           analyzer.process_available(int(task.get('batch_size', 100)))
+
+       handlers['sentiment_analysis'] = analyze_pending
+
+   return {queue: handlers[queue] for queue in queues}
+
+def run_worker(queues: list, concurrency: int, prefetch: int, claim_timeout: float,
+              engine: str = 'vader', cache_size: int = 100000, shared_cache: bool = False):
+   """Consume queued tasks until SIGTERM/SIGINT"""
+   config = Config()
+   db_handler = DatabaseHandler(config.database)
+   queue_manager = create_queue_manager(config.redis, claim_timeout=claim_timeout)
+   if config.database.partitioned:
+       PartitionManager(db_handler).ensure_partitions()
+
+   budget = SharedBudget(queue_manager.redis_client, config.scheduler.budget_per_minute / 60.0)
+   worker = QueueWorker(
+       queue_manager,
+       build_handlers(config, db_handler, queues, budget, engine, cache_size, shared_cache),
+       concurrency=concurrency,
+       prefetch=prefetch,
+       claim_timeout=claim_timeout
+   )
+
+   def request_stop(signum, frame):
+       logging.info(f"Received signal {signum}, draining in-flight tasks")
+       worker.stop()
+   signal.signal(signal.SIGTERM, request_stop)
+   signal.signal(signal.SIGINT, request_stop)
+
+   # Every worker also sweeps and dispatches; reaping is atomic and
+   # dispatch rounds are locked, so running several is safe
+   scheduler = FairScheduler(queue_manager, config.scheduler)
+   scheduler.start(queues)
+   try:
+       with QueueReaper(queue_manager, db_handler=db_handler):
+           worker.run()
+   finally:
+       scheduler.stop()
+
+   logging.info(f"Connection pool stats: {db_handler.get_pool_stats()}")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description='Reddit Analyzer Queue Worker')
+   parser.add_argument('--queues', nargs='+', choices=WORKER_QUEUES,
+                      default=['subreddit_collection', 'comment_collection'],
+                      help='Queues to consume, polled in the order given')
+   parser.add_argument('--concurrency', type=int, default=4,
+                      help='Tasks to run at once (default: 4)')
+   parser.add_argument('--prefetch', type=int, default=4,
+                      help='Tasks to claim ahead of free slots (default: 4)')
+   parser.add_argument('--claim-timeout', type=float, default=300,
+                      help='Seconds before a claim from a dead worker is reclaimed')
+   parser.add_argument('--engine', choices=ENGINES,
+                      default=os.getenv('SENTIMENT_ENGINE', 'vader'),
+                      help='Sentiment scoring engine (default: $SENTIMENT_ENGINE or vader)')
+   parser.add_argument('--cache-size', type=int, default=100000,
+                      help='In-process sentiment cache entries, 0 disables caching')
+   parser.add_argument('--shared-cache', action='store_true',
+                      help='Share cached sentiment scores across processes through Redis')
+
+   args = parser.parse_args()
+
+   setup_logging()
+   run_worker(args.queues, args.concurrency, args.prefetch, args.claim_timeout,
+              args.engine, args.cache_size, args.shared_cache)
@@ -3,24 +3,52 @@ Base analyzer class providing common functionality for all analysis components.
 """
 
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence
 from datetime import datetime
 import pandas as pd
+from .loader import ContentLoader
 
 class BaseAnalyzer:
     """Base class for all analysis components"""
     
     def __init__(self, db_handler):
         self.db = db_handler
+        self.loader = ContentLoader(db_handler)
         self.logger = logging.getLogger(__name__)
 
+    def get_posts(self, start_date: datetime, end_date: datetime,
+                  subreddit: Optional[str] = None,
+                  columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Get posts for a date range, only loading the requested columns"""
+        return self.loader.load_posts(start_date, end_date,
+                                      subreddit=subreddit, columns=columns)
+
+    def get_comments(self, start_date: datetime, end_date: datetime,
+                     subreddit: Optional[str] = None,
+                     columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Get comments on posts from a date range, only loading the requested columns"""
+        return self.loader.load_comments(start_date, end_date,
+                                         subreddit=subreddit, columns=columns)
+
+    def iter_comments(self, start_date: datetime, end_date: datetime,
+                      subreddit: Optional[str] = None,
+                      columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """Stream comments in chunks for ranges too large to hold in memory"""
+        return self.loader.iter_comments(start_date, end_date,
+                                         subreddit=subreddit, columns=columns)
+
     def get_date_range_data(self, start_date: datetime, 
                            end_date: datetime, 
                            subreddit: Optional[str] = None) -> pd.DataFrame:
-        """Get data for a specific date range"""
+        """Get data for a specific date range
+
+        Wide posts x comments join kept for existing callers; prefer
+        get_posts/get_comments, which avoid repeating post columns per comment.
+        """
         query = """
             SELECT *
             FROM posts p
+            JOIN subreddits s ON s.id = p.subreddit_id
             LEFT JOIN comments c ON p.id = c.post_id
             WHERE p.created_utc BETWEEN %s AND %s
             {subreddit_filter}
@@ -35,5 +63,5 @@ class BaseAnalyzer:
             
         query = query.format(subreddit_filter=subreddit_filter)
         
-        with self.db.get_connection() as conn:
+        with self.db.get_read_connection() as conn:
             return pd.read_sql(query, conn, params=params)
@@ -0,0 +1,139 @@
+"""
+Streaming, column-projected loading of posts and comments for analysis.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import pandas as pd
+
+# Column name -> (SQL expression, pandas dtype)
+POST_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'id': ('p.id', 'object'),
+    'subreddit': ('s.name', 'category'),
+    'author': ('p.author', 'category'),
+    'title': ('p.title', 'object'),
+    'content': ('p.content', 'object'),
+    'created_utc': ('p.created_utc', 'datetime64[ns]'),
+    'score': ('p.score', 'Int32'),
+    'upvote_ratio': ('p.upvote_ratio', 'float32'),
+    'is_deleted': ('p.is_deleted', 'boolean'),
+}
+
+COMMENT_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'id': ('c.id', 'object'),
+    'post_id': ('c.post_id', 'object'),
+    'parent_comment_id': ('c.parent_comment_id', 'object'),
+    'subreddit': ('s.name', 'category'),
+    'author': ('c.author', 'category'),
+    'content': ('c.content', 'object'),
+    'created_utc': ('c.created_utc', 'datetime64[ns]'),
+    'score': ('c.score', 'Int32'),
+    'is_deleted': ('c.is_deleted', 'boolean'),
+}
+
+DEFAULT_POST_COLUMNS = ['id', 'subreddit', 'author', 'created_utc', 'score', 'upvote_ratio']
+DEFAULT_COMMENT_COLUMNS = ['id', 'post_id', 'subreddit', 'author', 'created_utc', 'score']
+
+class ContentLoader:
+    """Loads posts and comments as separate, compactly typed DataFrames"""
+
+    def __init__(self, db_handler, chunksize: int = 50000):
+        self.db = db_handler
+        self.chunksize = chunksize
+
+    def iter_posts(self, start_date: datetime, end_date: datetime,
+                   subreddit: Optional[str] = None,
+                   columns: Optional[Sequence[str]] = None,
+                   chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Yield posts created in the date range in chunks"""
+        query = """
+            SELECT {columns}
+            FROM posts p
+            JOIN subreddits s ON s.id = p.subreddit_id
+            WHERE p.created_utc BETWEEN %s AND %s
+            {subreddit_filter}
+        """
+        return self._iter_frames(
+            query, POST_COLUMNS, columns or DEFAULT_POST_COLUMNS,
+            start_date, end_date, subreddit, chunksize
+        )
+
+    def iter_comments(self, start_date: datetime, end_date: datetime,
+                      subreddit: Optional[str] = None,
+                      columns: Optional[Sequence[str]] = None,
+                      chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Yield comments on posts created in the date range in chunks"""
+        query = """
+            SELECT {columns}
+            FROM posts p
+            JOIN subreddits s ON s.id = p.subreddit_id
+            JOIN comments c ON c.post_id = p.id
+            WHERE p.created_utc BETWEEN %s AND %s
+            {subreddit_filter}
+        """
+        return self._iter_frames(
+            query, COMMENT_COLUMNS, columns or DEFAULT_COMMENT_COLUMNS,
+            start_date, end_date, subreddit, chunksize
+        )
+
+    def load_posts(self, *args, **kwargs) -> pd.DataFrame:
+        """Load every chunk of iter_posts into one DataFrame"""
+        return self._concat(self.iter_posts(*args, **kwargs),
+                            POST_COLUMNS, kwargs.get('columns'), DEFAULT_POST_COLUMNS)
+
+    def load_comments(self, *args, **kwargs) -> pd.DataFrame:
+        """Load every chunk of iter_comments into one DataFrame"""
+        return self._concat(self.iter_comments(*args, **kwargs),
+                            COMMENT_COLUMNS, kwargs.get('columns'), DEFAULT_COMMENT_COLUMNS)
+
+    def _iter_frames(self, query: str, spec: Dict[str, Tuple[str, str]],
+                     columns: Sequence[str], start_date: datetime,
+                     end_date: datetime, subreddit: Optional[str],
+                     chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+        unknown = [column for column in columns if column not in spec]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        params: List = [start_date, end_date]
+        subreddit_filter = ""
+        if subreddit:
+            subreddit_filter = "AND s.name = %s"
+            params.append(subreddit)
+
+        query = query.format(
+            columns=', '.join(f"{spec[column][0]} AS {column}" for column in columns),
+            subreddit_filter=subreddit_filter
+        )
+        chunksize = chunksize or self.chunksize
+
+        with self.db.get_read_connection() as conn:
+            # Named cursors are server-side, rows stream in chunksize batches
+            with conn.cursor(name=f"loader_{uuid.uuid4().hex}") as cur:
+                cur.itersize = chunksize
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    yield self._to_frame(rows, spec, columns)
+
+    @staticmethod
+    def _to_frame(rows: List[tuple], spec: Dict[str, Tuple[str, str]],
+                  columns: Sequence[str]) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(rows, columns=list(columns))
+        return frame.astype({column: spec[column][1] for column in columns})
+
+    @staticmethod
+    def _concat(frames: Iterator[pd.DataFrame], spec: Dict[str, Tuple[str, str]],
+                columns: Optional[Sequence[str]],
+                default_columns: Sequence[str]) -> pd.DataFrame:
+        columns = list(columns or default_columns)
+        frames = list(frames)
+        if not frames:
+            return ContentLoader._to_frame([], spec, columns)
+
+        frame = pd.concat(frames, ignore_index=True)
+        # Chunks carry their own categories, so concat falls back to object
+        categoricals = [column for column in columns if spec[column][1] == 'category']
+        return frame.astype({column: 'category' for column in categoricals})
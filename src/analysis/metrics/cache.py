@@ -0,0 +1,103 @@
+# cache.py
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+_WHITESPACE = re.compile(r'\s+')
+
+class SentimentCache:
+   def __init__(self, max_entries: int = 100000, redis_client=None,
+                redis_ttl: int = 7 * 24 * 3600, engine: str = 'vader',
+                key_prefix: Optional[str] = None):
+       """Two-tier cache of sentiment scores keyed by a normalized text hash
+
+       The in-process LRU tier holds max_entries results. When redis_client
+       is given it backs a shared tier across analyzer processes, where
+       entries expire after redis_ttl seconds. Scores are only valid for
+       the engine that produced them, so shared keys default to
+       sentiment:<engine>:<hash>.
+       """
+       self.max_entries = max_entries
+       self.redis = redis_client
+       self.redis_ttl = redis_ttl
+       self.engine = engine
+       self.key_prefix = key_prefix if key_prefix is not None else f'sentiment:{engine}:'
+       self.logger = logging.getLogger(__name__)
+       self._entries: OrderedDict = OrderedDict()
+       self._lock = threading.Lock()
+       self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+   @staticmethod
+   def key(text: Optional[str]) -> str:
+       """Hash of the text with whitespace runs collapsed
+
+       Case and punctuation are kept because VADER scores them.
+       """
+       normalized = _WHITESPACE.sub(' ', text or '').strip()
+       return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+   def get_many(self, keys: List[str]) -> List[Optional[Dict[str, float]]]:
+       results: List[Optional[Dict[str, float]]] = []
+       with self._lock:
+           for key in keys:
+               scores = self._entries.get(key)
+               if scores is not None:
+                   self._entries.move_to_end(key)
+               results.append(scores)
+       local_hits = sum(1 for scores in results if scores is not None)
+
+       shared_hits = 0
+       missing = [i for i, scores in enumerate(results) if scores is None]
+       if missing and self.redis is not None:
+           try:
+               values = self.redis.mget([self.key_prefix + keys[i] for i in missing])
+               found = {}
+               for i, value in zip(missing, values):
+                   if value is not None:
+                       results[i] = json.loads(value)
+                       found[keys[i]] = results[i]
+               shared_hits = len(found)
+               self._remember(found)
+           except Exception as e:
+               self.logger.warning(f"Shared sentiment cache unavailable: {str(e)}")
+
+       with self._lock:
+           self._stats['local_hits'] += local_hits
+           self._stats['shared_hits'] += shared_hits
+           self._stats['misses'] += len(keys) - local_hits - shared_hits
+       return results
+
+   def put_many(self, entries: Dict[str, Dict[str, float]]) -> None:
+       if not entries:
+           return
+       self._remember(entries)
+       if self.redis is not None:
+           try:
+               pipe = self.redis.pipeline(transaction=False)
+               for key, scores in entries.items():
+                   pipe.set(self.key_prefix + key, json.dumps(scores), ex=self.redis_ttl)
+               pipe.execute()
+           except Exception as e:
+               self.logger.warning(f"Shared sentiment cache unavailable: {str(e)}")
+
+   def stats(self) -> Dict:
+       with self._lock:
+           stats = dict(self._stats)
+           stats['entries'] = len(self._entries)
+       lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+       stats['hit_rate'] = (
+           (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+       )
+       return stats
+
+   def _remember(self, entries: Dict[str, Dict[str, float]]) -> None:
+       with self._lock:
+           for key, scores in entries.items():
+               self._entries[key] = scores
+               self._entries.move_to_end(key)
+           while len(self._entries) > self.max_entries:
+               self._entries.popitem(last=False)
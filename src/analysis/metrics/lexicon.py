@@ -0,0 +1,274 @@
+# lexicon.py
+import string
+from typing import Dict, List, Optional
+import numpy as np
+from vaderSentiment.vaderSentiment import (
+   BOOSTER_DICT, C_INCR, N_SCALAR, NEGATE, SentimentIntensityAnalyzer
+)
+from .scoring import NEUTRAL_SCORES
+
+# Scalar decay VADER applies to modifiers 1, 2 and 3 words before an item
+_MODIFIER_DECAY = (1.0, 0.95, 0.9)
+_NORMALIZE_ALPHA = 15
+
+class LexiconScorer:
+   def __init__(self):
+       """Batch approximation of VADER built on precomputed lookup tables
+
+       The VADER lexicon, booster and negation lists are compiled into
+       arrays indexed by token id, and every rule is applied to all tokens
+       of a batch at once with NumPy. Covered: lexicon valence, "no"
+       negation, ALL CAPS emphasis, booster/dampener words and bigrams,
+       negations up to three words back, "never so/this", "without doubt",
+       "least", "kind of", the "but" shift and !/? amplification.
+
+       Not covered: emoji descriptions, SPECIAL_CASES idioms, and VADER's
+       value-based lookup in its "but" rule, which misplaces repeated
+       scores. Expected agreement: compound within 0.05 of polarity_scores
+       for at least 99% of texts; measure it on real data with agreement()
+       or scripts/benchmark_sentiment.py.
+       """
+       self.analyzer = SentimentIntensityAnalyzer()
+       lexicon = self.analyzer.lexicon
+       boosters = {word: value for word, value in BOOSTER_DICT.items() if ' ' not in word}
+       bigrams = {
+           tuple(phrase.split()): value
+           for phrase, value in BOOSTER_DICT.items() if len(phrase.split()) == 2
+       }
+       negations = {word.lower() for word in NEGATE}
+
+       words = set(lexicon) | set(boosters) | negations | {
+           'but', 'no', 'kind', 'of', 'least', 'at', 'very', 'or', 'nor',
+           'never', 'so', 'this', 'without', 'doubt'
+       }
+       words |= {word for bigram in bigrams for word in bigram}
+       # Id 0 is every word that none of the rules know about
+       self._vocab = {word: index for index, word in enumerate(sorted(words), start=1)}
+       size = len(self._vocab) + 1
+
+       self._valence = np.zeros(size)
+       self._in_lexicon = np.zeros(size, dtype=bool)
+       self._booster = np.zeros(size)
+       self._is_booster = np.zeros(size, dtype=bool)
+       self._is_negation = np.zeros(size, dtype=bool)
+       for word, index in self._vocab.items():
+           if word in lexicon:
+               self._valence[index] = lexicon[word]
+               self._in_lexicon[index] = True
+           if word in boosters:
+               self._booster[index] = boosters[word]
+               self._is_booster[index] = True
+           if word in negations or "n't" in word:
+               self._is_negation[index] = True
+       self._bigram_boosters = [
+           (self._vocab[first], self._vocab[second], value)
+           for (first, second), value in bigrams.items()
+       ]
+
+   def score_batch(self, texts: List[Optional[str]]) -> List[Optional[Dict[str, float]]]:
+       """Score texts in order, in the same format as polarity_scores"""
+       try:
+           return self._score(texts)
+       except Exception:
+           # Isolate whichever text broke the batch
+           results = []
+           for text in texts:
+               try:
+                   results.append(self._score([text])[0])
+               except Exception:
+                   results.append(None)
+           return results
+
+   def agreement(self, texts: List[str], tolerance: float = 0.05) -> Dict[str, float]:
+       """Compare compound scores with VADER's polarity_scores on texts"""
+       fast = np.array([scores['compound'] for scores in self._score(texts)])
+       reference = np.array([
+           self.analyzer.polarity_scores(text)['compound'] if text and text != '[deleted]'
+           else NEUTRAL_SCORES['compound']
+           for text in texts
+       ])
+       errors = np.abs(fast - reference)
+       return {
+           'texts': len(texts),
+           'tolerance': tolerance,
+           'within_tolerance': float(np.mean(errors <= tolerance)) if len(texts) else 1.0,
+           'mean_abs_error': float(np.mean(errors)) if len(texts) else 0.0,
+           'max_abs_error': float(np.max(errors)) if len(texts) else 0.0
+       }
+
+   def _tokenize(self, texts: List[str]):
+       """Flatten a batch into per-token id, ALL CAPS and contraction arrays"""
+       vocab = self._vocab
+       punctuation = string.punctuation
+       split_texts = [text.split() for text in texts]
+       lengths = np.fromiter((len(tokens) for tokens in split_texts),
+                             dtype=np.int64, count=len(texts))
+       tokens = [token for text_tokens in split_texts for token in text_tokens]
+
+       # Same rule as SentiText: strip words, keep short tokens (emoticons) intact
+       stripped = [token.strip(punctuation) for token in tokens]
+       lowered = [
+           (clean if len(clean) > 2 else token).lower()
+           for clean, token in zip(stripped, tokens)
+       ]
+
+       ids = np.fromiter((vocab.get(token, 0) for token in lowered),
+                         dtype=np.int64, count=len(tokens))
+       upper = np.fromiter(map(str.isupper, tokens), dtype=bool, count=len(tokens))
+       contraction = np.fromiter(("n't" in token for token in lowered),
+                                 dtype=bool, count=len(tokens))
+       return ids, upper, contraction, lengths
+
+   def _score(self, texts: List[Optional[str]]) -> List[Dict[str, float]]:
+       results: List[Optional[Dict[str, float]]] = [None] * len(texts)
+       scored = []
+       for index, text in enumerate(texts):
+           if not text or text == '[deleted]':
+               results[index] = dict(NEUTRAL_SCORES)
+           else:
+               scored.append(index)
+       if not scored:
+           return results
+
+       batch = [texts[index] for index in scored]
+       ids, upper, contraction, lengths = self._tokenize(batch)
+       n_texts = len(batch)
+       text_idx = np.repeat(np.arange(n_texts), lengths)
+       starts = np.cumsum(lengths) - lengths
+       pos = np.arange(len(ids)) - starts[text_idx]
+       text_len = lengths[text_idx]
+       vocab = self._vocab
+
+       def shifted(values, k, fill):
+           """values of the token k positions earlier (k < 0: later)"""
+           out = np.full_like(values, fill)
+           if k > 0:
+               out[k:] = values[:-k]
+           elif k < 0:
+               out[:k] = values[-k:]
+           return out
+
+       def is_word(token_ids, word):
+           return token_ids == vocab[word]
+
+       # Only words that all but "some" tokens are ALL CAPS get emphasis
+       upper_count = np.bincount(text_idx, weights=upper, minlength=n_texts)
+       cap_diff = (upper_count > 0) & (upper_count < lengths)
+       emphasized = upper & cap_diff[text_idx]
+
+       next_ids = shifted(ids, -1, 0)
+       has_next = pos < text_len - 1
+       kind_of = is_word(ids, 'kind') & has_next & is_word(next_ids, 'of')
+       lexical = self._in_lexicon[ids] & ~self._is_booster[ids] & ~kind_of
+       base = self._valence[ids]
+       valence = np.where(lexical, base, 0.0)
+
+       # "no" negates the next lexicon word instead of counting itself
+       valence[lexical & is_word(ids, 'no') & has_next & self._in_lexicon[next_ids]] = 0.0
+       prev1, prev2, prev3 = (shifted(ids, k, 0) for k in (1, 2, 3))
+       after_no = (
+           ((pos > 0) & is_word(prev1, 'no'))
+           | ((pos > 1) & is_word(prev2, 'no'))
+           | ((pos > 2) & is_word(prev3, 'no')
+              & (is_word(prev1, 'or') | is_word(prev1, 'nor')))
+       )
+       valence = np.where(lexical & after_no, base * N_SCALAR, valence)
+
+       valence = np.where(
+           lexical & emphasized,
+           valence + np.where(valence > 0, C_INCR, -C_INCR),
+           valence
+       )
+
+       so_this = [is_word(prev, 'so') | is_word(prev, 'this') for prev in (prev1, prev2)]
+       # "never so/this" emphasizes rather than negates, "without doubt" is neutral
+       emphasis = (
+           np.zeros(len(ids), dtype=bool),
+           is_word(prev2, 'never') & so_this[0],
+           (is_word(prev3, 'never') & so_this[1]) | so_this[0]
+       )
+       no_negation = (
+           np.zeros(len(ids), dtype=bool),
+           is_word(prev2, 'without') & is_word(prev1, 'doubt'),
+           is_word(prev3, 'without') & (is_word(prev2, 'doubt') | is_word(prev1, 'doubt'))
+       )
+
+       for k, previous in zip((1, 2, 3), (prev1, prev2, prev3)):
+           applies = lexical & (pos >= k) & ~self._in_lexicon[previous]
+           scalar = self._booster[previous] * np.where(valence < 0, -1.0, 1.0)
+           scalar = np.where(
+               self._is_booster[previous] & shifted(emphasized, k, False),
+               scalar + np.where(valence > 0, C_INCR, -C_INCR),
+               scalar
+           )
+           valence = np.where(applies, valence + scalar * _MODIFIER_DECAY[k - 1], valence)
+           negation = self._is_negation[previous] | shifted(contraction, k, False)
+           valence = np.where(
+               applies & emphasis[k - 1],
+               valence * 1.25,
+               np.where(applies & ~no_negation[k - 1] & negation, valence * N_SCALAR, valence)
+           )
+
+       # Booster bigrams ("kind of") in the three words before an item
+       applies = lexical & (pos >= 3) & ~self._in_lexicon[prev3]
+       for first, second, value in self._bigram_boosters:
+           for earlier, later in ((prev2, prev1), (prev3, prev2)):
+               matched = applies & (earlier == first) & (later == second)
+               valence = np.where(matched, valence + value, valence)
+
+       least = (
+           lexical & (pos > 0) & is_word(prev1, 'least')
+           & ~((pos > 1) & (is_word(prev2, 'at') | is_word(prev2, 'very')))
+       )
+       valence = np.where(least, valence * N_SCALAR, valence)
+
+       # Sentiment before the first "but" is halved, after it boosted
+       but_pos = np.full(n_texts, np.iinfo(np.int64).max)
+       is_but = is_word(ids, 'but')
+       np.minimum.at(but_pos, text_idx[is_but], pos[is_but])
+       token_but = but_pos[text_idx]
+       has_but = token_but != np.iinfo(np.int64).max
+       valence = np.where(has_but & (pos < token_but), valence * 0.5, valence)
+       valence = np.where(has_but & (pos > token_but), valence * 1.5, valence)
+
+       sum_s = np.bincount(text_idx, weights=valence, minlength=n_texts)
+       pos_sum = np.bincount(text_idx, weights=np.where(valence > 0, valence + 1, 0.0),
+                             minlength=n_texts)
+       neg_sum = np.bincount(text_idx, weights=np.where(valence < 0, valence - 1, 0.0),
+                             minlength=n_texts)
+       neu_count = np.bincount(text_idx, weights=valence == 0, minlength=n_texts)
+
+       punct = np.array([self._punctuation_emphasis(text) for text in batch])
+       sum_s = sum_s + np.sign(sum_s) * punct
+       compound = np.clip(sum_s / np.sqrt(sum_s * sum_s + _NORMALIZE_ALPHA), -1.0, 1.0)
+
+       more_positive = pos_sum > np.abs(neg_sum)
+       more_negative = pos_sum < np.abs(neg_sum)
+       pos_sum = np.where(more_positive, pos_sum + punct, pos_sum)
+       neg_sum = np.where(more_negative, neg_sum - punct, neg_sum)
+       total = pos_sum + np.abs(neg_sum) + neu_count
+       safe_total = np.where(total > 0, total, 1.0)
+
+       empty = lengths == 0
+       neg_scores = np.where(empty, 0.0, np.round(np.abs(neg_sum / safe_total), 3)).tolist()
+       neu_scores = np.where(empty, 0.0, np.round(np.abs(neu_count / safe_total), 3)).tolist()
+       pos_scores = np.where(empty, 0.0, np.round(np.abs(pos_sum / safe_total), 3)).tolist()
+       compound_scores = np.where(empty, 0.0, np.round(compound, 4)).tolist()
+       for row, index in enumerate(scored):
+           results[index] = {
+               'neg': neg_scores[row],
+               'neu': neu_scores[row],
+               'pos': pos_scores[row],
+               'compound': compound_scores[row]
+           }
+       return results
+
+   @staticmethod
+   def _punctuation_emphasis(text: str) -> float:
+       exclamations = min(text.count('!'), 4) * 0.292
+       questions = text.count('?')
+       if questions > 3:
+           return exclamations + 0.96
+       if questions > 1:
+           return exclamations + questions * 0.18
+       return exclamations
@@ -0,0 +1,161 @@
+# scoring.py
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+import logging
+import threading
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from .cache import SentimentCache
+
+NEUTRAL_SCORES = {
+   'compound': 0.0,
+   'pos': 0.0,
+   'neu': 1.0,
+   'neg': 0.0
+}
+
+# Scorer owned by each pool process, built once by _init_worker
+_worker_scorer = None
+
+def score_text(analyzer: SentimentIntensityAnalyzer, text: Optional[str]) -> Dict[str, float]:
+   """Score a single text, deleted or empty content is neutral"""
+   if not text or text == '[deleted]':
+       return dict(NEUTRAL_SCORES)
+   return analyzer.polarity_scores(text)
+
+def _score_texts(analyzer: SentimentIntensityAnalyzer,
+                 texts: List[Optional[str]]) -> List[Optional[Dict[str, float]]]:
+   """Score texts, leaving None for any text that fails"""
+   results = []
+   for text in texts:
+       try:
+           results.append(score_text(analyzer, text))
+       except Exception as e:
+           logging.getLogger(__name__).error(f"Error scoring text: {str(e)}")
+           results.append(None)
+   return results
+
+class VaderScorer:
+   """Reference engine, VADER's polarity_scores one text at a time"""
+
+   def __init__(self):
+       self.analyzer = SentimentIntensityAnalyzer()
+
+   def score_batch(self, texts: List[Optional[str]]) -> List[Optional[Dict[str, float]]]:
+       return _score_texts(self.analyzer, texts)
+
+ENGINES = ('vader', 'lexicon')
+
+def create_scorer(engine: str = 'vader'):
+   """Build a scoring engine by name, see ENGINES"""
+   if engine == 'vader':
+       return VaderScorer()
+   if engine == 'lexicon':
+       from .lexicon import LexiconScorer
+       return LexiconScorer()
+   raise ValueError(f"Unknown sentiment engine: {engine}")
+
+def _init_worker(engine: str) -> None:
+   global _worker_scorer
+   _worker_scorer = create_scorer(engine)
+
+def _score_chunk(texts: List[Optional[str]]) -> List[Optional[Dict[str, float]]]:
+   return _worker_scorer.score_batch(texts)
+
+class ScoringEngine:
+   def __init__(self, workers: int = 1, chunk_size: int = 250,
+                cache: Optional[SentimentCache] = None, engine: str = 'vader'):
+       """Sentiment scoring, fanned out over a process pool when workers > 1
+
+       engine picks the scorer: 'vader' runs polarity_scores per text,
+       'lexicon' the vectorized LexiconScorer. With a cache, texts already
+       scored are answered from it and only the distinct misses of each
+       batch reach the scorer.
+       """
+       if cache is not None and cache.engine != engine:
+           raise ValueError(f"Cache holds {cache.engine} scores, not {engine}")
+       self.workers = workers
+       self.chunk_size = chunk_size
+       self.cache = cache
+       self.engine = engine
+       self.scorer = create_scorer(engine)
+       self.analyzer = self.scorer.analyzer
+       self._executor = None
+       if workers > 1:
+           self._executor = ProcessPoolExecutor(
+               max_workers=workers, initializer=_init_worker, initargs=(engine,)
+           )
+
+   def score(self, texts: List[Optional[str]]) -> List[Optional[Dict[str, float]]]:
+       """Score texts in order, None marks a text that could not be scored"""
+       return self.submit(texts).result()
+
+   def submit(self, texts: List[Optional[str]]) -> Future:
+       """Start scoring texts, the future resolves to the list score() returns"""
+       if self.cache is None:
+           return self._submit(texts)
+
+       keys = [self.cache.key(text) for text in texts]
+       scores = self.cache.get_many(keys)
+
+       # Identical texts within the batch are scored once
+       missing: Dict[str, List[int]] = {}
+       for index, (key, cached) in enumerate(zip(keys, scores)):
+           if cached is None:
+               missing.setdefault(key, []).append(index)
+       miss_keys = list(missing)
+       inner = self._submit([texts[missing[key][0]] for key in miss_keys])
+
+       merged = Future()
+
+       def _on_scored(_):
+           try:
+               fresh = dict(zip(miss_keys, inner.result()))
+               for key, indexes in missing.items():
+                   for index in indexes:
+                       scores[index] = fresh[key]
+               self.cache.put_many({
+                   key: value for key, value in fresh.items() if value is not None
+               })
+               merged.set_result(scores)
+           except Exception as e:
+               merged.set_exception(e)
+
+       inner.add_done_callback(_on_scored)
+       return merged
+
+   def _submit(self, texts: List[Optional[str]]) -> Future:
+       if self._executor is None:
+           future = Future()
+           future.set_result(self.scorer.score_batch(texts))
+           return future
+
+       chunks = [
+           self._executor.submit(_score_chunk, texts[i:i + self.chunk_size])
+           for i in range(0, len(texts), self.chunk_size)
+       ]
+       combined = Future()
+       remaining = [len(chunks)]
+       lock = threading.Lock()
+
+       def _on_chunk_done(_):
+           with lock:
+               remaining[0] -= 1
+               finished = remaining[0] == 0
+           if finished:
+               try:
+                   combined.set_result(
+                       [scores for chunk in chunks for scores in chunk.result()]
+                   )
+               except Exception as e:
+                   combined.set_exception(e)
+
+       if not chunks:
+           combined.set_result([])
+       for chunk in chunks:
+           chunk.add_done_callback(_on_chunk_done)
+       return combined
+
+   def close(self) -> None:
+       if self._executor is not None:
+           self._executor.shutdown()
+           self._executor = None
@@ -1,47 +1,101 @@
 # sentiment.py
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from psycopg2.extras import execute_values
 import logging
+import threading
+import uuid
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
+from ...db.rollups import SENTIMENT_ROLLUP_CTE
+from .cache import SentimentCache
+from .scoring import ScoringEngine
 
 class SentimentAnalyzer:
-   def __init__(self, db_handler):
-       """Initialize sentiment analyzer with database connection"""
-       self.analyzer = SentimentIntensityAnalyzer()
+   def __init__(self, db_handler, workers: int = 1, claim_timeout: int = 600,
+                cache: Optional[SentimentCache] = None, engine: str = 'vader',
+                max_attempts: int = 3):
+       """Initialize sentiment analyzer with database connection
+
+       workers > 1 scores on a process pool. Fetched content is claimed for
+       claim_timeout seconds so concurrent analyzers never score the same
+       rows, and work from a crashed analyzer is picked up after that.
+       Content still unscored after max_attempts claims is no longer
+       claimed and stays in sentiment_pending for inspection. A cache lets
+       repeated bodies skip scoring entirely, engine selects the scorer
+       (see ScoringEngine).
+       """
+       self.cache = cache
+       self.engine = ScoringEngine(workers=workers, cache=cache, engine=engine)
+       self.analyzer = self.engine.analyzer
+       self.worker_id = str(uuid.uuid4())
+       self.claim_timeout = claim_timeout
+       self.max_attempts = max_attempts
        self.db = db_handler
        self.logger = logging.getLogger(__name__)
 
    def get_unprocessed_content(self, batch_size: int = 100) -> List[Dict]:
-       """Get content that hasn't been analyzed yet"""
+       """Get content that hasn't been analyzed yet
+
+       Work is discovered through sentiment_pending, filled as rows are
+       inserted, so each poll is a primary key range scan rather than an
+       anti-join over posts and comments. Returned rows are claimed by this
+       analyzer; SKIP LOCKED keeps concurrent claims from blocking each other.
+       Claimed rows whose post or comment no longer exists, e.g. after its
+       partition was dropped, are deleted rather than returned.
+       """
        with self.db.get_connection() as conn:
            with conn.cursor() as cur:
                cur.execute("""
-                   SELECT 
-                       CASE 
-                           WHEN p.id IS NOT NULL THEN 'post'
-                           ELSE 'comment'
-                       END as content_type,
-                       COALESCE(p.id, c.id) as content_id,
-                       COALESCE(p.content, c.content) as content
-                   FROM (
-                       SELECT id, content FROM posts 
-                       WHERE id NOT IN (SELECT content_id FROM content_sentiment)
-                       LIMIT %(batch_size)s
-                   ) p
-                   FULL OUTER JOIN (
-                       SELECT id, content FROM comments 
-                       WHERE id NOT IN (SELECT content_id FROM content_sentiment)
-                       LIMIT %(batch_size)s
-                   ) c ON FALSE
-               """, {'batch_size': batch_size})
-               
+                   WITH claimed AS (
+                       UPDATE sentiment_pending q
+                       SET claimed_by = %(worker_id)s,
+                           claimed_at = CURRENT_TIMESTAMP,
+                           attempts = q.attempts + 1
+                       WHERE q.id IN (
+                           SELECT id
+                           FROM sentiment_pending
+                           WHERE (claimed_at IS NULL
+                                  OR claimed_at < CURRENT_TIMESTAMP
+                                      - make_interval(secs => %(claim_timeout)s))
+                             AND attempts < %(max_attempts)s
+                           ORDER BY id
+                           LIMIT %(batch_size)s
+                           FOR UPDATE SKIP LOCKED
+                       )
+                       RETURNING q.id, q.content_id, q.content_type, q.attempts
+                   )
+                   SELECT
+                       q.content_type,
+                       q.content_id,
+                       COALESCE(p.content, c.content) as content,
+                       q.attempts,
+                       p.id IS NULL AND c.id IS NULL as missing
+                   FROM claimed q
+                   LEFT JOIN posts p
+                       ON q.content_type = 'post' AND p.id = q.content_id
+                   LEFT JOIN comments c
+                       ON q.content_type = 'comment' AND c.id = q.content_id
+                   ORDER BY q.id
+               """, {
+                   'batch_size': batch_size,
+                   'worker_id': self.worker_id,
+                   'claim_timeout': self.claim_timeout,
+                   'max_attempts': self.max_attempts
+               })
+               rows = cur.fetchall()
+
+               missing = [(row[1], row[0]) for row in rows if row[4]]
+               if missing:
+                   self._delete_pending(cur, missing)
+                   self.logger.warning(f"Dropped {len(missing)} pending rows whose content is gone")
+
                return [
                    {
                        'content_type': row[0],
                        'content_id': row[1],
-                       'content': row[2]
+                       'content': row[2],
+                       'attempts': row[3]
                    }
-                   for row in cur.fetchall()
+                   for row in rows if not row[4]
                ]
 
    def store_sentiment(self, content_id: str, content_type: str,
@@ -49,56 +103,152 @@ class SentimentAnalyzer:
        """Store sentiment analysis results"""
        with self.db.get_connection() as conn:
            with conn.cursor() as cur:
-               cur.execute("""
-                   INSERT INTO content_sentiment (
-                       content_id,
-                       content_type,
-                       compound_score,
-                       positive_score,
-                       neutral_score,
-                       negative_score
-                   ) VALUES (%s, %s, %s, %s, %s, %s)
-                   ON CONFLICT (content_id) DO NOTHING
-               """, (
+               self._write_sentiment(cur, [{
+                   'content_id': content_id,
+                   'content_type': content_type,
+                   'scores': scores
+               }])
+
+   def store_sentiment_batch(self, results: List[Dict]) -> int:
+       """Store a batch of results in one transaction, returns rows stored
+
+       If the multi-row write fails the batch is retried row by row, each
+       under its own savepoint, so one bad row does not drop the others.
+       """
+       if not results:
+           return 0
+
+       try:
+           with self.db.get_connection() as conn:
+               with conn.cursor() as cur:
+                   self._write_sentiment(cur, results)
+           return len(results)
+       except Exception as e:
+           self.logger.warning(f"Bulk sentiment write failed, retrying per row: {str(e)}")
+
+       stored = 0
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               for result in results:
+                   cur.execute("SAVEPOINT sentiment_row")
+                   try:
+                       self._write_sentiment(cur, [result])
+                       cur.execute("RELEASE SAVEPOINT sentiment_row")
+                       stored += 1
+                   except Exception as e:
+                       cur.execute("ROLLBACK TO SAVEPOINT sentiment_row")
+                       self.logger.error(
+                           f"Error storing sentiment for {result['content_id']}: {str(e)}"
+                       )
+       return stored
+
+   def _write_sentiment(self, cur, results: List[Dict]) -> None:
+       # Newly stored scores are added to the hourly rollups in the same statement
+       execute_values(cur, f"""
+           WITH scored AS (
+               INSERT INTO content_sentiment (
                    content_id,
                    content_type,
-                   scores['compound'],
-                   scores['pos'],
-                   scores['neu'],
-                   scores['neg']
-               ))
+                   compound_score,
+                   positive_score,
+                   neutral_score,
+                   negative_score
+               ) VALUES %s
+               ON CONFLICT (content_id, content_type) DO NOTHING
+               RETURNING content_id, content_type, compound_score
+           ), {SENTIMENT_ROLLUP_CTE}
+           SELECT COUNT(*) FROM scored
+       """, [(
+           result['content_id'],
+           result['content_type'],
+           result['scores']['compound'],
+           result['scores']['pos'],
+           result['scores']['neu'],
+           result['scores']['neg']
+       ) for result in results], page_size=1000)
+
+       self._delete_pending(cur, [
+           (result['content_id'], result['content_type']) for result in results
+       ])
+
+   def _delete_pending(self, cur, keys: List[tuple]) -> None:
+       """Remove (content_id, content_type) pairs from sentiment_pending"""
+       execute_values(cur, """
+           DELETE FROM sentiment_pending q
+           USING (VALUES %s) AS done (content_id, content_type)
+           WHERE q.content_id = done.content_id
+             AND q.content_type = done.content_type
+       """, keys, page_size=1000)
 
    def analyze_content(self, text: str) -> Dict[str, float]:
-       """Analyze text content for sentiment scores"""
-       if not text or text == '[deleted]':
-           return {
-               'compound': 0.0,
-               'pos': 0.0,
-               'neu': 1.0,
-               'neg': 0.0
-           }
-       
-       return self.analyzer.polarity_scores(text)
+       """Analyze text content for sentiment scores, through the cache if any"""
+       return self.engine.score([text])[0]
 
    def process_batch(self, batch_size: int = 100) -> None:
        """Process a batch of content for sentiment analysis"""
        try:
            content_batch = self.get_unprocessed_content(batch_size)
-           
-           for content in content_batch:
-               try:
-                   sentiment_scores = self.analyze_content(content['content'])
-                   self.store_sentiment(
-                       content['content_id'],
-                       content['content_type'],
-                       sentiment_scores
-                   )
-               except Exception as e:
-                   self.logger.error(
-                       f"Error analyzing content {content['content_id']}: {str(e)}"
-                   )
-                   continue
+           scores = self.engine.score([content['content'] for content in content_batch])
+           self._store_scored(content_batch, scores)
                    
        except Exception as e:
            self.logger.error(f"Batch processing error: {str(e)}")
            raise
+
+   def process_available(self, batch_size: int = 100,
+                         stop_event: Optional[threading.Event] = None) -> int:
+       """Drain pending content, returns the number of items processed
+
+       The next batch is fetched and handed to the scoring engine before
+       the previous batch's results are written, so database round trips
+       overlap with scoring on the process pool. Once stop_event is set no
+       new batch is claimed, but the one in flight is still stored.
+       """
+       processed = 0
+       in_flight = None
+       try:
+           while True:
+               content_batch = []
+               if not (stop_event and stop_event.is_set()):
+                   content_batch = self.get_unprocessed_content(batch_size)
+               submitted = None
+               if content_batch:
+                   submitted = (content_batch, self.engine.submit(
+                       [content['content'] for content in content_batch]
+                   ))
+
+               if in_flight:
+                   batch, future = in_flight
+                   self._store_scored(batch, future.result())
+                   processed += len(batch)
+
+               if not submitted:
+                   return processed
+               in_flight = submitted
+
+       except Exception as e:
+           self.logger.error(f"Batch processing error: {str(e)}")
+           raise
+
+   def _store_scored(self, content_batch: List[Dict], scores: List) -> int:
+       results = []
+       for content, sentiment_scores in zip(content_batch, scores):
+           if sentiment_scores is None:
+               # Left pending, claimed again after claim_timeout until
+               # max_attempts is reached
+               attempts = content.get('attempts', 0)
+               self.logger.error(
+                   f"Error analyzing content {content['content_id']}, "
+                   f"attempt {attempts}/{self.max_attempts}"
+                   + (", giving up" if attempts >= self.max_attempts else "")
+               )
+               continue
+           results.append({
+               'content_id': content['content_id'],
+               'content_type': content['content_type'],
+               'scores': sentiment_scores
+           })
+       return self.store_sentiment_batch(results)
+
+   def close(self) -> None:
+       self.engine.close()
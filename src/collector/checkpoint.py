@@ -0,0 +1,47 @@
+# checkpoint.py
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+
+class ProgressCheckpointer:
+   def __init__(self, persist: Callable[[str, datetime, str], None],
+                interval: float = 30.0):
+       """Write-behind collection progress
+
+       Positions are recorded in memory with advance() and written through
+       persist at most once per interval, plus on flush(). Callers must only
+       advance to a position once the rows up to it are committed, e.g. from
+       a WritePipeline barrier, so the stored checkpoint never runs ahead of
+       the inserted data.
+       """
+       self.persist = persist
+       self.interval = interval
+       self.logger = logging.getLogger(__name__)
+       self._pending: Dict[str, Tuple[datetime, str]] = {}
+       self._lock = threading.Lock()
+       self._last_persist = time.monotonic()
+
+   def advance(self, subreddit_name: str, timestamp: datetime, post_id: str) -> None:
+       """Record a durable position, persisting it if the interval has elapsed"""
+       with self._lock:
+           self._pending[subreddit_name] = (timestamp, post_id)
+           due = time.monotonic() - self._last_persist >= self.interval
+       if due:
+           self.flush()
+
+   def flush(self) -> None:
+       """Persist every pending position"""
+       with self._lock:
+           pending, self._pending = self._pending, {}
+           self._last_persist = time.monotonic()
+
+       for subreddit_name, (timestamp, post_id) in pending.items():
+           try:
+               self.persist(subreddit_name, timestamp, post_id)
+           except Exception:
+               # Keep the position for the next flush unless it moved on already
+               with self._lock:
+                   self._pending.setdefault(subreddit_name, (timestamp, post_id))
+               raise
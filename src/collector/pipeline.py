@@ -0,0 +1,142 @@
+# pipeline.py
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+_POST = 'post'
+_COMMENT = 'comment'
+_BARRIER = 'barrier'
+_STOP = 'stop'
+
+class WritePipeline:
+   def __init__(self, db_handler,
+                max_queue_size: int = 10000,
+                flush_size: int = 500,
+                flush_interval: float = 2.0):
+       """Bounded producer/consumer pipeline between fetchers and the database
+
+       Fetcher threads push normalized rows with put_post/put_comments, a
+       single writer thread drains them into batch_insert_posts and
+       batch_insert_comments. Batches are flushed when flush_size rows are
+       buffered or flush_interval seconds have passed (full flushes reach
+       DB_BULK_COPY_THRESHOLD and load through COPY), and producers block
+       once max_queue_size rows are waiting so memory stays bounded while
+       Postgres is slow.
+       """
+       self.db = db_handler
+       self.flush_size = flush_size
+       self.flush_interval = flush_interval
+       self.logger = logging.getLogger(__name__)
+
+       self._queue = queue.Queue(maxsize=max_queue_size)
+       self._posts: List[Dict] = []
+       self._comments: List[Dict] = []
+       self._error: Optional[BaseException] = None
+       self._thread: Optional[threading.Thread] = None
+       self.stats = {
+           'posts_written': 0, 'comments_written': 0, 'flushes': 0,
+           'posts_inserted': 0, 'posts_updated': 0,
+           'comments_inserted': 0, 'comments_updated': 0
+       }
+
+   def __enter__(self):
+       self.start()
+       return self
+
+   def __exit__(self, exc_type, exc, tb):
+       self.close()
+
+   def start(self) -> None:
+       if self._thread is None:
+           self._thread = threading.Thread(
+               target=self._run, name='write-pipeline', daemon=True
+           )
+           self._thread.start()
+
+   def close(self) -> None:
+       """Flush everything still queued and stop the writer"""
+       if self._thread is None:
+           return
+       if self._error is None:
+           self._put((_STOP, None))
+       self._thread.join()
+       self._thread = None
+       self._raise_if_failed()
+
+   def put_post(self, post: Dict) -> None:
+       self._put((_POST, post))
+
+   def put_comments(self, comments: List[Dict]) -> None:
+       for comment in comments:
+           self._put((_COMMENT, comment))
+
+   def put_barrier(self, callback: Callable[[], None]) -> None:
+       """Run callback on the writer once every row queued before it is committed"""
+       self._put((_BARRIER, callback))
+
+   def _put(self, item) -> None:
+       # Block while the queue is full, but never on a writer that has died
+       while True:
+           self._raise_if_failed()
+           try:
+               self._queue.put(item, timeout=1.0)
+               return
+           except queue.Full:
+               continue
+
+   def _raise_if_failed(self) -> None:
+       if self._error is not None:
+           raise RuntimeError(f"Write pipeline failed: {str(self._error)}") from self._error
+
+   def _run(self) -> None:
+       last_flush = time.monotonic()
+       try:
+           while True:
+               timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+               try:
+                   kind, payload = self._queue.get(timeout=timeout)
+               except queue.Empty:
+                   self._flush()
+                   last_flush = time.monotonic()
+                   continue
+
+               if kind == _POST:
+                   self._posts.append(payload)
+               elif kind == _COMMENT:
+                   self._comments.append(payload)
+               elif kind == _BARRIER:
+                   self._flush()
+                   last_flush = time.monotonic()
+                   payload()
+                   continue
+               elif kind == _STOP:
+                   self._flush()
+                   return
+
+               if len(self._posts) >= self.flush_size or \
+                  len(self._comments) >= self.flush_size:
+                   self._flush()
+                   last_flush = time.monotonic()
+       except Exception as e:
+           self.logger.error(f"Write pipeline error: {str(e)}")
+           self._error = e
+
+   def _flush(self) -> None:
+       if not self._posts and not self._comments:
+           return
+       # Posts always go first so comments never reference a missing post
+       if self._posts:
+           self._record('posts', self.db.batch_insert_posts(self._posts))
+           self.stats['posts_written'] += len(self._posts)
+           self._posts = []
+       if self._comments:
+           self._record('comments', self.db.batch_insert_comments(self._comments))
+           self.stats['comments_written'] += len(self._comments)
+           self._comments = []
+       self.stats['flushes'] += 1
+
+   def _record(self, kind: str, counts: Dict[str, int]) -> None:
+       self.stats[f'{kind}_inserted'] += counts['inserted']
+       self.stats[f'{kind}_updated'] += counts['updated']
@@ -0,0 +1,49 @@
+# ratelimit.py
+import threading
+import time
+from typing import Optional
+
+class TokenBucket:
+   def __init__(self, rate: float, capacity: Optional[float] = None):
+       """Thread-safe token bucket shared by all collector workers
+
+       rate is in tokens (API requests) per second, capacity is the largest
+       burst allowed after an idle period.
+       """
+       self.rate = rate
+       self.capacity = capacity if capacity is not None else max(1.0, rate)
+       self._tokens = self.capacity
+       self._updated = time.monotonic()
+       self._lock = threading.Lock()
+
+   def _refill(self, now: float) -> None:
+       elapsed = now - self._updated
+       if elapsed > 0:
+           self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+           self._updated = now
+
+   def acquire(self, tokens: float = 1.0, subreddit: Optional[str] = None) -> float:
+       """Block until tokens are available, return the seconds spent waiting
+
+       subreddit is what the request is for, only shared budgets record it.
+       """
+       waited = 0.0
+       while True:
+           with self._lock:
+               self._refill(time.monotonic())
+               if self._tokens >= tokens:
+                   self._tokens -= tokens
+                   return waited
+               delay = (tokens - self._tokens) / self.rate
+           time.sleep(delay)
+           waited += delay
+
+   def sync(self, remaining: float, reset_in: float) -> None:
+       """Clamp the bucket to the budget reported by the API rate limit headers"""
+       with self._lock:
+           self._refill(time.monotonic())
+           if remaining < 1:
+               # Budget exhausted, hold every worker until the window resets
+               self._tokens = min(self._tokens, -reset_in * self.rate)
+           else:
+               self._tokens = min(self._tokens, remaining)
@@ -1,37 +1,124 @@
 # reddit_collector.py
 import praw
 import logging
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Generator, Optional, Dict
+from prawcore import Requestor
 from prawcore.exceptions import PrawcoreException
+from .checkpoint import ProgressCheckpointer
+from .pipeline import WritePipeline
+from .ratelimit import TokenBucket
+from .sketches import AuthorSketches
+
+# Listings are fetched from the API 100 items per request
+LISTING_PAGE_SIZE = 100
+
+class MeteredRequestor(Requestor):
+   """prawcore Requestor calling before_request ahead of every HTTP request
+
+   Every request PRAW makes goes through here, including OAuth token
+   requests, listing pages and each morechildren call of replace_more.
+   """
+   def __init__(self, *args, before_request=None, **kwargs):
+       super().__init__(*args, **kwargs)
+       self.before_request = before_request
+
+   def request(self, *args, **kwargs):
+       if self.before_request:
+           self.before_request()
+       return super().request(*args, **kwargs)
 
 class RedditCollector:
-   def __init__(self, config, db_handler):
-       """Initialize Reddit collector with recovery support"""
+   def __init__(self, config, db_handler,
+                author_sketches: Optional[AuthorSketches] = None,
+                rate_limiter=None):
+       """Initialize Reddit collector with recovery support
+
+       Authors of collected rows are added to author_sketches when given.
+       rate_limiter gates every API request; pass a SharedBudget (see
+       queue/scheduler.py) when several collectors share one account,
+       otherwise each gets a local bucket at the full account rate.
+       """
        self.worker_id = str(uuid.uuid4())
-       self.reddit = praw.Reddit(
-           client_id=config.client_id,
-           client_secret=config.client_secret,
-           username=config.username,
-           password=config.password,
-           user_agent=config.user_agent
-       )
+       self.config = config
        self.db = db_handler
+       self.author_sketches = author_sketches
        self.logger = logging.getLogger(__name__)
 
-   def get_collection_progress(self, subreddit_name: str) -> Optional[Dict]:
-       """Get the last processed position for this subreddit"""
+       # One bucket gates every request made by this collector's threads
+       self.max_workers = config.max_workers
+       self.rate_limiter = rate_limiter or TokenBucket(rate=config.requests_per_minute / 60.0)
+
+       # PRAW instances are not thread-safe, each worker thread gets its own.
+       # The pool lives as long as the collector so its threads' clients
+       # (and their OAuth tokens) are reused across batches.
+       self._local = threading.local()
+       self.reddit = self._create_reddit()
+       self._local.reddit = self.reddit
+       self._executor = None
+       if self.max_workers > 1:
+           self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                               thread_name_prefix='comment-fetch')
+
+   def _create_reddit(self) -> praw.Reddit:
+       return praw.Reddit(
+           client_id=self.config.client_id,
+           client_secret=self.config.client_secret,
+           username=self.config.username,
+           password=self.config.password,
+           user_agent=self.config.user_agent,
+           requestor_class=MeteredRequestor,
+           requestor_kwargs={'before_request': self._take_request_token}
+       )
+
+   def _take_request_token(self) -> None:
+       """Charge one API request to the subreddit the calling thread works on"""
+       self.rate_limiter.acquire(subreddit=getattr(self._local, 'subreddit', None))
+
+   def close(self) -> None:
+       """Stop the comment fetching threads"""
+       if self._executor:
+           self._executor.shutdown(wait=True)
+           self._executor = None
+
+   def _thread_reddit(self) -> praw.Reddit:
+       """Get the Reddit instance owned by the calling thread"""
+       reddit = getattr(self._local, 'reddit', None)
+       if reddit is None:
+           reddit = self._create_reddit()
+           self._local.reddit = reddit
+       return reddit
+
+   def _sync_rate_limit(self, reddit: praw.Reddit) -> None:
+       """Align the shared bucket with the budget reported by the API"""
+       limits = reddit.auth.limits
+       remaining = limits.get('remaining')
+       reset_timestamp = limits.get('reset_timestamp')
+       if remaining is not None and reset_timestamp is not None:
+           self.rate_limiter.sync(remaining, max(0.0, reset_timestamp - time.time()))
+
+   def get_collection_progress(self, subreddit_name: str, start_date: datetime,
+                               end_date: datetime) -> Optional[Dict]:
+       """Get where an unfinished run over the same window stopped
+
+       Listings are newest first, so the checkpoint is the oldest post
+       committed: everything between it and end_date is already stored.
+       """
        with self.db.get_connection() as conn:
            with conn.cursor() as cur:
                cur.execute("""
                    SELECT last_collected_timestamp, last_post_id
                    FROM collection_progress
                    WHERE subreddit_name = %s
+                     AND window_start = %s AND window_end = %s
+                     AND status = 'in_progress'
                    ORDER BY updated_at DESC
                    LIMIT 1
-               """, (subreddit_name,))
+               """, (subreddit_name, start_date, end_date))
                result = cur.fetchone()
                if result:
                    return {
@@ -41,113 +128,214 @@ class RedditCollector:
                return None
 
    def update_progress(self, subreddit_name: str, 
-                      timestamp: datetime, post_id: str):
-       """Update collection progress"""
+                      timestamp: datetime, post_id: str,
+                      start_date: datetime, end_date: datetime,
+                      started_at: datetime):
+       """Update collection progress of the run over [start_date, end_date]"""
        with self.db.get_connection() as conn:
            with conn.cursor() as cur:
                cur.execute("""
                    INSERT INTO collection_progress (
                        subreddit_name, last_collected_timestamp,
-                       last_post_id, status, worker_id, started_at
-                   ) VALUES (%s, %s, %s, 'in_progress', %s, %s)
+                       last_post_id, status, worker_id, started_at,
+                       window_start, window_end
+                   ) VALUES (%s, %s, %s, 'in_progress', %s, %s, %s, %s)
                    ON CONFLICT (subreddit_name, worker_id) 
                    DO UPDATE SET
                        last_collected_timestamp = EXCLUDED.last_collected_timestamp,
                        last_post_id = EXCLUDED.last_post_id,
+                       status = EXCLUDED.status,
+                       started_at = EXCLUDED.started_at,
+                       window_start = EXCLUDED.window_start,
+                       window_end = EXCLUDED.window_end,
                        updated_at = CURRENT_TIMESTAMP
                """, (
                    subreddit_name, timestamp, post_id,
-                   self.worker_id, datetime.utcnow()
+                   self.worker_id, started_at, start_date, end_date
                ))
 
+   def complete_progress(self, subreddit_name: str, start_date: datetime,
+                         end_date: datetime) -> None:
+       """Mark every run over the window finished, crashed ones included"""
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               cur.execute("""
+                   UPDATE collection_progress
+                   SET status = 'completed', updated_at = CURRENT_TIMESTAMP
+                   WHERE subreddit_name = %s
+                     AND window_start = %s AND window_end = %s
+                     AND status = 'in_progress'
+               """, (subreddit_name, start_date, end_date))
+
    def collect_subreddit_posts(self, subreddit_name: str,
                              start_date: datetime,
                              end_date: datetime,
                              batch_size: int = 100) -> None:
-       """Collect posts with recovery support"""
+       """Collect posts with recovery support
+
+       A rerun of a window that didn't finish resumes below its checkpoint.
+       """
+       window = (start_date, end_date)
+       started_at = datetime.utcnow()
+       checkpointer = ProgressCheckpointer(
+           lambda name, timestamp, post_id: self.update_progress(
+               name, timestamp, post_id, *window, started_at
+           )
+       )
        try:
-           subreddit = self.reddit.subreddit(subreddit_name)
+           reddit = self._thread_reddit()
+           self._local.subreddit = subreddit_name
+           subreddit = reddit.subreddit(subreddit_name)
            subreddit_id = self.db.ensure_subreddit(subreddit_name)
            
-           # Check for previous progress
-           progress = self.get_collection_progress(subreddit_name)
+           # Posts newer than the checkpoint were committed by the earlier run
+           progress = self.get_collection_progress(subreddit_name, *window)
            if progress:
-               start_date = max(start_date, progress['timestamp'])
+               end_date = min(end_date, progress['timestamp'])
 
            posts_batch = []
            
-           for post in subreddit.new(limit=None):
-               post_date = datetime.fromtimestamp(post.created_utc)
-               
-               if start_date <= post_date <= end_date:
-                   posts_batch.append({
-                       'id': post.id,
-                       'subreddit_id': subreddit_id,
-                       'author': str(post.author) if post.author else '[deleted]',
-                       'title': post.title,
-                       'content': post.selftext,
-                       'created_utc': post_date,
-                       'score': post.score,
-                       'upvote_ratio': post.upvote_ratio,
-                       'is_deleted': post.selftext == '[deleted]'
-                   })
-                   
-                   # Update progress after each post
-                   self.update_progress(subreddit_name, post_date, post.id)
+           # Fetching continues while the pipeline's writer thread commits
+           with WritePipeline(self.db) as pipeline:
+               for index, post in enumerate(subreddit.new(limit=None)):
+                   if index % LISTING_PAGE_SIZE == 0:
+                       # A listing page was just fetched
+                       self._sync_rate_limit(reddit)
+
+                   post_date = datetime.fromtimestamp(post.created_utc)
                    
-                   # Process batch if size reached
-                   if len(posts_batch) >= batch_size:
-                       self.db.batch_insert_posts(posts_batch)
-                       self.collect_comments_for_posts(posts_batch)
-                       posts_batch = []
+                   if start_date <= post_date <= end_date:
+                       post_row = {
+                           'id': post.id,
+                           'subreddit_id': subreddit_id,
+                           'author': str(post.author) if post.author else '[deleted]',
+                           'title': post.title,
+                           'content': post.selftext,
+                           'created_utc': post_date,
+                           'score': post.score,
+                           'upvote_ratio': post.upvote_ratio,
+                           'is_deleted': post.selftext == '[deleted]'
+                       }
+                       posts_batch.append(post_row)
+                       pipeline.put_post(post_row)
                        
-               elif post_date < start_date:
-                   break
-               
-               time.sleep(1)  # Respect rate limits
-               
-           # Process remaining posts
-           if posts_batch:
-               self.db.batch_insert_posts(posts_batch)
-               self.collect_comments_for_posts(posts_batch)
+                       # Process batch if size reached
+                       if len(posts_batch) >= batch_size:
+                           self._collect_batch(subreddit_name, posts_batch,
+                                               pipeline, checkpointer)
+                           posts_batch = []
+                           
+                   elif post_date < start_date:
+                       break
+                   
+               # Process remaining posts
+               if posts_batch:
+                   self._collect_batch(subreddit_name, posts_batch,
+                                       pipeline, checkpointer)
+
+           # Every batch is committed once the pipeline has closed
+           checkpointer.flush()
+           self.complete_progress(subreddit_name, *window)
+
+           # Changed comments show how active already-seen threads still are
+           self.logger.info(
+               f"r/{subreddit_name}: {pipeline.stats['posts_inserted']} new / "
+               f"{pipeline.stats['posts_updated']} changed posts, "
+               f"{pipeline.stats['comments_inserted']} new / "
+               f"{pipeline.stats['comments_updated']} changed comments"
+           )
                
        except Exception as e:
            self.logger.error(f"Error collecting {subreddit_name}: {str(e)}")
            raise
+       finally:
+           # Only positions confirmed by a pipeline barrier are pending here
+           checkpointer.flush()
+
+   def _collect_batch(self, subreddit_name: str, posts_batch: list,
+                      pipeline: WritePipeline,
+                      checkpointer: ProgressCheckpointer) -> None:
+       """Collect comments for a batch, then checkpoint once it is committed"""
+       if self.author_sketches:
+           self.author_sketches.add(subreddit_name, posts_batch)
+       self.collect_comments_for_posts(posts_batch, pipeline=pipeline,
+                                       subreddit_name=subreddit_name)
+       last_post = posts_batch[-1]
+       pipeline.put_barrier(lambda: checkpointer.advance(
+           subreddit_name, last_post['created_utc'], last_post['id']
+       ))
+
+   def collect_comments_for_posts(self, posts: list,
+                                 max_workers: Optional[int] = None,
+                                 pipeline: Optional[WritePipeline] = None,
+                                 subreddit_name: Optional[str] = None) -> None:
+       """Collect comments for a batch of posts, several submissions in flight
+
+       Rows go to pipeline when given, otherwise straight to the database.
+       """
+       workers = max_workers or self.max_workers
+       if workers <= 1 or len(posts) <= 1 or self._executor is None:
+           for post in posts:
+               self._collect_post_comments(post, pipeline, subreddit_name)
+           return
+
+       list(self._executor.map(
+           lambda post: self._collect_post_comments(post, pipeline, subreddit_name),
+           posts
+       ))
+
+   def _collect_post_comments(self, post: Dict,
+                              pipeline: Optional[WritePipeline] = None,
+                              subreddit_name: Optional[str] = None) -> None:
+       """Collect the full comment tree of a single post, logging failures"""
+       try:
+           self.collect_post_comments(post['id'], pipeline, subreddit_name)
+       except Exception as e:
+           self.logger.error(f"Error collecting comments for post {post['id']}: {str(e)}")
+
+   def collect_post_comments(self, post_id: str,
+                             pipeline: Optional[WritePipeline] = None,
+                             subreddit_name: Optional[str] = None) -> None:
+       """Collect the full comment tree of a single post, raising on failure
+
+       subreddit_name, when known, is what the requests are charged to.
+       """
+       write_comments = pipeline.put_comments if pipeline else self.db.batch_insert_comments
+       reddit = self._thread_reddit()
+       comments_batch = []
 
-   def collect_comments_for_posts(self, posts: list) -> None:
-       """Collect comments for a batch of posts"""
-       for post in posts:
-           try:
+       # Every request, each replace_more call included, is charged to
+       # the subreddit once the submission says which it is
+       self._local.subreddit = subreddit_name
+       submission = reddit.submission(id=post_id)
+       self._local.subreddit = subreddit_name = submission.subreddit.display_name
+       submission.comments.replace_more(limit=None)
+       self._sync_rate_limit(reddit)
+
+       for comment in self._traverse_comments(submission.comments):
+           comments_batch.append({
+               'id': comment.id,
+               'post_id': post_id,
+               'parent_comment_id': comment.parent_id.split('_')[1]
+                   if comment.parent_id.startswith('t1_') else None,
+               'author': str(comment.author) if comment.author else '[deleted]',
+               'content': comment.body,
+               'created_utc': datetime.fromtimestamp(comment.created_utc),
+               'score': comment.score,
+               'is_deleted': comment.body == '[deleted]'
+           })
+
+           if len(comments_batch) >= 100:
+               self._write_comments(write_comments, subreddit_name, comments_batch)
                comments_batch = []
-               submission = self.reddit.submission(id=post['id'])
-               submission.comments.replace_more(limit=None)
-               
-               for comment in self._traverse_comments(submission.comments):
-                   comments_batch.append({
-                       'id': comment.id,
-                       'post_id': post['id'],
-                       'parent_comment_id': comment.parent_id.split('_')[1]
-                           if comment.parent_id.startswith('t1_') else None,
-                       'author': str(comment.author) if comment.author else '[deleted]',
-                       'content': comment.body,
-                       'created_utc': datetime.fromtimestamp(comment.created_utc),
-                       'score': comment.score,
-                       'is_deleted': comment.body == '[deleted]'
-                   })
-                   
-                   if len(comments_batch) >= 100:
-                       self.db.batch_insert_comments(comments_batch)
-                       comments_batch = []
-                       
-               if comments_batch:
-                   self.db.batch_insert_comments(comments_batch)
-                   
-               time.sleep(1)  # Respect rate limits
-                   
-           except Exception as e:
-               self.logger.error(f"Error collecting comments for post {post['id']}: {str(e)}")
-               continue
+
+       if comments_batch:
+           self._write_comments(write_comments, subreddit_name, comments_batch)
+
+   def _write_comments(self, write_comments, subreddit_name: str, comments_batch: list) -> None:
+       write_comments(comments_batch)
+       if self.author_sketches:
+           self.author_sketches.add(subreddit_name, comments_batch)
 
    def _traverse_comments(self, comments, level=0) -> Generator:
        """Recursively traverse comment tree"""
@@ -0,0 +1,117 @@
+# sketches.py
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import redis
+from ..config import RedisConfig
+
+# Authors of removed content, not a person
+DELETED_AUTHOR = '[deleted]'
+
+# Standard error of a Redis HyperLogLog (16384 registers), 1.04 / sqrt(16384)
+SKETCH_STANDARD_ERROR = 0.0081
+
+def day_bucket(value: datetime) -> str:
+   return value.strftime('%Y%m%d')
+
+class AuthorSketches:
+   def __init__(self, redis_client, retention_days: int = 90):
+       """Approximate distinct authors per subreddit per day of created_utc
+
+       Each subreddit day is a Redis HyperLogLog, hll:authors:<subreddit>:<YYYYMMDD>,
+       fed with the authors of collected posts and comments. A sketch is
+       at most 12KB however many authors it holds (far less while sparse),
+       and any set of sketches can be unioned, so weekly or monthly counts
+       and counts across subreddits come from the daily ones.
+
+       Counts have a standard error of 0.81%: about 68% of results are
+       within 0.81% of the exact count and 99.7% within 2.43%. Small
+       cardinalities are effectively exact. Adding an author is
+       idempotent, so retried or re-collected batches don't inflate counts.
+       Sketches expire retention_days after their day.
+       """
+       self.redis_client = redis_client
+       self.retention_days = retention_days
+       self.logger = logging.getLogger(__name__)
+
+   def _key(self, subreddit: str, day: str) -> str:
+       return f"hll:authors:{subreddit.lower()}:{day}"
+
+   def add(self, subreddit: str, rows: Iterable[Dict]) -> None:
+       """Add the authors of post or comment rows to their day's sketch
+
+       Errors are logged rather than raised, sketches must never stop
+       collection.
+       """
+       authors = defaultdict(set)
+       for row in rows:
+           author = row.get('author')
+           if author and author != DELETED_AUTHOR and row.get('created_utc'):
+               authors[day_bucket(row['created_utc'])].add(author)
+       if not authors:
+           return
+
+       try:
+           pipe = self.redis_client.pipeline(transaction=False)
+           for day, names in authors.items():
+               key = self._key(subreddit, day)
+               pipe.pfadd(key, *names)
+               expires = datetime.strptime(day, '%Y%m%d') + timedelta(days=self.retention_days + 1)
+               pipe.expireat(key, expires)
+           pipe.execute()
+       except redis.RedisError as e:
+           self.logger.warning(f"Failed to update author sketches for r/{subreddit}: {str(e)}")
+
+   def _range_keys(self, subreddits: List[str], start: datetime, end: datetime) -> List[str]:
+       keys = []
+       day = datetime(start.year, start.month, start.day)
+       while day < end:
+           keys.extend(self._key(subreddit, day_bucket(day)) for subreddit in subreddits)
+           day += timedelta(days=1)
+       return keys
+
+   def count(self, subreddits, start: datetime, end: datetime) -> int:
+       """Distinct authors across the given subreddit(s) and days in [start, end)
+
+       The union is computed by Redis without storing it. Days are whole
+       days: start is rounded down to its day.
+       """
+       if isinstance(subreddits, str):
+           subreddits = [subreddits]
+       keys = self._range_keys(subreddits, start, end)
+       if not keys:
+           return 0
+       return self.redis_client.pfcount(*keys)
+
+   def daily_counts(self, subreddit: str, start: datetime, end: datetime) -> Dict[str, int]:
+       """Distinct authors of each day in [start, end), keyed YYYYMMDD"""
+       keys = self._range_keys([subreddit], start, end)
+       pipe = self.redis_client.pipeline(transaction=False)
+       for key in keys:
+           pipe.pfcount(key)
+       return {key.rsplit(':', 1)[1]: count for key, count in zip(keys, pipe.execute())}
+
+   def merge(self, destination: str, subreddits, start: datetime, end: datetime,
+             ttl: Optional[int] = None) -> int:
+       """Store the union of a range as its own sketch, e.g. for a dashboard
+
+       Returns the count of the merged sketch.
+       """
+       if isinstance(subreddits, str):
+           subreddits = [subreddits]
+       keys = self._range_keys(subreddits, start, end)
+       pipe = self.redis_client.pipeline(transaction=False)
+       pipe.delete(destination)
+       if keys:
+           pipe.pfmerge(destination, *keys)
+       if ttl:
+           pipe.expire(destination, ttl)
+       pipe.pfcount(destination)
+       return pipe.execute()[-1]
+
+def create_author_sketches(config: RedisConfig) -> AuthorSketches:
+   return AuthorSketches(
+       redis.Redis(host=config.host, port=config.port, db=config.db),
+       retention_days=config.author_sketch_retention_days
+   )
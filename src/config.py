@@ -12,7 +12,23 @@ class DatabaseConfig:
    dbname: str = os.getenv('DB_NAME', 'reddit_analyzer')
    user: str = os.getenv('DB_USER', 'postgres')
    password: str = os.getenv('DB_PASSWORD', '')
-   max_connections: int = 10
+   max_connections: int = int(os.getenv('DB_MAX_CONNECTIONS', 10))
+   statement_timeout_ms: int = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 60000))
+   pool_checkout_timeout: float = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', 30))
+   pool_max_idle: float = float(os.getenv('DB_POOL_MAX_IDLE', 30))
+   pool_max_lifetime: float = float(os.getenv('DB_POOL_MAX_LIFETIME', 3600))
+   # Analysis reads get their own pool (and optionally replica) when > 0
+   read_max_connections: int = int(os.getenv('DB_READ_MAX_CONNECTIONS', 0))
+   read_host: str = os.getenv('DB_READ_HOST', '')
+   read_port: int = int(os.getenv('DB_READ_PORT', os.getenv('DB_PORT', 5432)))
+   read_statement_timeout_ms: int = int(os.getenv('DB_READ_STATEMENT_TIMEOUT_MS', 300000))
+   # Batches at least this large are loaded through COPY instead of INSERT.
+   # Matches WritePipeline's flush_size, so its full comment flushes use
+   # COPY; post flushes are cut at every checkpoint barrier (batch_size
+   # posts) and direct comment writes are at most 100 rows, both INSERT.
+   bulk_copy_threshold: int = int(os.getenv('DB_BULK_COPY_THRESHOLD', 500))
+   # posts/comments are range partitioned by month, see db/partitions.py
+   partitioned: bool = os.getenv('DB_PARTITIONED', 'false').lower() in ('1', 'true', 'yes')
 
 @dataclass
 class RedditConfig:
@@ -21,15 +37,35 @@ class RedditConfig:
    username: str = os.getenv('REDDIT_USERNAME', '')
    password: str = os.getenv('REDDIT_PASSWORD', '')
    user_agent: str = f"Script/1.0 (by /u/{os.getenv('REDDIT_USERNAME', '')})"
+   requests_per_minute: int = int(os.getenv('REDDIT_REQUESTS_PER_MINUTE', 100))
+   max_workers: int = int(os.getenv('REDDIT_MAX_WORKERS', 4))
 
 @dataclass
 class RedisConfig:
    host: str = os.getenv('REDIS_HOST', 'localhost')
    port: int = int(os.getenv('REDIS_PORT', 6379))
    db: int = int(os.getenv('REDIS_DB', 0))
+   # Task queue implementation, 'zset' or 'streams' (see src/queue/factory.py)
+   queue_backend: str = os.getenv('QUEUE_BACKEND', 'zset')
+   # Days distinct-author sketches are kept (see src/collector/sketches.py)
+   author_sketch_retention_days: int = int(os.getenv('AUTHOR_SKETCH_RETENTION_DAYS', 90))
+
+@dataclass
+class SchedulerConfig:
+   # Relative shares as name=weight lists, e.g. "python=2,askreddit=0.5";
+   # subreddits not listed get a share of 1
+   subreddit_shares: str = os.getenv('SCHEDULER_SUBREDDIT_SHARES', '')
+   class_shares: str = os.getenv('SCHEDULER_CLASS_SHARES', 'collection=3,refresh=1')
+   # API requests per minute shared by every worker, defaults to the Reddit limit
+   budget_per_minute: float = float(os.getenv(
+       'SCHEDULER_BUDGET_PER_MINUTE', os.getenv('REDDIT_REQUESTS_PER_MINUTE', 100)
+   ))
+   # Tasks allowed to wait in each worker queue, the rest stay in their flow
+   max_queue_depth: int = int(os.getenv('SCHEDULER_MAX_QUEUE_DEPTH', 50))
 
 class Config:
    def __init__(self):
        self.database = DatabaseConfig()
        self.reddit = RedditConfig()
-       self.redis = RedisConfig()
\ No newline at end of file
+       self.redis = RedisConfig()
+       self.scheduler = SchedulerConfig()
\ No newline at end of file
@@ -1,29 +1,104 @@
 # db_handler.py
+import io
 import psycopg2
-import psycopg2.pool
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_values
 from contextlib import contextmanager
 import logging
 from datetime import datetime
+from typing import Dict
 from ..config import DatabaseConfig
+from .pool import ManagedConnectionPool
+from .rollups import ROLLUP_CTES, ROLLUP_RETURNING
+
+POST_COLUMNS = (
+   'id', 'subreddit_id', 'author', 'title', 'content',
+   'created_utc', 'score', 'upvote_ratio', 'is_deleted'
+)
+# {conflict_target} is the table's key, see DatabaseHandler.conflict_target
+POST_CONFLICT_UPDATE = """
+   ON CONFLICT ({conflict_target}) DO UPDATE SET
+       score = EXCLUDED.score,
+       upvote_ratio = EXCLUDED.upvote_ratio,
+       is_deleted = EXCLUDED.is_deleted,
+       last_updated = CURRENT_TIMESTAMP
+   WHERE (posts.score, posts.upvote_ratio, posts.is_deleted)
+       IS DISTINCT FROM (EXCLUDED.score, EXCLUDED.upvote_ratio, EXCLUDED.is_deleted)
+"""
+
+COMMENT_COLUMNS = (
+   'id', 'post_id', 'parent_comment_id', 'author',
+   'content', 'created_utc', 'score', 'is_deleted'
+)
+COMMENT_CONFLICT_UPDATE = """
+   ON CONFLICT ({conflict_target}) DO UPDATE SET
+       score = EXCLUDED.score,
+       is_deleted = EXCLUDED.is_deleted,
+       last_updated = CURRENT_TIMESTAMP
+   WHERE (comments.score, comments.is_deleted)
+       IS DISTINCT FROM (EXCLUDED.score, EXCLUDED.is_deleted)
+"""
+
+# LISTEN/NOTIFY channel signalled when new posts or comments are committed
+NEW_CONTENT_CHANNEL = 'new_content'
+
+# content_type recorded for rows of each table in sentiment_pending
+CONTENT_TYPES = {'posts': 'post', 'comments': 'comment'}
+
+def _copy_value(value) -> str:
+   """Encode a value for COPY ... FROM STDIN in text format"""
+   if value is None:
+       return '\\N'
+   if isinstance(value, bool):
+       return 't' if value else 'f'
+   if isinstance(value, datetime):
+       return value.isoformat(sep=' ')
+   return (str(value)
+           .replace('\\', '\\\\')
+           .replace('\t', '\\t')
+           .replace('\n', '\\n')
+           .replace('\r', '\\r'))
 
 class DatabaseHandler:
    def __init__(self, config: DatabaseConfig):
        self.config = config
-       self.connection_pool = psycopg2.pool.SimpleConnectionPool(
-           minconn=1,
-           maxconn=config.max_connections,
-           host=config.host,
-           port=config.port,
-           dbname=config.dbname,
-           user=config.user,
-           password=config.password
+       self.connection_pool = self._create_pool(
+           config.host, config.port,
+           config.max_connections, config.statement_timeout_ms
        )
+
+       # Heavy analysis reads never compete with collector writes for slots
+       if config.read_max_connections > 0:
+           self.read_pool = self._create_pool(
+               config.read_host or config.host, config.read_port,
+               config.read_max_connections, config.read_statement_timeout_ms
+           )
+       else:
+           self.read_pool = self.connection_pool
+
+       # Partitioned posts/comments are keyed by (id, created_utc), see partitions.py
+       self.conflict_target = 'id, created_utc' if config.partitioned else 'id'
        self.logger = logging.getLogger(__name__)
 
+   def _create_pool(self, host: str, port: int, max_connections: int,
+                    statement_timeout_ms: int) -> ManagedConnectionPool:
+       return ManagedConnectionPool(
+           minconn=1,
+           maxconn=max_connections,
+           statement_timeout_ms=statement_timeout_ms,
+           max_idle=self.config.pool_max_idle,
+           max_lifetime=self.config.pool_max_lifetime,
+           checkout_timeout=self.config.pool_checkout_timeout,
+           host=host,
+           port=port,
+           dbname=self.config.dbname,
+           user=self.config.user,
+           password=self.config.password
+       )
+
    @contextmanager
-   def get_connection(self):
-       conn = self.connection_pool.getconn()
+   def get_connection(self, readonly: bool = False):
+       pool = self.read_pool if readonly else self.connection_pool
+       conn = pool.getconn()
        try:
            yield conn
            conn.commit()
@@ -32,7 +107,17 @@ class DatabaseHandler:
            self.logger.error(f"Database error: {str(e)}")
            raise
        finally:
-           self.connection_pool.putconn(conn)
+           pool.putconn(conn)
+
+   def get_read_connection(self):
+       """Connection from the read pool, for analysis and monitoring queries"""
+       return self.get_connection(readonly=True)
+
+   def get_pool_stats(self) -> Dict[str, Dict]:
+       stats = {'write': self.connection_pool.stats()}
+       if self.read_pool is not self.connection_pool:
+           stats['read'] = self.read_pool.stats()
+       return stats
 
    def ensure_subreddit(self, subreddit_name: str) -> int:
        with self.get_connection() as conn:
@@ -46,70 +131,127 @@ class DatabaseHandler:
                """, (subreddit_name,))
                return cur.fetchone()[0]
 
-   def batch_insert_posts(self, posts: list) -> None:
+   def batch_insert_posts(self, posts: list) -> Dict[str, int]:
+       """Upsert posts, returning inserted/updated/unchanged row counts"""
        if not posts:
-           return
+           return self._upsert_counts(0, 0, 0)
            
-       insert_query = """
-           INSERT INTO posts (
-               id, subreddit_id, author, title, content,
-               created_utc, score, upvote_ratio, is_deleted
-           ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-           ON CONFLICT (id) DO UPDATE SET
-               score = EXCLUDED.score,
-               upvote_ratio = EXCLUDED.upvote_ratio,
-               is_deleted = EXCLUDED.is_deleted,
-               last_updated = CURRENT_TIMESTAMP
-       """
-       
+       rows = self._dedupe_rows(posts, POST_COLUMNS)
+       conflict_update = POST_CONFLICT_UPDATE.format(conflict_target=self.conflict_target)
        with self.get_connection() as conn:
            with conn.cursor() as cur:
-               execute_batch(
-                   cur,
-                   insert_query,
-                   [(
-                       post['id'],
-                       post['subreddit_id'],
-                       post['author'],
-                       post['title'],
-                       post['content'],
-                       post['created_utc'],
-                       post['score'],
-                       post['upvote_ratio'],
-                       post['is_deleted']
-                   ) for post in posts],
-                   page_size=1000
-               )
-
-   def batch_insert_comments(self, comments: list) -> None:
+               if len(rows) >= self.config.bulk_copy_threshold:
+                   counts = self._copy_upsert(cur, 'posts', POST_COLUMNS, rows,
+                                              conflict_update)
+               else:
+                   counts = self._batch_upsert(cur, 'posts', POST_COLUMNS, rows,
+                                               conflict_update)
+               self._notify_new_content(cur, 'posts', counts)
+       return counts
+
+   def batch_insert_comments(self, comments: list) -> Dict[str, int]:
+       """Upsert comments, returning inserted/updated/unchanged row counts"""
        if not comments:
-           return
+           return self._upsert_counts(0, 0, 0)
            
-       insert_query = """
-           INSERT INTO comments (
-               id, post_id, parent_comment_id, author,
-               content, created_utc, score, is_deleted
-           ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-           ON CONFLICT (id) DO UPDATE SET
-               score = EXCLUDED.score,
-               is_deleted = EXCLUDED.is_deleted,
-               last_updated = CURRENT_TIMESTAMP
-       """
-       
+       rows = self._dedupe_rows(comments, COMMENT_COLUMNS)
+       conflict_update = COMMENT_CONFLICT_UPDATE.format(conflict_target=self.conflict_target)
        with self.get_connection() as conn:
            with conn.cursor() as cur:
-               execute_batch(
-                   cur,
-                   insert_query,
-                   [(
-                       comment['id'],
-                       comment['post_id'],
-                       comment['parent_comment_id'],
-                       comment['author'],
-                       comment['content'],
-                       comment['created_utc'],
-                       comment['score'],
-                       comment['is_deleted']
-                   ) for comment in comments],
-                   page_size=1000
-               )
+               if len(rows) >= self.config.bulk_copy_threshold:
+                   counts = self._copy_upsert(cur, 'comments', COMMENT_COLUMNS, rows,
+                                              conflict_update)
+               else:
+                   counts = self._batch_upsert(cur, 'comments', COMMENT_COLUMNS, rows,
+                                               conflict_update)
+               self._notify_new_content(cur, 'comments', counts)
+       return counts
+
+   @staticmethod
+   def _notify_new_content(cur, table: str, counts: Dict[str, int]) -> None:
+       """Wake listening analyzers once this transaction commits"""
+       if counts['inserted']:
+           cur.execute("SELECT pg_notify(%s, %s)", (NEW_CONTENT_CHANNEL, table))
+
+   @staticmethod
+   def _dedupe_rows(records: list, columns: tuple) -> list:
+       """Turn dicts into column-ordered tuples, keeping the last copy of each id"""
+       rows = {}
+       for record in records:
+           rows[record['id']] = tuple(record[column] for column in columns)
+       return list(rows.values())
+
+   @staticmethod
+   def _upsert_counts(total: int, inserted: int, updated: int) -> Dict[str, int]:
+       return {
+           'inserted': inserted,
+           'updated': updated,
+           'unchanged': total - inserted - updated
+       }
+
+   @staticmethod
+   def _counting_upsert(table: str, insert_sql: str) -> str:
+       """Wrap an upsert so it reports how many rows it inserted and updated
+
+       Rows skipped by the conflict clause's WHERE are not returned at all,
+       and xmax is zero only for freshly inserted tuples. New rows are also
+       queued in sentiment_pending so the analyzer finds them by index, and
+       their counts and score changes are added to the hourly rollups.
+       """
+       return f"""
+           WITH upserted AS (
+               {insert_sql}
+               RETURNING id, (xmax = 0) AS inserted, {ROLLUP_RETURNING[table]}
+           ), pending AS (
+               INSERT INTO sentiment_pending (content_id, content_type)
+               SELECT id, '{CONTENT_TYPES[table]}' FROM upserted WHERE inserted
+               ON CONFLICT DO NOTHING
+           ), {ROLLUP_CTES[table]}
+           SELECT
+               COUNT(*) FILTER (WHERE inserted),
+               COUNT(*) FILTER (WHERE NOT inserted)
+           FROM upserted
+       """
+
+   def _batch_upsert(self, cur, table: str, columns: tuple,
+                     rows: list, conflict_update: str) -> Dict[str, int]:
+       insert_query = self._counting_upsert(table, f"""
+           INSERT INTO {table} ({', '.join(columns)})
+           VALUES %s
+           {conflict_update}
+       """)
+       pages = execute_values(cur, insert_query, rows, page_size=1000, fetch=True)
+       return self._upsert_counts(
+           len(rows),
+           sum(page[0] for page in pages),
+           sum(page[1] for page in pages)
+       )
+
+   def _copy_upsert(self, cur, table: str, columns: tuple,
+                    rows: list, conflict_update: str) -> Dict[str, int]:
+       """Stream rows into a temp staging table with COPY, then merge in one statement"""
+       column_list = ', '.join(columns)
+       staging = f"staging_{table}"
+
+       # Temp tables skip WAL; the table is kept per session and emptied on commit
+       cur.execute(f"""
+           CREATE TEMP TABLE IF NOT EXISTS {staging}
+           (LIKE {table} INCLUDING DEFAULTS)
+           ON COMMIT DELETE ROWS
+       """)
+
+       buffer = io.StringIO()
+       for row in rows:
+           buffer.write('\t'.join(_copy_value(value) for value in row))
+           buffer.write('\n')
+       buffer.seek(0)
+       cur.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN", buffer)
+
+       cur.execute(self._counting_upsert(table, f"""
+           INSERT INTO {table} ({column_list})
+           SELECT {column_list} FROM {staging}
+           {conflict_update}
+       """))
+       inserted, updated = cur.fetchone()
+       self.logger.debug(f"Bulk loaded {len(rows)} rows into {table}")
+       return self._upsert_counts(len(rows), inserted, updated)
@@ -0,0 +1,382 @@
+# migrations.py
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import psycopg2
+from ..config import DatabaseConfig
+from .partitions import PARTITIONED_DDL
+
+# pg_advisory_lock key held while migrating, so runners started together
+# (e.g. by several workers) apply each migration once
+MIGRATION_LOCK_KEY = 7319001
+
+HEAP_DDL = {
+   'posts': """
+       CREATE TABLE IF NOT EXISTS posts (
+           id VARCHAR(50) PRIMARY KEY,
+           subreddit_id INTEGER REFERENCES subreddits(id),
+           author VARCHAR(50),
+           title TEXT,
+           content TEXT,
+           created_utc TIMESTAMP,
+           score INTEGER,
+           upvote_ratio FLOAT,
+           is_deleted BOOLEAN DEFAULT FALSE,
+           last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+       );
+       CREATE INDEX IF NOT EXISTS idx_posts_created_utc ON posts(created_utc);
+   """,
+   'comments': """
+       CREATE TABLE IF NOT EXISTS comments (
+           id VARCHAR(50) PRIMARY KEY,
+           post_id VARCHAR(50) REFERENCES posts(id),
+           parent_comment_id VARCHAR(50) REFERENCES comments(id),
+           author VARCHAR(50),
+           content TEXT,
+           created_utc TIMESTAMP,
+           score INTEGER,
+           is_deleted BOOLEAN DEFAULT FALSE,
+           last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+       );
+       CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
+   """
+}
+
+@dataclass(frozen=True)
+class Index:
+   name: str
+   table: str
+   columns: str
+   where: Optional[str] = None
+
+@dataclass(frozen=True)
+class Migration:
+   """One schema version
+
+   statements run in a single transaction. indexes are then built with
+   CREATE INDEX CONCURRENTLY, which can't run in a transaction, so writers
+   aren't blocked while they build. The version is recorded once both are done.
+   """
+   version: int
+   name: str
+   statements: Tuple[str, ...] = ()
+   indexes: Tuple[Index, ...] = ()
+
+def schema_migrations(partitioned: bool) -> List[Migration]:
+   """Every migration in version order
+
+   Append new versions, never edit applied ones. Statements use IF NOT
+   EXISTS so version 1 adopts databases created before versioning.
+   """
+   content_ddl = PARTITIONED_DDL if partitioned else HEAP_DDL
+   return [
+       Migration(1, 'initial_schema', statements=(
+           """
+           CREATE TABLE IF NOT EXISTS subreddits (
+               id SERIAL PRIMARY KEY,
+               name VARCHAR(50) UNIQUE NOT NULL,
+               description TEXT,
+               last_scan_time TIMESTAMP
+           )
+           """,
+           content_ddl['posts'],
+           content_ddl['comments'],
+           """
+           CREATE TABLE IF NOT EXISTS collection_progress (
+               id SERIAL PRIMARY KEY,
+               subreddit_name VARCHAR(50),
+               last_collected_timestamp TIMESTAMP,
+               last_post_id VARCHAR(50),
+               status VARCHAR(20),
+               worker_id UUID,
+               started_at TIMESTAMP,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               UNIQUE(subreddit_name, worker_id)
+           );
+           CREATE INDEX IF NOT EXISTS idx_collection_progress_worker
+               ON collection_progress(worker_id);
+           """,
+           """
+           CREATE TABLE IF NOT EXISTS content_sentiment (
+               id SERIAL PRIMARY KEY,
+               content_id VARCHAR(50) NOT NULL,
+               content_type VARCHAR(10) NOT NULL,
+               compound_score FLOAT NOT NULL,
+               positive_score FLOAT NOT NULL,
+               neutral_score FLOAT NOT NULL,
+               negative_score FLOAT NOT NULL,
+               processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               UNIQUE(content_id, content_type)
+           )
+           """,
+           """
+           CREATE TABLE IF NOT EXISTS sentiment_pending (
+               id BIGSERIAL PRIMARY KEY,
+               content_id VARCHAR(50) NOT NULL,
+               content_type VARCHAR(10) NOT NULL,
+               enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               claimed_by VARCHAR(64),
+               claimed_at TIMESTAMP,
+               UNIQUE(content_id, content_type)
+           );
+           ALTER TABLE sentiment_pending ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(64);
+           ALTER TABLE sentiment_pending ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+           """,
+           """
+           CREATE TABLE IF NOT EXISTS failed_tasks (
+               task_id VARCHAR(36) PRIMARY KEY,
+               task_type VARCHAR(50) NOT NULL,
+               attempts INTEGER NOT NULL,
+               last_error TEXT,
+               failed_at TIMESTAMP,
+               payload JSONB NOT NULL,
+               archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )
+           """,
+           # Queue content collected before sentiment_pending existed
+           """
+           INSERT INTO sentiment_pending (content_id, content_type)
+           SELECT p.id, 'post' FROM posts p
+           WHERE NOT EXISTS (
+               SELECT 1 FROM content_sentiment cs
+               WHERE cs.content_id = p.id AND cs.content_type = 'post'
+           )
+           ON CONFLICT DO NOTHING;
+
+           INSERT INTO sentiment_pending (content_id, content_type)
+           SELECT c.id, 'comment' FROM comments c
+           WHERE NOT EXISTS (
+               SELECT 1 FROM content_sentiment cs
+               WHERE cs.content_id = c.id AND cs.content_type = 'comment'
+           )
+           ON CONFLICT DO NOTHING;
+           """
+       )),
+       Migration(2, 'query_indexes', indexes=(
+           # Analyzer/loader date ranges filtered by subreddit, and the
+           # per-subreddit counts in monitor.py; also serves subreddit_id alone
+           Index('idx_posts_subreddit_created', 'posts', 'subreddit_id, created_utc'),
+           Index('idx_comments_created_utc', 'comments', 'created_utc'),
+           # Thread walks, top-level comments have no parent
+           Index('idx_comments_parent_comment_id', 'comments', 'parent_comment_id',
+                 where='parent_comment_id IS NOT NULL'),
+           Index('idx_posts_author', 'posts', 'author'),
+           Index('idx_comments_author', 'comments', 'author'),
+           # Collector resume point: latest progress row of a subreddit
+           Index('idx_collection_progress_subreddit', 'collection_progress',
+                 'subreddit_name, updated_at DESC'),
+           # monitor.py's recently active collectors
+           Index('idx_collection_progress_updated', 'collection_progress', 'updated_at')
+       )),
+       # Kept current by inserts and sentiment writes, see db/rollups.py.
+       # Existing data is aggregated with scripts/rebuild_rollups.py.
+       Migration(3, 'hourly_rollups', statements=(
+           """
+           CREATE TABLE IF NOT EXISTS subreddit_hourly_stats (
+               subreddit_id INTEGER NOT NULL REFERENCES subreddits(id),
+               hour TIMESTAMP NOT NULL,
+               post_count INTEGER NOT NULL DEFAULT 0,
+               comment_count INTEGER NOT NULL DEFAULT 0,
+               post_score_sum BIGINT NOT NULL DEFAULT 0,
+               comment_score_sum BIGINT NOT NULL DEFAULT 0,
+               sentiment_count INTEGER NOT NULL DEFAULT 0,
+               sentiment_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+               active_authors INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (subreddit_id, hour)
+           );
+           CREATE INDEX IF NOT EXISTS idx_subreddit_hourly_stats_hour
+               ON subreddit_hourly_stats(hour);
+           """,
+           # Distinct authors seen per subreddit hour, so active_authors
+           # only grows for authors not counted yet
+           """
+           CREATE TABLE IF NOT EXISTS subreddit_hourly_authors (
+               subreddit_id INTEGER NOT NULL,
+               hour TIMESTAMP NOT NULL,
+               author VARCHAR(50) NOT NULL,
+               PRIMARY KEY (subreddit_id, hour, author)
+           )
+           """
+       )),
+       # The [start, end] window a progress row checkpoints, so only a rerun
+       # of the same window resumes from it
+       Migration(4, 'collection_progress_window', statements=(
+           """
+           ALTER TABLE collection_progress
+               ADD COLUMN IF NOT EXISTS window_start TIMESTAMP,
+               ADD COLUMN IF NOT EXISTS window_end TIMESTAMP
+           """,
+       )),
+       # How often each pending row has been claimed, so content that never
+       # scores stops being handed out, see SentimentAnalyzer.max_attempts
+       Migration(5, 'sentiment_pending_attempts', statements=(
+           """
+           ALTER TABLE sentiment_pending
+               ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0
+           """,
+       ))
+   ]
+
+class MigrationRunner:
+   def __init__(self, config: DatabaseConfig):
+       """Apply pending schema migrations, recorded in schema_migrations
+
+       Runs over its own connection, without the pool's statement timeout
+       since index builds on large tables take a while.
+       """
+       self.config = config
+       self.migrations = schema_migrations(config.partitioned)
+       self.logger = logging.getLogger(__name__)
+
+   def _connect(self):
+       conn = psycopg2.connect(
+           host=self.config.host,
+           port=self.config.port,
+           dbname=self.config.dbname,
+           user=self.config.user,
+           password=self.config.password,
+           options='-c statement_timeout=0'
+       )
+       conn.autocommit = True
+       with conn.cursor() as cur:
+           cur.execute("""
+               CREATE TABLE IF NOT EXISTS schema_migrations (
+                   version INTEGER PRIMARY KEY,
+                   name VARCHAR(100) NOT NULL,
+                   applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )
+           """)
+       return conn
+
+   def applied(self) -> Dict[int, str]:
+       """Name of each applied version"""
+       conn = self._connect()
+       try:
+           with conn.cursor() as cur:
+               return self._applied(cur)
+       finally:
+           conn.close()
+
+   @staticmethod
+   def _applied(cur) -> Dict[int, str]:
+       cur.execute("SELECT version, name FROM schema_migrations ORDER BY version")
+       return dict(cur.fetchall())
+
+   def pending(self) -> List[Migration]:
+       applied = self.applied()
+       return [m for m in self.migrations if m.version not in applied]
+
+   def migrate(self, target: Optional[int] = None) -> List[int]:
+       """Apply every pending migration up to target (default all)
+
+       Returns the versions applied.
+       """
+       conn = self._connect()
+       done = []
+       try:
+           with conn.cursor() as cur:
+               cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+               applied = self._applied(cur)
+               for migration in self.migrations:
+                   if migration.version in applied:
+                       continue
+                   if target is not None and migration.version > target:
+                       break
+                   self.logger.info(f"Applying migration {migration.version} ({migration.name})")
+                   self._apply(conn, migration)
+                   done.append(migration.version)
+       finally:
+           # Closing the session releases the advisory lock
+           conn.close()
+       return done
+
+   def ensure_indexes(self) -> None:
+       """Rebuild any missing index of the applied migrations
+
+       For tables recreated outside of migrations, such as posts and
+       comments after PartitionManager.migrate.
+       """
+       conn = self._connect()
+       try:
+           with conn.cursor() as cur:
+               applied = self._applied(cur)
+               for migration in self.migrations:
+                   if migration.version in applied:
+                       for index in migration.indexes:
+                           self._build_index(cur, index)
+       finally:
+           conn.close()
+
+   def _apply(self, conn, migration: Migration) -> None:
+       record = """
+           INSERT INTO schema_migrations (version, name) VALUES (%s, %s)
+       """
+       if migration.statements:
+           conn.autocommit = False
+           try:
+               with conn:
+                   with conn.cursor() as cur:
+                       for statement in migration.statements:
+                           cur.execute(statement)
+                       if not migration.indexes:
+                           cur.execute(record, (migration.version, migration.name))
+           finally:
+               conn.autocommit = True
+
+       if migration.indexes:
+           with conn.cursor() as cur:
+               for index in migration.indexes:
+                   self._build_index(cur, index)
+               cur.execute(record, (migration.version, migration.name))
+
+   def _build_index(self, cur, index: Index) -> None:
+       """Build an index without blocking writes, resuming failed builds
+
+       CONCURRENTLY isn't supported on a partitioned table, so its index is
+       created on the parent only, built concurrently on each partition and
+       attached. Partitions created later get it on ATTACH.
+       """
+       where = f" WHERE {index.where}" if index.where else ""
+       cur.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", (index.table,))
+       if cur.fetchone()[0] != 'p':
+           self._drop_invalid(cur, index.name)
+           cur.execute(f"""
+               CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name}
+               ON {index.table} ({index.columns}){where}
+           """)
+           return
+
+       cur.execute(f"""
+           CREATE INDEX IF NOT EXISTS {index.name}
+           ON ONLY {index.table} ({index.columns}){where}
+       """)
+       cur.execute("""
+           SELECT c.relname
+           FROM pg_inherits i
+           JOIN pg_class c ON c.oid = i.inhrelid
+           WHERE i.inhparent = %s::regclass
+       """, (index.table,))
+       for (partition,) in cur.fetchall():
+           child = f"{index.name}_{partition}"
+           self._drop_invalid(cur, child)
+           cur.execute(f"""
+               CREATE INDEX CONCURRENTLY IF NOT EXISTS {child}
+               ON {partition} ({index.columns}){where}
+           """)
+           cur.execute(f"ALTER INDEX {index.name} ATTACH PARTITION {child}")
+
+   def _drop_invalid(self, cur, name: str) -> None:
+       """Drop what an interrupted concurrent build left behind
+
+       IF NOT EXISTS would otherwise keep the invalid index forever.
+       """
+       cur.execute("""
+           SELECT NOT i.indisvalid
+           FROM pg_index i
+           JOIN pg_class c ON c.oid = i.indexrelid
+           WHERE c.relname = %s AND c.relkind = 'i'
+       """, (name,))
+       row = cur.fetchone()
+       if row and row[0]:
+           self.logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+           cur.execute(f"DROP INDEX CONCURRENTLY {name}")
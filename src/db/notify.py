@@ -0,0 +1,66 @@
+# notify.py
+import logging
+import select
+import threading
+from typing import Optional
+import psycopg2
+from ..config import DatabaseConfig
+
+class NotificationListener:
+   def __init__(self, config: DatabaseConfig, channel: str):
+       """LISTEN on a Postgres channel over a dedicated connection
+
+       Pooled connections can't be used: notifications are delivered to
+       the session that issued LISTEN, so this one stays open and idle.
+       """
+       self.config = config
+       self.channel = channel
+       self.logger = logging.getLogger(__name__)
+       self._conn = None
+
+   def _connect(self) -> None:
+       self._conn = psycopg2.connect(
+           host=self.config.host,
+           port=self.config.port,
+           dbname=self.config.dbname,
+           user=self.config.user,
+           password=self.config.password
+       )
+       self._conn.autocommit = True
+       with self._conn.cursor() as cur:
+           cur.execute(f'LISTEN "{self.channel}"')
+
+   def wait(self, timeout: float, stop_event: Optional[threading.Event] = None) -> bool:
+       """Block until a notification arrives, returns False on timeout
+
+       Waits in short slices so a stop_event set from a signal handler is
+       noticed promptly. Connection errors are logged and reported as a
+       timeout, the next call reconnects.
+       """
+       remaining = timeout
+       while remaining > 0 and not (stop_event and stop_event.is_set()):
+           slice_timeout = min(remaining, 1.0)
+           remaining -= slice_timeout
+           try:
+               if self._conn is None or self._conn.closed:
+                   self._connect()
+               if select.select([self._conn], [], [], slice_timeout) == ([], [], []):
+                   continue
+               self._conn.poll()
+               if self._conn.notifies:
+                   self._conn.notifies.clear()
+                   return True
+           except psycopg2.Error as e:
+               self.logger.warning(f"Lost notification connection: {str(e)}")
+               self.close()
+               # Back off for the slice rather than reconnecting in a tight loop
+               (stop_event or threading.Event()).wait(slice_timeout)
+       return False
+
+   def close(self) -> None:
+       if self._conn is not None:
+           try:
+               self._conn.close()
+           except psycopg2.Error:
+               pass
+           self._conn = None
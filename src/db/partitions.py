@@ -0,0 +1,273 @@
+# partitions.py
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from .handler import CONTENT_TYPES
+
+# Columns copied when migrating each table, in table order
+TABLE_COLUMNS = {
+   'posts': (
+       'id', 'subreddit_id', 'author', 'title', 'content', 'created_utc',
+       'score', 'upvote_ratio', 'is_deleted', 'last_updated'
+   ),
+   'comments': (
+       'id', 'post_id', 'parent_comment_id', 'author', 'content',
+       'created_utc', 'score', 'is_deleted', 'last_updated'
+   )
+}
+
+# Partitioned tables are keyed by (id, created_utc) since a primary key
+# must include the partition key. Foreign keys to posts/comments can't
+# reference id alone any more and are dropped.
+PARTITIONED_DDL = {
+   'posts': """
+       CREATE TABLE IF NOT EXISTS posts (
+           id VARCHAR(50) NOT NULL,
+           subreddit_id INTEGER REFERENCES subreddits(id),
+           author VARCHAR(50),
+           title TEXT,
+           content TEXT,
+           created_utc TIMESTAMP NOT NULL,
+           score INTEGER,
+           upvote_ratio FLOAT,
+           is_deleted BOOLEAN DEFAULT FALSE,
+           last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           PRIMARY KEY (id, created_utc)
+       ) PARTITION BY RANGE (created_utc);
+       CREATE TABLE IF NOT EXISTS posts_default PARTITION OF posts DEFAULT;
+       CREATE INDEX IF NOT EXISTS idx_posts_created_utc ON posts(created_utc);
+   """,
+   'comments': """
+       CREATE TABLE IF NOT EXISTS comments (
+           id VARCHAR(50) NOT NULL,
+           post_id VARCHAR(50),
+           parent_comment_id VARCHAR(50),
+           author VARCHAR(50),
+           content TEXT,
+           created_utc TIMESTAMP NOT NULL,
+           score INTEGER,
+           is_deleted BOOLEAN DEFAULT FALSE,
+           last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           PRIMARY KEY (id, created_utc)
+       ) PARTITION BY RANGE (created_utc);
+       CREATE TABLE IF NOT EXISTS comments_default PARTITION OF comments DEFAULT;
+       CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
+   """
+}
+
+def month_start(value: datetime) -> datetime:
+   return datetime(value.year, value.month, 1)
+
+def add_months(value: datetime, months: int) -> datetime:
+   month = value.month - 1 + months
+   return datetime(value.year + month // 12, month % 12 + 1, 1)
+
+def partition_name(table: str, start: datetime) -> str:
+   return f"{table}_{start:%Y_%m}"
+
+class PartitionManager:
+   def __init__(self, db_handler):
+       """Create, list and retire the monthly partitions of posts and comments
+
+       Each month gets a partition named <table>_YYYY_MM over
+       [month start, next month start). Rows outside every month land in
+       <table>_default; creating a partition moves any of them it covers,
+       so partitions can be added at any time.
+       """
+       self.db = db_handler
+       self.logger = logging.getLogger(__name__)
+
+   def list_partitions(self, table: str) -> List[Tuple[str, str]]:
+       """(partition name, bound expression) of each partition, oldest first"""
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               cur.execute("""
+                   SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                   FROM pg_inherits i
+                   JOIN pg_class c ON c.oid = i.inhrelid
+                   WHERE i.inhparent = %s::regclass
+                   ORDER BY c.relname
+               """, (table,))
+               return cur.fetchall()
+
+   def create_partition(self, cur, table: str, start: datetime) -> bool:
+       """Create the partition for the month starting at start, if missing
+
+       Returns whether a partition was created.
+       """
+       name = partition_name(table, start)
+       cur.execute("SELECT to_regclass(%s)", (name,))
+       if cur.fetchone()[0]:
+           return False
+
+       end = add_months(start, 1)
+       # Built detached so rows already in the default partition for this
+       # month can be moved in before it is attached
+       cur.execute(f"""
+           CREATE TABLE {name}
+           (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+       """)
+       cur.execute(f"""
+           WITH moved AS (
+               DELETE FROM {table}_default
+               WHERE created_utc >= %s AND created_utc < %s
+               RETURNING *
+           )
+           INSERT INTO {name} SELECT * FROM moved
+       """, (start, end))
+       if cur.rowcount:
+           self.logger.info(f"Moved {cur.rowcount} rows from {table}_default into {name}")
+       cur.execute(f"""
+           ALTER TABLE {table} ATTACH PARTITION {name}
+           FOR VALUES FROM (%s) TO (%s)
+       """, (start, end))
+       return True
+
+   def ensure_partitions(self, months_ahead: int = 3,
+                         since: Optional[datetime] = None) -> int:
+       """Make sure partitions exist from since (default this month) to months_ahead
+
+       Run at startup and periodically, so rows never pile up in the
+       default partition. Returns the number of partitions created.
+       """
+       first = month_start(since or datetime.utcnow())
+       last = add_months(month_start(datetime.utcnow()), months_ahead)
+       created = 0
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               for table in TABLE_COLUMNS:
+                   month = first
+                   while month <= last:
+                       created += self.create_partition(cur, table, month)
+                       month = add_months(month, 1)
+       if created:
+           self.logger.info(f"Created {created} partitions")
+       return created
+
+   def detach_before(self, cutoff: datetime, drop: bool = False) -> List[str]:
+       """Detach (and optionally drop) every monthly partition ending by cutoff
+
+       Retention is a catalog operation: no rows are deleted, and detached
+       partitions can be archived and dropped separately. Their rows still
+       waiting in sentiment_pending are removed, as the analyzer can no
+       longer see them. Returns the names of the partitions detached.
+       """
+       detached = []
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               for table in TABLE_COLUMNS:
+                   cur.execute("""
+                       SELECT c.relname
+                       FROM pg_inherits i
+                       JOIN pg_class c ON c.oid = i.inhrelid
+                       WHERE i.inhparent = %s::regclass
+                         AND c.relname ~ '_[0-9]{4}_[0-9]{2}$'
+                       ORDER BY c.relname
+                   """, (table,))
+                   for (name,) in cur.fetchall():
+                       start = datetime.strptime(name[-7:], '%Y_%m')
+                       if add_months(start, 1) > cutoff:
+                           continue
+                       cur.execute(f"""
+                           DELETE FROM sentiment_pending q
+                           USING {name} t
+                           WHERE q.content_type = %s AND q.content_id = t.id
+                       """, (CONTENT_TYPES[table],))
+                       cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                       if drop:
+                           cur.execute(f"DROP TABLE {name}")
+                       detached.append(name)
+       if detached:
+           action = 'Dropped' if drop else 'Detached'
+           self.logger.info(f"{action} partitions: {', '.join(detached)}")
+       return detached
+
+   def migrate(self, months_ahead: int = 3) -> None:
+       """Convert existing heap posts/comments tables to partitioned ones
+
+       The old tables are renamed to <table>_legacy, partitioned tables are
+       created in their place and rows are copied one month per
+       transaction, so a failed run can be resumed. Legacy tables are left
+       for the operator to verify and drop. Set DB_PARTITIONED=true once
+       this completes.
+       """
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               for table in TABLE_COLUMNS:
+                   cur.execute("SELECT to_regclass(%s)", (f"{table}_legacy",))
+                   if cur.fetchone()[0]:
+                       continue
+                   cur.execute("""
+                       SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)
+                   """, (table,))
+                   row = cur.fetchone()
+                   if row and row[0] == 'p':
+                       continue
+                   self._retire_table(cur, table)
+
+               for table, ddl in PARTITIONED_DDL.items():
+                   cur.execute(ddl)
+
+       for table in TABLE_COLUMNS:
+           self._copy_legacy(table, months_ahead)
+
+   def _retire_table(self, cur, table: str) -> None:
+       """Rename a heap table and its indexes out of the way"""
+       # Foreign keys between posts and comments can't survive partitioning
+       cur.execute("""
+           SELECT conrelid::regclass::text, conname
+           FROM pg_constraint
+           WHERE contype = 'f'
+             AND (conrelid = %s::regclass OR confrelid = %s::regclass)
+       """, (table, table))
+       for owner, constraint in cur.fetchall():
+           cur.execute(f'ALTER TABLE {owner} DROP CONSTRAINT "{constraint}"')
+
+       cur.execute("""
+           SELECT indexname FROM pg_indexes WHERE tablename = %s
+       """, (table,))
+       for (index,) in cur.fetchall():
+           cur.execute(f'ALTER INDEX "{index}" RENAME TO "{index}_legacy"')
+       cur.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+       self.logger.info(f"Renamed {table} to {table}_legacy")
+
+   def _copy_legacy(self, table: str, months_ahead: int) -> None:
+       legacy = f"{table}_legacy"
+       columns = TABLE_COLUMNS[table]
+       column_list = ', '.join(columns)
+       # created_utc is part of the key now, rows without one use last_updated
+       select_list = ', '.join(
+           'COALESCE(created_utc, last_updated, CURRENT_TIMESTAMP)'
+           if column == 'created_utc' else column
+           for column in columns
+       )
+
+       with self.db.get_connection() as conn:
+           with conn.cursor() as cur:
+               cur.execute(f"""
+                   SELECT MIN(COALESCE(created_utc, last_updated, CURRENT_TIMESTAMP))
+                   FROM {legacy}
+               """)
+               oldest = cur.fetchone()[0]
+       if oldest is None:
+           return
+
+       self.ensure_partitions(months_ahead, since=oldest)
+       month = month_start(oldest)
+       last = add_months(month_start(datetime.utcnow()), months_ahead)
+       while month <= last:
+           # Anything past the last partition goes to the default partition
+           end = add_months(month, 1) if month < last else datetime.max
+           with self.db.get_connection() as conn:
+               with conn.cursor() as cur:
+                   cur.execute("SET LOCAL statement_timeout = 0")
+                   cur.execute(f"""
+                       INSERT INTO {table} ({column_list})
+                       SELECT {select_list} FROM {legacy}
+                       WHERE COALESCE(created_utc, last_updated, CURRENT_TIMESTAMP) >= %s
+                         AND COALESCE(created_utc, last_updated, CURRENT_TIMESTAMP) < %s
+                       ON CONFLICT DO NOTHING
+                   """, (month, end))
+                   if cur.rowcount:
+                       self.logger.info(f"Copied {cur.rowcount} {table} rows for {month:%Y-%m}")
+           month = add_months(month, 1)
@@ -0,0 +1,136 @@
+# pool.py
+import logging
+import threading
+import time
+from typing import Dict
+import psycopg2
+import psycopg2.pool
+
+class ManagedConnectionPool:
+   def __init__(self, minconn: int, maxconn: int,
+                statement_timeout_ms: int = 0,
+                max_idle: float = 30.0,
+                max_lifetime: float = 3600.0,
+                checkout_timeout: float = 30.0,
+                **connect_kwargs):
+       """Thread-safe pool that validates and recycles its connections
+
+       Checkouts block up to checkout_timeout seconds for a free slot instead
+       of failing immediately. Connections older than max_lifetime are
+       recycled, ones idle for longer than max_idle are pinged before being
+       handed out, and every connection runs with statement_timeout_ms.
+       """
+       self.maxconn = maxconn
+       self.max_idle = max_idle
+       self.max_lifetime = max_lifetime
+       self.checkout_timeout = checkout_timeout
+       self.logger = logging.getLogger(__name__)
+
+       self._pool = psycopg2.pool.ThreadedConnectionPool(
+           minconn, maxconn,
+           options=f"-c statement_timeout={int(statement_timeout_ms)}",
+           **connect_kwargs
+       )
+       self._slots = threading.BoundedSemaphore(maxconn)
+       self._lock = threading.Lock()
+       self._created: Dict = {}
+       self._returned: Dict = {}
+       self._stats = {
+           'checkouts': 0,
+           'in_use': 0,
+           'wait_time_total': 0.0,
+           'wait_time_max': 0.0,
+           'checkout_timeouts': 0,
+           'recycled': 0,
+           'validation_failures': 0
+       }
+
+   def getconn(self):
+       started = time.monotonic()
+       if not self._slots.acquire(timeout=self.checkout_timeout):
+           with self._lock:
+               self._stats['checkout_timeouts'] += 1
+           raise psycopg2.pool.PoolError(
+               f"Timed out after {self.checkout_timeout}s waiting for a connection"
+           )
+
+       try:
+           conn = self._checkout_healthy()
+       except Exception:
+           self._slots.release()
+           raise
+
+       waited = time.monotonic() - started
+       with self._lock:
+           self._stats['checkouts'] += 1
+           self._stats['in_use'] += 1
+           self._stats['wait_time_total'] += waited
+           self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+       return conn
+
+   def putconn(self, conn, close: bool = False) -> None:
+       try:
+           if close or conn.closed:
+               self._discard(conn)
+           else:
+               with self._lock:
+                   self._returned[conn] = time.monotonic()
+               self._pool.putconn(conn)
+       finally:
+           with self._lock:
+               self._stats['in_use'] -= 1
+           self._slots.release()
+
+   def closeall(self) -> None:
+       self._pool.closeall()
+
+   def stats(self) -> Dict:
+       """Checkout counts and wait times since the pool was created"""
+       with self._lock:
+           stats = dict(self._stats)
+       stats['max_connections'] = self.maxconn
+       stats['wait_time_avg'] = (
+           stats['wait_time_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+       )
+       return stats
+
+   def _checkout_healthy(self):
+       # Every slot may hold a dead connection, plus one fresh attempt
+       for _ in range(self.maxconn + 1):
+           conn = self._pool.getconn()
+           if self._is_healthy(conn):
+               return conn
+           self._discard(conn)
+       raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+
+   def _is_healthy(self, conn) -> bool:
+       if conn.closed:
+           return False
+
+       now = time.monotonic()
+       with self._lock:
+           created = self._created.setdefault(conn, now)
+           returned = self._returned.get(conn, now)
+
+       if now - created > self.max_lifetime:
+           with self._lock:
+               self._stats['recycled'] += 1
+           return False
+
+       if now - returned > self.max_idle:
+           try:
+               with conn.cursor() as cur:
+                   cur.execute("SELECT 1")
+               conn.rollback()
+           except psycopg2.Error as e:
+               self.logger.warning(f"Discarding stale database connection: {str(e)}")
+               with self._lock:
+                   self._stats['validation_failures'] += 1
+               return False
+       return True
+
+   def _discard(self, conn) -> None:
+       with self._lock:
+           self._created.pop(conn, None)
+           self._returned.pop(conn, None)
+       self._pool.putconn(conn, close=True)
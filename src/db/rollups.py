@@ -0,0 +1,283 @@
+# rollups.py
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Extra RETURNING columns the rollup CTEs need from a post/comment upsert
+ROLLUP_RETURNING = {
+   'posts': 'subreddit_id, author, created_utc, score',
+   'comments': 'post_id, author, created_utc, score'
+}
+
+# Per row subreddit and hour of an upsert, and its score change. All CTEs
+# of a statement share one snapshot, so reading the table here still sees
+# the scores from before the upsert.
+_POST_CHANGES = """
+   changes AS (
+       SELECT
+           u.subreddit_id,
+           date_trunc('hour', u.created_utc) AS hour,
+           u.author,
+           u.inserted,
+           COALESCE(u.score, 0) - COALESCE(t.score, 0) AS score_delta
+       FROM upserted u
+       LEFT JOIN posts t ON t.id = u.id
+       WHERE u.subreddit_id IS NOT NULL AND u.created_utc IS NOT NULL
+   )
+"""
+
+_COMMENT_CHANGES = """
+   changes AS (
+       SELECT
+           p.subreddit_id,
+           date_trunc('hour', u.created_utc) AS hour,
+           u.author,
+           u.inserted,
+           COALESCE(u.score, 0) - COALESCE(t.score, 0) AS score_delta
+       FROM upserted u
+       JOIN posts p ON p.id = u.post_id
+       LEFT JOIN comments t ON t.id = u.id
+       WHERE p.subreddit_id IS NOT NULL AND u.created_utc IS NOT NULL
+   )
+"""
+
+_CONTENT_ROLLUP = """
+   new_authors AS (
+       INSERT INTO subreddit_hourly_authors (subreddit_id, hour, author)
+       SELECT DISTINCT subreddit_id, hour, author
+       FROM changes
+       WHERE inserted AND author IS NOT NULL
+       ON CONFLICT DO NOTHING
+       RETURNING subreddit_id, hour
+   ), rollup AS (
+       INSERT INTO subreddit_hourly_stats AS s
+           (subreddit_id, hour, {count_column}, {score_column}, active_authors)
+       SELECT d.subreddit_id, d.hour, d.created, d.score_delta, COALESCE(a.authors, 0)
+       FROM (
+           SELECT
+               subreddit_id,
+               hour,
+               COUNT(*) FILTER (WHERE inserted) AS created,
+               SUM(score_delta) AS score_delta
+           FROM changes
+           GROUP BY subreddit_id, hour
+       ) d
+       LEFT JOIN (
+           SELECT subreddit_id, hour, COUNT(*) AS authors
+           FROM new_authors
+           GROUP BY subreddit_id, hour
+       ) a ON a.subreddit_id = d.subreddit_id AND a.hour = d.hour
+       ORDER BY d.subreddit_id, d.hour
+       ON CONFLICT (subreddit_id, hour) DO UPDATE SET
+           {count_column} = s.{count_column} + EXCLUDED.{count_column},
+           {score_column} = s.{score_column} + EXCLUDED.{score_column},
+           active_authors = s.active_authors + EXCLUDED.active_authors
+   )
+"""
+
+ROLLUP_CTES = {
+   'posts': ', '.join((
+       _POST_CHANGES.strip(),
+       _CONTENT_ROLLUP.format(count_column='post_count', score_column='post_score_sum').strip()
+   )),
+   'comments': ', '.join((
+       _COMMENT_CHANGES.strip(),
+       _CONTENT_ROLLUP.format(count_column='comment_count', score_column='comment_score_sum').strip()
+   ))
+}
+
+# Adds newly stored sentiment to the hour of the content it scores, reads
+# the RETURNING rows of a `scored` CTE inserting into content_sentiment
+SENTIMENT_ROLLUP_CTE = """
+   rollup AS (
+       INSERT INTO subreddit_hourly_stats AS s
+           (subreddit_id, hour, sentiment_count, sentiment_sum)
+       SELECT
+           COALESCE(p.subreddit_id, cp.subreddit_id),
+           date_trunc('hour', COALESCE(p.created_utc, c.created_utc)) AS hour,
+           COUNT(*),
+           SUM(x.compound_score)
+       FROM scored x
+       LEFT JOIN posts p
+           ON x.content_type = 'post' AND p.id = x.content_id
+       LEFT JOIN comments c
+           ON x.content_type = 'comment' AND c.id = x.content_id
+       LEFT JOIN posts cp ON cp.id = c.post_id
+       WHERE COALESCE(p.subreddit_id, cp.subreddit_id) IS NOT NULL
+         AND COALESCE(p.created_utc, c.created_utc) IS NOT NULL
+       GROUP BY 1, 2
+       ORDER BY 1, 2
+       ON CONFLICT (subreddit_id, hour) DO UPDATE SET
+           sentiment_count = s.sentiment_count + EXCLUDED.sentiment_count,
+           sentiment_sum = s.sentiment_sum + EXCLUDED.sentiment_sum
+   )
+"""
+
+def hour_start(value: datetime) -> datetime:
+   return value.replace(minute=0, second=0, microsecond=0)
+
+class RollupManager:
+   def __init__(self, db_handler):
+       """Read and rebuild the hourly per-subreddit rollups
+
+       subreddit_hourly_stats holds post/comment counts, score sums,
+       sentiment sums and active authors per subreddit per hour of
+       created_utc. Inserts and sentiment writes keep it current by adding
+       their deltas (see DatabaseHandler and SentimentAnalyzer); rebuild()
+       recomputes a range from the base tables, for backfills, data loaded
+       outside the handler, or after the rollup tables are first created.
+       """
+       self.db = db_handler
+       self.logger = logging.getLogger(__name__)
+
+   def rebuild(self, start: datetime, end: datetime,
+               subreddit: Optional[str] = None) -> int:
+       """Recompute the rollups of [start, end), one day per transaction
+
+       Returns the number of rollup rows written.
+       """
+       params = {'subreddit': subreddit}
+       subreddit_filter = ""
+       if subreddit:
+           subreddit_filter = "AND subreddit_id = (SELECT id FROM subreddits WHERE name = %(subreddit)s)"
+
+       written = 0
+       day = hour_start(start)
+       end = hour_start(end + timedelta(minutes=59, seconds=59))
+       while day < end:
+           params['start'] = day
+           params['end'] = min(day + timedelta(days=1), end)
+           with self.db.get_connection() as conn:
+               with conn.cursor() as cur:
+                   cur.execute("SET LOCAL statement_timeout = 0")
+                   written += self._rebuild_range(cur, params, subreddit_filter)
+           day = params['end']
+
+       self.logger.info(f"Rebuilt {written} hourly rollups from {start} to {end}")
+       return written
+
+   def _rebuild_range(self, cur, params: Dict, subreddit_filter: str) -> int:
+       for table in ('subreddit_hourly_stats', 'subreddit_hourly_authors'):
+           cur.execute(f"""
+               DELETE FROM {table}
+               WHERE hour >= %(start)s AND hour < %(end)s
+               {subreddit_filter}
+           """, params)
+
+       cur.execute(f"""
+           INSERT INTO subreddit_hourly_authors (subreddit_id, hour, author)
+           SELECT DISTINCT subreddit_id, date_trunc('hour', created_utc), author
+           FROM (
+               SELECT p.subreddit_id, p.created_utc, p.author
+               FROM posts p
+               WHERE p.created_utc >= %(start)s AND p.created_utc < %(end)s
+               UNION ALL
+               SELECT p.subreddit_id, c.created_utc, c.author
+               FROM comments c
+               JOIN posts p ON p.id = c.post_id
+               WHERE c.created_utc >= %(start)s AND c.created_utc < %(end)s
+           ) content
+           WHERE author IS NOT NULL AND subreddit_id IS NOT NULL
+           {subreddit_filter}
+       """, params)
+
+       cur.execute(f"""
+           INSERT INTO subreddit_hourly_stats (
+               subreddit_id, hour, post_count, comment_count, post_score_sum,
+               comment_score_sum, sentiment_count, sentiment_sum, active_authors
+           )
+           SELECT
+               subreddit_id, hour, SUM(post_count), SUM(comment_count),
+               SUM(post_score_sum), SUM(comment_score_sum),
+               SUM(sentiment_count), SUM(sentiment_sum), SUM(active_authors)
+           FROM (
+               SELECT p.subreddit_id, date_trunc('hour', p.created_utc) AS hour,
+                      COUNT(*) AS post_count, 0 AS comment_count,
+                      COALESCE(SUM(p.score), 0) AS post_score_sum, 0 AS comment_score_sum,
+                      0 AS sentiment_count, 0.0 AS sentiment_sum, 0 AS active_authors
+               FROM posts p
+               WHERE p.created_utc >= %(start)s AND p.created_utc < %(end)s
+               GROUP BY 1, 2
+               UNION ALL
+               SELECT p.subreddit_id, date_trunc('hour', c.created_utc),
+                      0, COUNT(*), 0, COALESCE(SUM(c.score), 0), 0, 0.0, 0
+               FROM comments c
+               JOIN posts p ON p.id = c.post_id
+               WHERE c.created_utc >= %(start)s AND c.created_utc < %(end)s
+               GROUP BY 1, 2
+               UNION ALL
+               SELECT p.subreddit_id, date_trunc('hour', p.created_utc),
+                      0, 0, 0, 0, COUNT(*), SUM(cs.compound_score), 0
+               FROM content_sentiment cs
+               JOIN posts p ON cs.content_type = 'post' AND p.id = cs.content_id
+               WHERE p.created_utc >= %(start)s AND p.created_utc < %(end)s
+               GROUP BY 1, 2
+               UNION ALL
+               SELECT p.subreddit_id, date_trunc('hour', c.created_utc),
+                      0, 0, 0, 0, COUNT(*), SUM(cs.compound_score), 0
+               FROM content_sentiment cs
+               JOIN comments c ON cs.content_type = 'comment' AND c.id = cs.content_id
+               JOIN posts p ON p.id = c.post_id
+               WHERE c.created_utc >= %(start)s AND c.created_utc < %(end)s
+               GROUP BY 1, 2
+               UNION ALL
+               SELECT subreddit_id, hour, 0, 0, 0, 0, 0, 0.0, COUNT(*)
+               FROM subreddit_hourly_authors
+               WHERE hour >= %(start)s AND hour < %(end)s
+               GROUP BY 1, 2
+           ) parts
+           WHERE subreddit_id IS NOT NULL
+           {subreddit_filter}
+           GROUP BY subreddit_id, hour
+       """, params)
+       return cur.rowcount
+
+   def subreddit_totals(self, since: Optional[datetime] = None) -> List[Dict]:
+       """Per subreddit totals over every hour since the given time
+
+       active_author_hours sums hourly distinct authors, so an author
+       active in several hours counts once per hour.
+       """
+       with self.db.get_read_connection() as conn:
+           with conn.cursor() as cur:
+               cur.execute("""
+                   SELECT
+                       s.name,
+                       COALESCE(SUM(r.post_count), 0),
+                       COALESCE(SUM(r.comment_count), 0),
+                       COALESCE(SUM(r.post_score_sum), 0),
+                       COALESCE(SUM(r.comment_score_sum), 0),
+                       SUM(r.sentiment_sum) / NULLIF(SUM(r.sentiment_count), 0),
+                       COALESCE(SUM(r.active_authors), 0),
+                       MIN(r.hour) FILTER (WHERE r.post_count > 0),
+                       MAX(r.hour) FILTER (WHERE r.post_count > 0)
+                   FROM subreddits s
+                   LEFT JOIN subreddit_hourly_stats r
+                       ON r.subreddit_id = s.id
+                      AND (%(since)s::timestamp IS NULL OR r.hour >= %(since)s::timestamp)
+                   GROUP BY s.name
+                   ORDER BY s.name
+               """, {'since': since})
+               columns = (
+                   'subreddit', 'post_count', 'comment_count', 'post_score_sum',
+                   'comment_score_sum', 'avg_sentiment', 'active_author_hours',
+                   'earliest_hour', 'latest_hour'
+               )
+               return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+   def hourly(self, subreddit: str, start: datetime, end: datetime) -> List[Dict]:
+       """Rollup rows of one subreddit for hours in [start, end)"""
+       with self.db.get_read_connection() as conn:
+           with conn.cursor() as cur:
+               cur.execute("""
+                   SELECT
+                       r.hour, r.post_count, r.comment_count, r.post_score_sum,
+                       r.comment_score_sum, r.sentiment_count, r.sentiment_sum,
+                       r.active_authors
+                   FROM subreddit_hourly_stats r
+                   JOIN subreddits s ON s.id = r.subreddit_id
+                   WHERE s.name = %s AND r.hour >= %s AND r.hour < %s
+                   ORDER BY r.hour
+               """, (subreddit, start, end))
+               columns = [desc[0] for desc in cur.description]
+               return [dict(zip(columns, row)) for row in cur.fetchall()]
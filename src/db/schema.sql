@@ -1,4 +1,6 @@
 -- init.sql
+-- Reference copy of the schema. scripts/init_db.py creates and upgrades
+-- databases through the versioned migrations in src/db/migrations.py.
 CREATE DATABASE reddit_analyzer;
 
 \c reddit_analyzer
@@ -10,6 +12,8 @@ CREATE TABLE IF NOT EXISTS subreddits (
     last_scan_time TIMESTAMP
 );
 
+-- With DB_PARTITIONED=true posts and comments are instead range
+-- partitioned by created_utc month, see src/db/partitions.py
 CREATE TABLE IF NOT EXISTS posts (
     id VARCHAR(50) PRIMARY KEY,
     subreddit_id INTEGER REFERENCES subreddits(id),
@@ -43,6 +47,8 @@ CREATE TABLE IF NOT EXISTS collection_progress (
     status VARCHAR(20),
     worker_id UUID,
     started_at TIMESTAMP,
+    window_start TIMESTAMP,
+    window_end TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(subreddit_name, worker_id)
 );
@@ -59,7 +65,60 @@ CREATE TABLE IF NOT EXISTS content_sentiment (
     UNIQUE(content_id, content_type)
 );
 
+-- New posts/comments awaiting sentiment analysis, queued at insert time
+CREATE TABLE IF NOT EXISTS sentiment_pending (
+    id BIGSERIAL PRIMARY KEY,
+    content_id VARCHAR(50) NOT NULL,
+    content_type VARCHAR(10) NOT NULL,
+    enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    claimed_by VARCHAR(64),
+    claimed_at TIMESTAMP,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    UNIQUE(content_id, content_type)
+);
+
+-- Tasks that exhausted their retries, archived out of Redis
+CREATE TABLE IF NOT EXISTS failed_tasks (
+    task_id VARCHAR(36) PRIMARY KEY,
+    task_type VARCHAR(50) NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at TIMESTAMP,
+    payload JSONB NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Hourly per-subreddit rollups, kept current at insert and scoring time
+CREATE TABLE IF NOT EXISTS subreddit_hourly_stats (
+    subreddit_id INTEGER NOT NULL REFERENCES subreddits(id),
+    hour TIMESTAMP NOT NULL,
+    post_count INTEGER NOT NULL DEFAULT 0,
+    comment_count INTEGER NOT NULL DEFAULT 0,
+    post_score_sum BIGINT NOT NULL DEFAULT 0,
+    comment_score_sum BIGINT NOT NULL DEFAULT 0,
+    sentiment_count INTEGER NOT NULL DEFAULT 0,
+    sentiment_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    active_authors INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (subreddit_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS subreddit_hourly_authors (
+    subreddit_id INTEGER NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    author VARCHAR(50) NOT NULL,
+    PRIMARY KEY (subreddit_id, hour, author)
+);
+
 CREATE INDEX idx_posts_created_utc ON posts(created_utc);
 CREATE INDEX idx_comments_post_id ON comments(post_id);
 CREATE INDEX idx_collection_progress_worker ON collection_progress(worker_id);
 CREATE INDEX idx_content_sentiment_content ON content_sentiment(content_id, content_type);
+CREATE INDEX idx_posts_subreddit_created ON posts(subreddit_id, created_utc);
+CREATE INDEX idx_comments_created_utc ON comments(created_utc);
+CREATE INDEX idx_comments_parent_comment_id ON comments(parent_comment_id)
+    WHERE parent_comment_id IS NOT NULL;
+CREATE INDEX idx_posts_author ON posts(author);
+CREATE INDEX idx_comments_author ON comments(author);
+CREATE INDEX idx_collection_progress_subreddit ON collection_progress(subreddit_name, updated_at DESC);
+CREATE INDEX idx_collection_progress_updated ON collection_progress(updated_at);
+CREATE INDEX idx_subreddit_hourly_stats_hour ON subreddit_hourly_stats(hour);
@@ -0,0 +1,37 @@
+# src/queue/factory.py
+
+from typing import Optional
+from ..config import RedisConfig
+from .manager import QueueManager
+from .streams import StreamQueueManager
+
+QUEUE_BACKENDS = {
+    'zset': QueueManager,
+    'streams': StreamQueueManager
+}
+
+def create_queue_manager(config: RedisConfig,
+                         claim_timeout: Optional[float] = None) -> QueueManager:
+    """
+    Build the queue manager selected by config.queue_backend.
+    
+    Both backends share one API; producers and workers using different
+    backends against the same Redis will not see each other's tasks.
+    Workers pass their claim_timeout: the streams backend applies one
+    idle timeout to every claim rather than taking it per claim.
+    """
+    if config.queue_backend not in QUEUE_BACKENDS:
+        raise ValueError(
+            f"Unknown queue backend {config.queue_backend!r}, "
+            f"expected one of {sorted(QUEUE_BACKENDS)}"
+        )
+
+    options = {}
+    if claim_timeout is not None and config.queue_backend == 'streams':
+        options['claim_timeout'] = claim_timeout
+
+    return QUEUE_BACKENDS[config.queue_backend]({
+        'host': config.host,
+        'port': config.port,
+        'db': config.db
+    }, **options)
@@ -2,11 +2,15 @@
 
 import redis
 import json
+from psycopg2.extras import Json, execute_values
 import logging
-from datetime import datetime, timedelta
+import random
+import time
+from datetime import datetime, timezone
 from typing import Optional, Dict, List, Any
 from dataclasses import dataclass
 import uuid
+from .metrics import QueueMetrics
 
 @dataclass
 class QueueConfig:
@@ -15,8 +19,153 @@ class QueueConfig:
     HIGH_PRIORITY = 2
     CRITICAL_PRIORITY = 3
     PROCESSING_TIMEOUT = 3600  # 1 hour in seconds
-    RETRY_DELAY = 300         # 5 minutes in seconds
+    RETRY_DELAY = 300         # 5 minutes in seconds, doubled on each retry
+    MAX_RETRY_DELAY = 3600    # Cap on the backed-off retry delay
     MAX_RETRIES = 3
+    DEDUPE_TTL = 86400        # Upper bound on how long an idempotency key is held
+    COMPLETED_TTL = 3600      # How long a completed task's details are kept
+    COMPLETED_HISTORY = 10000 # Most recent completions kept in the completed set
+    FAILED_TTL = 604800       # How long a failed task waits for archival, 7 days
+
+# Legacy keys from when claims and completions were plain sets
+LEGACY_PROCESSING_KEY = 'set:processing'
+LEGACY_COMPLETED_KEY = 'set:completed'
+
+# Load a task's JSON string. Tasks written before tasks became JSON strings
+# are hashes of string fields; those are re-encoded in place, so a leftover
+# hash is claimed like any other task instead of failing the whole script
+# with WRONGTYPE after its ID has been popped.
+LOAD_TASK_LUA = """
+local function load_task(task_id)
+    local key = 'task:' .. task_id
+    if redis.call('TYPE', key)['ok'] ~= 'hash' then
+        return redis.call('GET', key)
+    end
+    local fields = redis.call('HGETALL', key)
+    local task = {}
+    for i = 1, #fields, 2 do
+        task[fields[i]] = fields[i + 1]
+    end
+    for _, name in ipairs({'priority', 'attempts'}) do
+        task[name] = tonumber(task[name]) or task[name]
+    end
+    local encoded = cjson.encode(task)
+    redis.call('DEL', key)
+    redis.call('SET', key, encoded)
+    return encoded
+end
+"""
+
+# Re-encode the hash tasks whose IDs are in ARGV, returns how many there were
+CONVERT_TASKS_SCRIPT = LOAD_TASK_LUA + """
+local converted = 0
+for _, task_id in ipairs(ARGV) do
+    if redis.call('TYPE', 'task:' .. task_id)['ok'] == 'hash' then
+        load_task(task_id)
+        converted = converted + 1
+    end
+end
+return converted
+"""
+
+# Move delayed tasks that are due (score <= now) back onto their queue at
+# their own priority, at most limit of them, and note when each became
+# pending again. Shared by the claim script below and the reaper.
+RELEASE_DUE_LUA = LOAD_TASK_LUA + """
+local function release_due(queue, delayed, pending_since, now, limit)
+    local due = redis.call('ZRANGEBYSCORE', delayed, '-inf', now, 'LIMIT', 0, limit)
+    for _, task_id in ipairs(due) do
+        redis.call('ZREM', delayed, task_id)
+        local task = load_task(task_id)
+        if task then
+            redis.call('ZADD', queue, cjson.decode(task)['priority'], task_id)
+            redis.call('ZADD', pending_since, now, task_id)
+        end
+    end
+    return #due
+end
+"""
+
+# Release due retries, then pop the highest priority task IDs and mark each
+# as processing until the deadline in ARGV[4]. IDs whose task has gone
+# missing are dropped rather than claimed.
+CLAIM_TASKS_SCRIPT = RELEASE_DUE_LUA + """
+release_due(KEYS[1], KEYS[3], KEYS[4], ARGV[3], 1000)
+local popped = redis.call('ZPOPMAX', KEYS[1], ARGV[1])
+local tasks = {}
+for i = 1, #popped, 2 do
+    local task_id = popped[i]
+    redis.call('ZREM', KEYS[4], task_id)
+    local encoded = load_task(task_id)
+    if encoded then
+        local task = cjson.decode(encoded)
+        task['claimed_at'] = ARGV[2]
+        encoded = cjson.encode(task)
+        redis.call('SET', 'task:' .. task_id, encoded)
+        redis.call('ZADD', KEYS[2], ARGV[4], task_id)
+        tasks[#tasks + 1] = encoded
+    end
+end
+return tasks
+"""
+
+RELEASE_DUE_SCRIPT = RELEASE_DUE_LUA + """
+return release_due(KEYS[1], KEYS[2], KEYS[3], ARGV[1], ARGV[2])
+"""
+
+# Remove up to ARGV[2] claims whose deadline (score) has passed and return
+# their tasks, so each expired claim is handed to exactly one reaper.
+REAP_EXPIRED_SCRIPT = LOAD_TASK_LUA + """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local tasks = {}
+for _, task_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], task_id)
+    local task = load_task(task_id)
+    if task then
+        tasks[#tasks + 1] = task
+    end
+end
+return tasks
+"""
+
+# Tasks written per enqueue script call
+ENQUEUE_CHUNK_SIZE = 1000
+
+# Store each encoded task and queue it, recording when it was enqueued in
+# KEYS[2], unless its dedupe key still points at
+# a task that exists, in which case that task's ID is returned instead.
+# Tasks added are counted in the metrics hash KEYS[3], kept ARGV[4] seconds.
+ENQUEUE_TASKS_SCRIPT = """
+local tasks = cjson.decode(ARGV[1])
+local task_ids = {}
+local added = 0
+for i, task in ipairs(tasks) do
+    local existing = false
+    if task['dedupe_key'] then
+        existing = redis.call('GET', task['dedupe_key'])
+        if existing and redis.call('EXISTS', 'task:' .. existing) == 0 then
+            existing = false
+        end
+    end
+    if existing then
+        task_ids[i] = existing
+    else
+        if task['dedupe_key'] then
+            redis.call('SET', task['dedupe_key'], task['id'], 'EX', ARGV[2])
+        end
+        redis.call('SET', 'task:' .. task['id'], task['task'])
+        redis.call('ZADD', KEYS[1], task['priority'], task['id'])
+        redis.call('ZADD', KEYS[2], ARGV[3], task['id'])
+        task_ids[i] = task['id']
+        added = added + 1
+    end
+end
+if added > 0 then
+    redis.call('HINCRBY', KEYS[3], 'enqueued', added)
+    redis.call('EXPIRE', KEYS[3], ARGV[4])
+end
+return task_ids
+"""
 
 class QueueManager:
     """
@@ -24,6 +173,9 @@ class QueueManager:
     Uses Redis for reliable message queuing with priority support and error handling.
     """
     
+    # Whether claim_tasks waits server-side for work when the queue is empty
+    blocking_claims = False
+    
     def __init__(self, redis_config: dict):
         """
         Initialize queue manager with Redis connection.
@@ -34,6 +186,7 @@ class QueueManager:
         """
         self.redis_client = redis.Redis(**redis_config)
         self.logger = logging.getLogger(__name__)
+        self.metrics = QueueMetrics()
         
         # Define queue names for different tasks
         self.queues = {
@@ -42,9 +195,21 @@ class QueueManager:
             'comment_collection': 'queue:comments',
             'sentiment_analysis': 'queue:sentiment',
             'failed_tasks': 'queue:failed',
-            'processing': 'set:processing',
-            'completed': 'set:completed'
+            'processing': 'zset:processing',
+            'completed': 'zset:completed'
         }
+        
+        self._claim_script = self.redis_client.register_script(CLAIM_TASKS_SCRIPT)
+        self._enqueue_script = self.redis_client.register_script(ENQUEUE_TASKS_SCRIPT)
+        self._release_due_script = self.redis_client.register_script(RELEASE_DUE_SCRIPT)
+        self._reap_script = self.redis_client.register_script(REAP_EXPIRED_SCRIPT)
+        self._convert_script = self.redis_client.register_script(CONVERT_TASKS_SCRIPT)
+        
+        # Queues whose tasks can be retried, each has a delayed set of retries
+        self.task_queues = [
+            'subreddit_collection', 'post_collection',
+            'comment_collection', 'sentiment_analysis'
+        ]
 
     def enqueue_subreddit(self, subreddit: str, start_date: datetime,
                          end_date: datetime, priority: int = QueueConfig.DEFAULT_PRIORITY) -> str:
@@ -60,68 +225,136 @@ class QueueManager:
         Returns:
             task_id: Unique identifier for the queued task
         """
-        task_id = str(uuid.uuid4())
-        task = {
-            'id': task_id,
+        task_id = self.enqueue_subreddits([subreddit], start_date, end_date, priority)[0]
+        self.logger.info(f"Enqueued subreddit collection task: {task_id} for r/{subreddit}")
+        return task_id
+
+    def enqueue_subreddits(self, subreddits: List[str], start_date: datetime,
+                          end_date: datetime, priority: int = QueueConfig.DEFAULT_PRIORITY,
+                          dedupe: bool = True) -> List[str]:
+        """
+        Add several subreddits to the collection queue in bulk.
+        
+        Args:
+            subreddits: Names of the subreddits to collect
+            start_date: Start date for data collection
+            end_date: End date for data collection
+            priority: Task priority level
+            dedupe: Skip subreddits already pending for the same date range
+            
+        Returns:
+            task_ids: Task ID for each subreddit, the existing one for duplicates
+        """
+        tasks = [{
             'type': 'subreddit_collection',
             'subreddit': subreddit,
             'start_date': start_date.isoformat(),
-            'end_date': end_date.isoformat(),
-            'priority': priority,
-            'attempts': 0,
-            'enqueued_at': datetime.utcnow().isoformat()
-        }
-        
-        # Store task details in a hash
-        self.redis_client.hset(f'task:{task_id}', mapping=task)
+            'end_date': end_date.isoformat()
+        } for subreddit in subreddits]
         
-        # Add to priority queue
-        self.redis_client.zadd(
-            self.queues['subreddit_collection'],
-            {task_id: priority}
-        )
+        dedupe_keys = None
+        if dedupe:
+            dedupe_keys = [
+                f"{subreddit}:{start_date.isoformat()}:{end_date.isoformat()}"
+                for subreddit in subreddits
+            ]
         
-        self.logger.info(f"Enqueued subreddit collection task: {task_id} for r/{subreddit}")
-        return task_id
+        return self.enqueue_tasks('subreddit_collection', tasks, priority, dedupe_keys)
 
     def enqueue_posts_for_comments(self, post_ids: List[str],
-                                 priority: int = QueueConfig.DEFAULT_PRIORITY) -> List[str]:
+                                 priority: int = QueueConfig.DEFAULT_PRIORITY,
+                                 dedupe: bool = True) -> List[str]:
         """
         Add posts to the comment collection queue.
         
         Args:
             post_ids: List of post IDs to collect comments from
             priority: Task priority level
+            dedupe: Skip posts that already have a pending comment collection task
             
         Returns:
-            task_ids: List of unique identifiers for the queued tasks
+            task_ids: Task ID for each post, the existing one for duplicates
         """
-        task_ids = []
+        tasks = [{'type': 'comment_collection', 'post_id': post_id} for post_id in post_ids]
+        task_ids = self.enqueue_tasks(
+            'comment_collection', tasks, priority,
+            list(post_ids) if dedupe else None
+        )
         
-        for post_id in post_ids:
-            task_id = str(uuid.uuid4())
+        self.logger.info(f"Enqueued {len(post_ids)} posts for comment collection")
+        return task_ids
+
+    def enqueue_tasks(self, queue_name: str, tasks: List[Dict[str, Any]],
+                     priority: int = QueueConfig.DEFAULT_PRIORITY,
+                     dedupe_keys: Optional[List[str]] = None) -> List[str]:
+        """
+        Bulk enqueue tasks onto a queue.
+        
+        Tasks are written by a server-side script in chunks of
+        ENQUEUE_CHUNK_SIZE, with every chunk sent in a single pipeline, so
+        thousands of tasks cost one round trip. When dedupe_keys are given,
+        a task whose key already belongs to a pending task is not enqueued
+        again; the key is released when that task completes or fails for
+        good.
+        
+        Args:
+            queue_name: Name of the queue to add to
+            tasks: Task fields, id/priority/attempts/enqueued_at are filled in
+            priority: Task priority level
+            dedupe_keys: Optional idempotency key per task
+            
+        Returns:
+            task_ids: Task ID for each task, the existing one for duplicates
+        """
+        if not tasks:
+            return []
+        
+        payloads = self._build_payloads(queue_name, tasks, priority, dedupe_keys)
+        metrics_key = self.metrics.key(self.queues[queue_name])
+        pipe = self.redis_client.pipeline(transaction=False)
+        for start in range(0, len(payloads), ENQUEUE_CHUNK_SIZE):
+            self._enqueue_script(
+                keys=[self.queues[queue_name], self._pending_since_key(queue_name), metrics_key],
+                args=[
+                    json.dumps(payloads[start:start + ENQUEUE_CHUNK_SIZE]),
+                    QueueConfig.DEDUPE_TTL,
+                    time.time(),
+                    self.metrics.retention
+                ],
+                client=pipe
+            )
+        
+        return [
+            task_id.decode('utf-8')
+            for chunk in pipe.execute()
+            for task_id in chunk
+        ]
+
+    def _build_payloads(self, queue_name: str, tasks: List[Dict[str, Any]],
+                        priority: int, dedupe_keys: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Fill in task defaults and encode each task for the enqueue scripts"""
+        queue_key = self.queues[queue_name]
+        enqueued_at = datetime.utcnow().isoformat()
+        payloads = []
+        
+        for i, fields in enumerate(tasks):
             task = {
-                'id': task_id,
-                'type': 'comment_collection',
-                'post_id': post_id,
+                'id': str(uuid.uuid4()),
                 'priority': priority,
                 'attempts': 0,
-                'enqueued_at': datetime.utcnow().isoformat()
+                'enqueued_at': enqueued_at,
+                **fields
             }
+            payload = {'id': task['id'], 'priority': task['priority']}
             
-            # Store task details
-            self.redis_client.hset(f'task:{task_id}', mapping=task)
-            
-            # Add to priority queue
-            self.redis_client.zadd(
-                self.queues['comment_collection'],
-                {task_id: priority}
-            )
+            if dedupe_keys is not None:
+                task['dedupe_key'] = f"dedupe:{queue_key}:{dedupe_keys[i]}"
+                payload['dedupe_key'] = task['dedupe_key']
             
-            task_ids.append(task_id)
-            
-        self.logger.info(f"Enqueued {len(post_ids)} posts for comment collection")
-        return task_ids
+            payload['task'] = self._encode_task(task)
+            payloads.append(payload)
+        
+        return payloads
 
     def get_next_task(self, queue_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -133,51 +366,139 @@ class QueueManager:
         Returns:
             task: Dictionary containing task details or None if queue is empty
         """
-        # Get highest priority task ID
-        task_id = self.redis_client.zrevrange(
-            self.queues[queue_name],
-            0, 0,  # Get the first item only
-            withscores=False
-        )
+        tasks = self.claim_tasks(queue_name, 1)
+        return tasks[0] if tasks else None
+
+    def claim_tasks(self, queue_name: str, count: int = 1,
+                   timeout: float = QueueConfig.PROCESSING_TIMEOUT) -> List[Dict[str, Any]]:
+        """
+        Atomically claim up to count of the highest priority tasks.
         
-        if not task_id:
-            return None
-            
-        task_id = task_id[0].decode('utf-8')
+        Popping, loading and marking tasks as processing runs as a single
+        server-side script, so concurrent workers can never claim the same
+        task and a claim costs one round trip regardless of count. Retries
+        on this queue that have come due are released first. A claim that
+        is neither completed nor extended within timeout is reclaimed by
+        reap_expired.
         
-        # Get task details
-        task = self.redis_client.hgetall(f'task:{task_id}')
-        if not task:
-            return None
-            
-        # Convert bytes to string
-        task = {k.decode('utf-8'): v.decode('utf-8') for k, v in task.items()}
-        
-        # Check if task is already being processed
-        if self.redis_client.sismember(self.queues['processing'], task_id):
-            # Check for timeout
-            processing_time = self.redis_client.get(f'processing:{task_id}')
-            if processing_time:
-                start_time = datetime.fromisoformat(processing_time.decode('utf-8'))
-                if datetime.utcnow() - start_time > timedelta(seconds=QueueConfig.PROCESSING_TIMEOUT):
-                    # Task has timed out, reset it
-                    self.handle_failed_task(task_id, task, "Task processing timeout")
-                    self.redis_client.srem(self.queues['processing'], task_id)
-                    self.redis_client.delete(f'processing:{task_id}')
-                else:
-                    return None
+        Args:
+            queue_name: Name of the queue to pull from
+            count: Maximum number of tasks to claim
+            timeout: Seconds before the claim expires
             
-        # Mark task as processing
-        self.redis_client.sadd(self.queues['processing'], task_id)
-        self.redis_client.set(
-            f'processing:{task_id}',
-            datetime.utcnow().isoformat()
+        Returns:
+            tasks: List of task dictionaries, highest priority first
+        """
+        if count < 1:
+            return []
+        
+        now = time.time()
+        claimed = self._claim_script(
+            keys=[
+                self.queues[queue_name],
+                self.queues['processing'],
+                self._delayed_key(queue_name),
+                self._pending_since_key(queue_name)
+            ],
+            args=[
+                count,
+                datetime.utcnow().isoformat(),
+                now,
+                now + timeout
+            ]
         )
         
-        # Remove from queue
-        self.redis_client.zrem(self.queues[queue_name], task_id)
+        tasks = [self._decode_task(encoded) for encoded in claimed]
+        self._record_claimed(queue_name, tasks)
+        return tasks
+
+    def _record_claimed(self, queue_name: str, tasks: List[Dict[str, Any]]) -> None:
+        """
+        Record claims and, for first attempts, how long they waited. Retry
+        waits are left out, they are dominated by the backoff delay.
+        Written by the next pipeline finishing, releasing or extending claims.
+        """
+        if not tasks:
+            return
+        
+        queue_key = self.queues[queue_name]
+        now = datetime.utcnow()
+        self.metrics.defer_incr(queue_key, 'claimed', len(tasks))
+        for task in tasks:
+            if int(task.get('attempts', 0)) == 0:
+                self.metrics.defer_observe(queue_key, 'wait', self._seconds_since(task['enqueued_at'], now))
+
+    @staticmethod
+    def _seconds_since(timestamp: str, now: datetime) -> float:
+        return max(0.0, (now - datetime.fromisoformat(timestamp)).total_seconds())
+
+    def _record_finished(self, pipe, task: Dict[str, Any], outcome: str) -> None:
+        """Count a completed/retried/failed task and how long it was processed"""
+        queue_key = self.queues[task['type']]
+        self.metrics.flush(pipe)
+        self.metrics.incr(pipe, queue_key, outcome)
+        if task.get('claimed_at'):
+            self.metrics.observe(
+                pipe, queue_key, 'processing',
+                self._seconds_since(task['claimed_at'], datetime.utcnow())
+            )
+
+    @staticmethod
+    def _encode_task(task: Dict[str, Any]) -> str:
+        """
+        Tasks are stored as one compact JSON string per task:{id} key
+        rather than a hash, which is smaller and lets finished tasks
+        expire with a single TTL.
+        """
+        return json.dumps(task, separators=(',', ':'))
+
+    @staticmethod
+    def _decode_task(encoded: bytes) -> Dict[str, Any]:
+        return json.loads(encoded)
+
+    def extend_claims(self, task_ids: List[str],
+                      timeout: float = QueueConfig.PROCESSING_TIMEOUT) -> None:
+        """
+        Push back the processing deadline of tasks that are still being worked.
+        
+        Claims that have already been reaped are left alone.
         
-        return task
+        Args:
+            task_ids: Tasks currently held by the caller
+            timeout: Seconds from now before the claims expire
+        """
+        if task_ids:
+            deadline = time.time() + timeout
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zadd(
+                self.queues['processing'],
+                {task_id: deadline for task_id in task_ids},
+                xx=True
+            )
+            self.metrics.flush(pipe)
+            pipe.execute()
+
+    def release_tasks(self, tasks: List[Dict[str, Any]]) -> None:
+        """
+        Return claimed but unstarted tasks to their queues without counting
+        an attempt, e.g. prefetched tasks held by a worker that is shutting down.
+        
+        Args:
+            tasks: Task details dictionaries
+        """
+        if not tasks:
+            return
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        now = time.time()
+        for task in tasks:
+            pipe.zrem(self.queues['processing'], task['id'])
+            pipe.zadd(self.queues[task['type']], {task['id']: float(task['priority'])})
+            pipe.zadd(self._pending_since_key(task['type']), {task['id']: now})
+        self.metrics.flush(pipe)
+        pipe.execute()
+        
+        self.logger.info(f"Released {len(tasks)} unstarted tasks")
 
     def complete_task(self, task_id: str, task: Dict[str, Any]) -> None:
         """
@@ -187,16 +508,22 @@ class QueueManager:
             task_id: Unique identifier of the completed task
             task: Task details dictionary
         """
-        # Remove from processing set
-        self.redis_client.srem(self.queues['processing'], task_id)
-        self.redis_client.delete(f'processing:{task_id}')
+        task['completed_at'] = datetime.utcnow().isoformat()
         
-        # Add to completed set
-        self.redis_client.sadd(self.queues['completed'], task_id)
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._ack(pipe, task_id, task)
+        self._record_finished(pipe, task, 'completed')
         
-        # Update task status
-        task['completed_at'] = datetime.utcnow().isoformat()
-        self.redis_client.hset(f'task:{task_id}', mapping=task)
+        # Record in the completed history, keeping only the most recent
+        pipe.zadd(self.queues['completed'], {task_id: time.time()})
+        pipe.zremrangebyrank(
+            self.queues['completed'], 0, -(QueueConfig.COMPLETED_HISTORY + 1)
+        )
+        self._release_dedupe_key(pipe, task)
+        
+        # Keep the finished task's details around briefly for inspection
+        pipe.set(f'task:{task_id}', self._encode_task(task), ex=QueueConfig.COMPLETED_TTL)
+        pipe.execute()
         
         self.logger.info(f"Completed task: {task_id}")
 
@@ -210,39 +537,169 @@ class QueueManager:
             task: Task details dictionary
             error: Error message describing the failure
         """
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._fail_task(pipe, task_id, task, error)
+        pipe.execute()
+
+    def _fail_task(self, pipe, task_id: str, task: Dict[str, Any], error: str) -> None:
+        """Queue the writes that record a failure onto pipe"""
         attempts = int(task.get('attempts', 0))
-        task['attempts'] = str(attempts + 1)
+        task['attempts'] = attempts + 1
         task['last_error'] = error
         task['failed_at'] = datetime.utcnow().isoformat()
         
+        self._ack(pipe, task_id, task)
+        
+        self._record_finished(
+            pipe, task, 'retried' if attempts < QueueConfig.MAX_RETRIES else 'failed'
+        )
+        
         if attempts < QueueConfig.MAX_RETRIES:
-            # Requeue with delay and increased priority
-            task['priority'] = str(min(
-                int(task.get('priority', QueueConfig.DEFAULT_PRIORITY)) + 1,
-                QueueConfig.CRITICAL_PRIORITY
-            ))
-            
-            # Store updated task details
-            self.redis_client.hset(f'task:{task_id}', mapping=task)
+            pipe.set(f'task:{task_id}', self._encode_task(task))
             
-            # Add back to original queue with delay
-            self.redis_client.zadd(
-                self.queues[task['type']],
-                {task_id: float(task['priority'])},
-                nx=True
+            # Retry at the same priority once the backoff has elapsed, with
+            # jitter so a burst of failures doesn't come due all at once
+            delay = min(
+                QueueConfig.RETRY_DELAY * 2 ** attempts,
+                QueueConfig.MAX_RETRY_DELAY
+            )
+            delay *= random.uniform(1.0, 1.1)
+            pipe.zadd(
+                self._delayed_key(task['type']),
+                {task_id: time.time() + delay}
             )
             
             self.logger.warning(
-                f"Task {task_id} failed, attempt {attempts + 1}/{QueueConfig.MAX_RETRIES}: {error}"
+                f"Task {task_id} failed, attempt {attempts + 1}/{QueueConfig.MAX_RETRIES}, "
+                f"retrying in {delay:.0f}s: {error}"
             )
         else:
-            # Move to failed queue
-            self.redis_client.zadd(
+            # Move to failed queue, where it waits for archive_failed_tasks
+            pipe.set(f'task:{task_id}', self._encode_task(task), ex=QueueConfig.FAILED_TTL)
+            pipe.zadd(
                 self.queues['failed_tasks'],
                 {task_id: float(task['priority'])}
             )
+            self._release_dedupe_key(pipe, task)
             self.logger.error(f"Task {task_id} failed permanently: {error}")
 
+    def _ack(self, pipe, task_id: str, task: Dict[str, Any]) -> None:
+        """Queue the write that ends this worker's claim on a task onto pipe"""
+        pipe.zrem(self.queues['processing'], task_id)
+
+    def _release_dedupe_key(self, client, task: Dict[str, Any]) -> None:
+        """Allow the task's idempotency key to be enqueued again"""
+        if task.get('dedupe_key'):
+            client.delete(task['dedupe_key'])
+
+    def _delayed_key(self, queue_name: str) -> str:
+        return f"{self.queues[queue_name]}:delayed"
+
+    def _pending_since_key(self, queue_name: str) -> str:
+        return f"{self.queues[queue_name]}:pending_since"
+
+    def release_due_tasks(self, limit: int = 1000) -> int:
+        """
+        Move retries whose delay has elapsed back onto their queues.
+        
+        Args:
+            limit: Maximum number of tasks to release per queue
+            
+        Returns:
+            Number of tasks released
+        """
+        now = time.time()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for queue_name in self.task_queues:
+            self._release_due_script(
+                keys=[
+                    self.queues[queue_name],
+                    self._delayed_key(queue_name),
+                    self._pending_since_key(queue_name)
+                ],
+                args=[now, limit],
+                client=pipe
+            )
+        return sum(pipe.execute())
+
+    def reap_expired(self, batch_size: int = 500) -> int:
+        """
+        Reclaim tasks whose processing deadline has passed.
+        
+        Expired claims are removed atomically, then each task is failed
+        with a timeout error so it follows the normal retry/backoff path.
+        
+        Args:
+            batch_size: Maximum number of claims to reclaim
+            
+        Returns:
+            Number of tasks reclaimed
+        """
+        expired = self._reap_script(
+            keys=[self.queues['processing']],
+            args=[time.time(), batch_size]
+        )
+        if not expired:
+            return 0
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for encoded in expired:
+            task = self._decode_task(encoded)
+            self._fail_task(pipe, task['id'], task, "Task processing timeout")
+        pipe.execute()
+        
+        return len(expired)
+
+    def archive_failed_tasks(self, db_handler, batch_size: int = 500) -> int:
+        """
+        Move permanently failed tasks out of Redis into Postgres.
+        
+        Args:
+            db_handler: DatabaseHandler for the failed_tasks table
+            batch_size: Maximum number of tasks to archive
+            
+        Returns:
+            Number of tasks archived
+        """
+        task_ids = [
+            task_id.decode('utf-8')
+            for task_id in self.redis_client.zrange(self.queues['failed_tasks'], 0, batch_size - 1)
+        ]
+        if not task_ids:
+            return 0
+        
+        # Tasks whose details already expired are dropped from the queue only
+        tasks = [
+            self._decode_task(encoded)
+            for encoded in self.redis_client.mget([f'task:{task_id}' for task_id in task_ids])
+            if encoded
+        ]
+        
+        if tasks:
+            with db_handler.get_connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                        INSERT INTO failed_tasks (
+                            task_id, task_type, attempts, last_error, failed_at, payload
+                        ) VALUES %s
+                        ON CONFLICT (task_id) DO NOTHING
+                    """, [(
+                        task['id'],
+                        task['type'],
+                        task.get('attempts', 0),
+                        task.get('last_error'),
+                        task.get('failed_at'),
+                        Json(task)
+                    ) for task in tasks])
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zrem(self.queues['failed_tasks'], *task_ids)
+        pipe.delete(*[f'task:{task_id}' for task_id in task_ids])
+        pipe.execute()
+        
+        self.logger.info(f"Archived {len(tasks)} failed tasks")
+        return len(tasks)
+
     def get_queue_stats(self) -> Dict[str, Any]:
         """
         Get statistics about all queues.
@@ -253,16 +710,125 @@ class QueueManager:
         stats = {}
         
         for queue_type, queue_name in self.queues.items():
-            if queue_type in ['processing', 'completed']:
-                # Set-based queues
-                stats[queue_type] = self.redis_client.scard(queue_name)
-            else:
-                # Sorted set queues
-                stats[queue_type] = self.redis_client.zcard(queue_name)
+            stats[queue_type] = self.redis_client.zcard(queue_name)
+        
+        stats['delayed'] = sum(
+            self.redis_client.zcard(self._delayed_key(queue_name))
+            for queue_name in self.task_queues
+        )
         
         return stats
 
+    def queue_depth(self, queue_name: str) -> int:
+        """Number of tasks waiting to be claimed from a queue"""
+        return self.redis_client.zcard(self.queues[queue_name])
+
+    def get_queue_metrics(self, minutes: int = 15) -> Dict[str, Dict[str, Any]]:
+        """
+        Get latency and throughput metrics for each task queue.
+        
+        Computed from per-minute counters and histograms recorded as tasks
+        move through the queue, see QueueMetrics.summarize.
+        
+        Args:
+            minutes: Trailing window to summarize
+            
+        Returns:
+            Dictionary of metrics per queue, including oldest_pending_age
+            in seconds (None when the queue is empty)
+        """
+        metrics = {}
+        for queue_name in self.task_queues:
+            summary = self.metrics.summarize(self.redis_client, self.queues[queue_name], minutes)
+            summary['oldest_pending_age'] = self._oldest_pending_age(queue_name)
+            metrics[queue_name] = summary
+        return metrics
+
+    def _oldest_pending_age(self, queue_name: str) -> Optional[float]:
+        oldest = self.redis_client.zrange(
+            self._pending_since_key(queue_name), 0, 0, withscores=True
+        )
+        return max(0.0, time.time() - oldest[0][1]) if oldest else None
+
     def clear_queues(self) -> None:
         """Clear all queues (useful for testing or resetting)"""
         for queue_name in self.queues.values():
-            self.redis_client.delete(queue_name)
\ No newline at end of file
+            self.redis_client.delete(queue_name)
+        for queue_name in self.task_queues:
+            self.redis_client.delete(self._delayed_key(queue_name))
+            self.redis_client.delete(self._pending_since_key(queue_name))
+
+    def convert_legacy_tasks(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        One-off conversion of data left by the earlier queue layout.
+        
+        Tasks stored as hashes are re-encoded as JSON strings, claims still
+        in the old processing set are handed to _adopt_legacy_claims with
+        the deadline their processing timeout gave them, and the old
+        completed set is folded into the completed history. Safe to run
+        repeatedly and while workers are running.
+        
+        Args:
+            batch_size: Task keys converted per script call
+            
+        Returns:
+            Counts of converted tasks, adopted claims and completions
+        """
+        converted = 0
+        task_ids = []
+        for key in self.redis_client.scan_iter(match='task:*', count=batch_size, _type='hash'):
+            task_ids.append(key.decode('utf-8')[len('task:'):])
+            if len(task_ids) >= batch_size:
+                converted += self._convert_script(args=task_ids)
+                task_ids = []
+        if task_ids:
+            converted += self._convert_script(args=task_ids)
+        
+        claims = 0
+        if self.redis_client.type(LEGACY_PROCESSING_KEY) == b'set':
+            claim_ids = [
+                task_id.decode('utf-8')
+                for task_id in self.redis_client.smembers(LEGACY_PROCESSING_KEY)
+            ]
+            started = self.redis_client.mget([f'processing:{task_id}' for task_id in claim_ids])
+            
+            # Claims with no recorded start expire straight away
+            now = time.time()
+            deadlines = {}
+            for task_id, started_at in zip(claim_ids, started):
+                deadlines[task_id] = now
+                if started_at:
+                    deadlines[task_id] = datetime.fromisoformat(
+                        started_at.decode('utf-8')
+                    ).replace(tzinfo=timezone.utc).timestamp() + QueueConfig.PROCESSING_TIMEOUT
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._adopt_legacy_claims(pipe, deadlines)
+            pipe.delete(LEGACY_PROCESSING_KEY, *[f'processing:{task_id}' for task_id in claim_ids])
+            pipe.execute()
+            claims = len(claim_ids)
+        
+        completions = 0
+        if self.redis_client.type(LEGACY_COMPLETED_KEY) == b'set':
+            completed = self.redis_client.smembers(LEGACY_COMPLETED_KEY)
+            pipe = self.redis_client.pipeline(transaction=False)
+            # Completion times were never recorded, so these rank oldest
+            # and are the first trimmed from the history
+            pipe.zadd(self.queues['completed'], {task_id: 0 for task_id in completed}, nx=True)
+            pipe.zremrangebyrank(
+                self.queues['completed'], 0, -(QueueConfig.COMPLETED_HISTORY + 1)
+            )
+            pipe.delete(LEGACY_COMPLETED_KEY)
+            pipe.execute()
+            completions = len(completed)
+        
+        if converted or claims or completions:
+            self.logger.info(
+                f"Converted {converted} legacy tasks, adopted {claims} claims "
+                f"and {completions} completions"
+            )
+        return {'tasks': converted, 'claims': claims, 'completions': completions}
+
+    def _adopt_legacy_claims(self, pipe, deadlines: Dict[str, float]) -> None:
+        """Queue claims from the old processing set, reap_expired fails them at their deadline"""
+        pipe.zadd(self.queues['processing'], deadlines, nx=True)
@@ -0,0 +1,134 @@
+# src/queue/metrics.py
+
+import threading
+import time
+from typing import Dict, Any, Optional
+
+# Histogram bucket upper bounds in seconds, the last one catches the rest
+LATENCY_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, float('inf'))
+
+# Outcome counters kept per minute
+COUNTERS = ('enqueued', 'claimed', 'completed', 'retried', 'failed')
+
+# How long per-minute metrics are kept, 1 day in seconds
+METRICS_RETENTION = 86400
+
+class QueueMetrics:
+    """
+    Per-queue, per-minute counters and latency histograms stored in Redis.
+
+    Each minute of each queue is one small hash, metrics:{queue}:{minute},
+    and recording never sends a request of its own. Enqueue scripts count
+    the tasks they add themselves (see key()). Finished tasks are written
+    onto the pipeline that finishes them. Claims are deferred: the claimed
+    count and wait times are kept in memory and written by flush() onto
+    the next pipeline the queue manager sends, usually the one completing,
+    failing or releasing the claimed tasks, so they can land a task's run
+    time late. Histograms use fixed buckets, so percentiles are reported
+    as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, retention: int = METRICS_RETENTION):
+        """
+        Args:
+            retention: Seconds each minute's metrics are kept
+        """
+        self.retention = retention
+        self._deferred = []
+        self._lock = threading.Lock()
+
+    def _key(self, queue_key: str, minute: int) -> str:
+        return f"metrics:{queue_key}:{minute}"
+
+    @staticmethod
+    def _minute() -> int:
+        return int(time.time() // 60)
+
+    def key(self, queue_key: str) -> str:
+        """Hash of the current minute, for scripts recording their own counts"""
+        return self._key(queue_key, self._minute())
+
+    def incr(self, pipe, queue_key: str, counter: str, amount: int = 1,
+             minute: Optional[int] = None) -> None:
+        """Queue an increment of one of COUNTERS for the current minute onto pipe"""
+        key = self._key(queue_key, self._minute() if minute is None else minute)
+        pipe.hincrby(key, counter, amount)
+        pipe.expire(key, self.retention)
+
+    def observe(self, pipe, queue_key: str, histogram: str, seconds: float,
+                minute: Optional[int] = None) -> None:
+        """Queue a latency observation ('wait' or 'processing') onto pipe"""
+        key = self._key(queue_key, self._minute() if minute is None else minute)
+        bucket = next(bound for bound in LATENCY_BUCKETS if seconds <= bound)
+        pipe.hincrby(key, f"{histogram}:{bucket}", 1)
+        pipe.hincrbyfloat(key, f"{histogram}_sum", seconds)
+        pipe.expire(key, self.retention)
+
+    def defer_incr(self, queue_key: str, counter: str, amount: int = 1) -> None:
+        """Like incr(), written to the current minute by the next flush()"""
+        with self._lock:
+            self._deferred.append((self.incr, (queue_key, counter, amount, self._minute())))
+
+    def defer_observe(self, queue_key: str, histogram: str, seconds: float) -> None:
+        """Like observe(), written to the current minute by the next flush()"""
+        with self._lock:
+            self._deferred.append((self.observe, (queue_key, histogram, seconds, self._minute())))
+
+    def flush(self, pipe) -> None:
+        """Queue every deferred update onto pipe"""
+        with self._lock:
+            deferred, self._deferred = self._deferred, []
+        for record, args in deferred:
+            record(pipe, *args)
+
+    def summarize(self, redis_client, queue_key: str, minutes: int = 15) -> Dict[str, Any]:
+        """
+        Aggregate the trailing minutes of a queue's metrics.
+
+        Returns:
+            Counts over the window, completed_per_minute, retry_rate and
+            failure_rate (per finished attempt), and count/mean/p50/p95
+            for the wait (enqueue to claim) and processing (claim to
+            finish) histograms
+        """
+        current = int(time.time() // 60)
+        pipe = redis_client.pipeline(transaction=False)
+        for minute in range(current - minutes + 1, current + 1):
+            pipe.hgetall(self._key(queue_key, minute))
+
+        totals = {}
+        for fields in pipe.execute():
+            for field, value in fields.items():
+                field = field.decode('utf-8')
+                totals[field] = totals.get(field, 0) + float(value)
+
+        summary = {counter: int(totals.get(counter, 0)) for counter in COUNTERS}
+        summary['completed_per_minute'] = summary['completed'] / minutes
+
+        attempts = summary['completed'] + summary['retried'] + summary['failed']
+        summary['retry_rate'] = summary['retried'] / attempts if attempts else 0.0
+        summary['failure_rate'] = summary['failed'] / attempts if attempts else 0.0
+
+        for histogram in ('wait', 'processing'):
+            counts = [totals.get(f"{histogram}:{bound}", 0) for bound in LATENCY_BUCKETS]
+            total = sum(counts)
+            summary[histogram] = {
+                'count': int(total),
+                'mean': totals.get(f"{histogram}_sum", 0) / total if total else None,
+                'p50': self._percentile(counts, total, 0.50),
+                'p95': self._percentile(counts, total, 0.95)
+            }
+
+        return summary
+
+    @staticmethod
+    def _percentile(counts: list, total: float, quantile: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given quantile"""
+        if not total:
+            return None
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            cumulative += count
+            if cumulative >= quantile * total:
+                return bound
+        return LATENCY_BUCKETS[-1]
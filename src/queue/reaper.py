@@ -0,0 +1,77 @@
+# src/queue/reaper.py
+
+import logging
+import threading
+from .manager import QueueManager
+
+class QueueReaper:
+    """
+    Background thread that keeps the queues moving without relying on
+    workers: it releases retries whose backoff has elapsed, reclaims
+    tasks whose processing deadline has passed and, given a database,
+    archives permanently failed tasks out of Redis.
+    """
+    
+    def __init__(self, queue_manager: QueueManager, interval: float = 30.0,
+                 batch_size: int = 500, db_handler=None):
+        """
+        Args:
+            queue_manager: Queue manager to maintain
+            interval: Seconds between sweeps
+            batch_size: Maximum expired claims reclaimed per sweep
+            db_handler: Optional DatabaseHandler to archive failed tasks to
+        """
+        self.queue_manager = queue_manager
+        self.db_handler = db_handler
+        self.interval = interval
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='queue-reaper', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def sweep(self) -> int:
+        """Run one pass, returns the number of tasks released or reclaimed"""
+        released = self.queue_manager.release_due_tasks()
+        
+        # Keep reclaiming while full batches come back so a backlog of
+        # expired claims clears in one sweep
+        reclaimed = 0
+        while not self._stop.is_set():
+            count = self.queue_manager.reap_expired(self.batch_size)
+            reclaimed += count
+            if count < self.batch_size:
+                break
+        
+        if released or reclaimed:
+            self.logger.info(f"Released {released} due retries, reclaimed {reclaimed} expired tasks")
+        
+        if self.db_handler is not None:
+            self.queue_manager.archive_failed_tasks(self.db_handler, self.batch_size)
+        
+        return released + reclaimed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                self.logger.error(f"Queue reaper error: {str(e)}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,382 @@
+# src/queue/scheduler.py
+
+import bisect
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Optional, Dict, List, Any
+from ..config import SchedulerConfig
+from .manager import QueueManager, QueueConfig
+
+# Work classes a flow can belong to: first-time collection and refreshes
+# of content already collected
+WORK_CLASSES = ('collection', 'refresh')
+
+# Queues whose tasks make API requests, dispatched only while the shared
+# budget has tokens left
+BUDGETED_QUEUES = ('subreddit_collection', 'post_collection', 'comment_collection')
+
+# Keys of the API budget bucket shared by every scheduler and collector,
+# and of the requests it granted per subreddit
+BUDGET_KEY = 'sched:budget'
+USAGE_KEY = 'sched:usage'
+
+# Grant ARGV[1] tokens, all or none, from the bucket in KEYS[1], refilled
+# at ARGV[2] per second up to ARGV[3], after first lowering the bucket to
+# ARGV[6] when given. Granted tokens are added to the ARGV[5] field of
+# KEYS[2] when given. A negative request refunds tokens. Returns the
+# number granted.
+TAKE_TOKENS_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local now = tonumber(ARGV[4])
+local capacity = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * tonumber(ARGV[2]))
+if ARGV[6] ~= '' then
+    tokens = math.min(tokens, tonumber(ARGV[6]))
+end
+local granted = tonumber(ARGV[1])
+if granted > 0 and tokens < granted then
+    granted = 0
+end
+redis.call('HSET', KEYS[1], 'tokens', math.min(capacity, tokens - granted), 'updated', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+if granted > 0 and ARGV[5] ~= '' then
+    redis.call('HINCRBYFLOAT', KEYS[2], ARGV[5], granted)
+end
+return granted
+"""
+
+def parse_shares(spec: str) -> Dict[str, float]:
+    """Parse a "name=weight,name=weight" share list"""
+    shares = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, weight = item.split('=')
+        shares[name.strip().lower()] = float(weight)
+    return shares
+
+def deficit_round_robin(backlog: Dict[str, int], deficits: Dict[str, float],
+                        weights: Dict[str, float], allowed: int,
+                        cursor: Optional[str] = None):
+    """
+    Pick up to allowed tasks from backlogged flows with deficit round robin.
+
+    Flows take turns in name order starting at cursor. A flow earns
+    credit when its turn comes, the lightest flow one task, and keeps the
+    turn until its credit or its backlog runs out. When allowed runs out
+    first, the returned cursor is where the next round resumes, so a round
+    with room for a single task still rotates through the flows. Updates
+    backlog and deficits in place.
+
+    Returns:
+        Tasks picked per flow and the cursor for the next round
+    """
+    if not backlog or allowed <= 0:
+        return {}, cursor
+
+    quantum = 1.0 / min(weights[flow] for flow in backlog)
+    order = sorted(backlog)
+    start = bisect.bisect_left(order, cursor) if cursor else 0
+    order = order[start:] + order[:start]
+
+    picks = {}
+    remaining = allowed
+    while remaining > 0 and backlog:
+        for position, flow in enumerate(order):
+            if flow not in backlog:
+                continue
+            # Credit left over means the last turn was cut short by room
+            if deficits.get(flow, 0.0) < 1:
+                deficits[flow] = deficits.get(flow, 0.0) + quantum * weights[flow]
+            count = min(int(deficits[flow]), backlog[flow], remaining)
+            deficits[flow] -= count
+            picks[flow] = picks.get(flow, 0) + count
+            backlog[flow] -= count
+            remaining -= count
+            if not backlog[flow]:
+                # An idle flow doesn't bank credit
+                del backlog[flow]
+                deficits[flow] = 0.0
+            if not remaining:
+                if flow in backlog and deficits[flow] >= 1:
+                    cursor = flow
+                else:
+                    cursor = order[(position + 1) % len(order)]
+                break
+    return picks, cursor
+
+class SharedBudget:
+    """
+    Token bucket in Redis gating API requests across every process.
+
+    A drop-in for the collector's local TokenBucket: each request takes a
+    token from BUDGET_KEY before it is made, so any number of workers
+    together stay within one account's budget, and each token is charged
+    to the subreddit it was spent on.
+    """
+
+    def __init__(self, redis_client, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            redis_client: Redis connection holding the bucket
+            rate: Tokens (API requests) per second shared by all processes
+            capacity: Largest burst after an idle period, a minute of requests by default
+        """
+        self.redis_client = redis_client
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate * 60
+        self._take_tokens = redis_client.register_script(TAKE_TOKENS_SCRIPT)
+
+    def _take(self, tokens: float, subreddit: Optional[str] = None,
+              ceiling: Optional[float] = None) -> float:
+        return float(self._take_tokens(
+            keys=[BUDGET_KEY, USAGE_KEY],
+            args=[tokens, self.rate, self.capacity, time.time(),
+                  (subreddit or '').lower(), '' if ceiling is None else ceiling]
+        ))
+
+    def acquire(self, tokens: float = 1.0, subreddit: Optional[str] = None) -> float:
+        """Block until tokens are granted, return the seconds spent waiting"""
+        waited = 0.0
+        while not self._take(tokens, subreddit):
+            delay = tokens / self.rate
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    def sync(self, remaining: float, reset_in: float) -> None:
+        """Clamp the bucket to the budget reported by the API rate limit headers"""
+        if remaining < 1:
+            # Budget exhausted, hold every worker until the window resets
+            self._take(0, ceiling=-reset_in * self.rate)
+        else:
+            self._take(0, ceiling=remaining)
+
+    def available(self) -> float:
+        """Tokens in the bucket right now"""
+        tokens, updated = self.redis_client.hmget(BUDGET_KEY, 'tokens', 'updated')
+        if tokens is None:
+            return self.capacity
+        elapsed = max(0.0, time.time() - float(updated))
+        return min(self.capacity, float(tokens) + elapsed * self.rate)
+
+    def usage(self) -> Dict[str, float]:
+        """API requests granted per subreddit"""
+        return {
+            key.decode('utf-8'): float(value)
+            for key, value in self.redis_client.hgetall(USAGE_KEY).items()
+        }
+
+class FairScheduler:
+    """
+    Admits work into QueueManager queues fairly across subreddits.
+
+    Producers submit tasks to a flow, one per subreddit and work class,
+    where they wait in a Redis list. Dispatch moves them into the real
+    queue with deficit round robin: flows take turns, each turn earning
+    credit in proportion to the flow's weight (subreddit share times class
+    share) to dispatch that many tasks, so a huge backfill gets its share
+    rather than the whole queue. Turns carry over between rounds, so
+    flows still alternate when only a task or two fits. Dispatch also stops at
+    max_queue_depth waiting tasks, keeping the shared queue short enough
+    that new work from a small subreddit is near its head. Tasks making
+    API requests are only dispatched while the SharedBudget has tokens,
+    the collectors running them take a token per request.
+    """
+
+    def __init__(self, queue_manager: QueueManager, config: SchedulerConfig,
+                 interval: float = 1.0):
+        """
+        Args:
+            queue_manager: Queue manager to dispatch into
+            config: Shares, global budget and queue depth limit
+            interval: Seconds between dispatch rounds when run in the background
+        """
+        self.queue_manager = queue_manager
+        self.redis_client = queue_manager.redis_client
+        self.subreddit_shares = parse_shares(config.subreddit_shares)
+        self.class_shares = parse_shares(config.class_shares)
+        self.budget = SharedBudget(self.redis_client, config.budget_per_minute / 60.0)
+        self.max_queue_depth = config.max_queue_depth
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _key(self, queue_name: str, suffix: str) -> str:
+        return f"sched:{self.queue_manager.queues[queue_name]}:{suffix}"
+
+    def weight(self, flow: str) -> float:
+        subreddit, work_class = flow.rsplit(':', 1)
+        return (self.subreddit_shares.get(subreddit, 1.0)
+                * self.class_shares.get(work_class, 1.0))
+
+    def submit(self, queue_name: str, subreddit: str, tasks: List[Dict[str, Any]],
+               work_class: str = 'collection',
+               dedupe_keys: Optional[List[str]] = None) -> int:
+        """
+        Add tasks to a subreddit's flow, to be dispatched fairly.
+
+        Args:
+            queue_name: Queue the tasks are eventually dispatched to
+            subreddit: Subreddit the tasks spend API budget on
+            tasks: Task fields as for QueueManager.enqueue_tasks
+            work_class: One of WORK_CLASSES
+            dedupe_keys: Optional idempotency key per task, applied at dispatch
+
+        Returns:
+            Number of tasks waiting in the flow
+        """
+        if work_class not in WORK_CLASSES:
+            raise ValueError(f"Unknown work class {work_class!r}, expected one of {WORK_CLASSES}")
+        if not tasks:
+            return 0
+
+        flow = f"{subreddit.lower()}:{work_class}"
+        entries = [
+            json.dumps({
+                'fields': task,
+                'dedupe_key': dedupe_keys[i] if dedupe_keys is not None else None
+            }, separators=(',', ':'))
+            for i, task in enumerate(tasks)
+        ]
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.sadd(self._key(queue_name, 'flows'), flow)
+        pipe.rpush(self._key(queue_name, f'flow:{flow}'), *entries)
+        return pipe.execute()[1]
+
+    def dispatch(self, queue_name: str) -> int:
+        """
+        Run one dispatch round for a queue.
+
+        Safe to call from several processes, rounds for a queue are
+        serialized with a short Redis lock.
+
+        Returns:
+            Number of tasks dispatched
+        """
+        lock_key = self._key(queue_name, 'lock')
+        token = str(uuid.uuid4())
+        if not self.redis_client.set(lock_key, token, nx=True, ex=30):
+            return 0
+        try:
+            return self._dispatch(queue_name)
+        finally:
+            if self.redis_client.get(lock_key) == token.encode('utf-8'):
+                self.redis_client.delete(lock_key)
+
+    def _dispatch(self, queue_name: str) -> int:
+        room = self.max_queue_depth - self.queue_manager.queue_depth(queue_name)
+        if room <= 0:
+            return 0
+
+        flows = sorted(
+            flow.decode('utf-8')
+            for flow in self.redis_client.smembers(self._key(queue_name, 'flows'))
+        )
+        pipe = self.redis_client.pipeline(transaction=False)
+        for flow in flows:
+            pipe.llen(self._key(queue_name, f'flow:{flow}'))
+        pipe.hgetall(self._key(queue_name, 'deficit'))
+        pipe.get(self._key(queue_name, 'cursor'))
+        *lengths, stored_deficits, cursor = pipe.execute()
+
+        backlog = {flow: length for flow, length in zip(flows, lengths) if length}
+        deficits = {
+            flow.decode('utf-8'): float(value) for flow, value in stored_deficits.items()
+        }
+        if not backlog:
+            return 0
+
+        # Collectors spend the budget per request, don't hand them tasks
+        # they can only wait on
+        if queue_name in BUDGETED_QUEUES and self.budget.available() < 1:
+            return 0
+
+        picks, cursor = deficit_round_robin(
+            backlog, deficits, {flow: self.weight(flow) for flow in backlog}, room,
+            cursor.decode('utf-8') if cursor else None
+        )
+        dispatched = self._move(queue_name, picks)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        if deficits:
+            pipe.hset(self._key(queue_name, 'deficit'), mapping=deficits)
+        if cursor:
+            pipe.set(self._key(queue_name, 'cursor'), cursor)
+        pipe.execute()
+        return dispatched
+
+    def _move(self, queue_name: str, picks: Dict[str, int]) -> int:
+        """Pop the picked tasks off their flows and enqueue them"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        picked = [(flow, count) for flow, count in picks.items() if count]
+        for flow, count in picked:
+            pipe.lpop(self._key(queue_name, f'flow:{flow}'), count)
+
+        keyed, keyed_dedupe, unkeyed = [], [], []
+        for entries in pipe.execute():
+            for entry in entries or []:
+                entry = json.loads(entry)
+                if entry['dedupe_key'] is None:
+                    unkeyed.append(entry['fields'])
+                else:
+                    keyed.append(entry['fields'])
+                    keyed_dedupe.append(entry['dedupe_key'])
+
+        if keyed:
+            self.queue_manager.enqueue_tasks(
+                queue_name, keyed, QueueConfig.DEFAULT_PRIORITY, keyed_dedupe
+            )
+        if unkeyed:
+            self.queue_manager.enqueue_tasks(queue_name, unkeyed, QueueConfig.DEFAULT_PRIORITY)
+        return len(keyed) + len(unkeyed)
+
+    def get_flow_stats(self, queue_name: str) -> Dict[str, Dict[str, float]]:
+        """Backlog, weight and API requests spent on the subreddit per flow of a queue"""
+        flows = sorted(
+            flow.decode('utf-8')
+            for flow in self.redis_client.smembers(self._key(queue_name, 'flows'))
+        )
+        pipe = self.redis_client.pipeline(transaction=False)
+        for flow in flows:
+            pipe.llen(self._key(queue_name, f'flow:{flow}'))
+        lengths = pipe.execute()
+        usage = self.budget.usage()
+
+        return {
+            flow: {
+                'backlog': length,
+                'weight': self.weight(flow),
+                'budget_used': usage.get(flow.rsplit(':', 1)[0], 0.0)
+            }
+            for flow, length in zip(flows, lengths)
+        }
+
+    def start(self, queue_names: List[str]) -> None:
+        """Dispatch the given queues on a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(queue_names,), name='fair-scheduler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, queue_names: List[str]) -> None:
+        while not self._stop.is_set():
+            for queue_name in queue_names:
+                try:
+                    self.dispatch(queue_name)
+                except Exception as e:
+                    self.logger.error(f"Dispatch error for {queue_name}: {str(e)}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,402 @@
+# src/queue/streams.py
+
+import redis
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, List, Any, Tuple
+from .manager import QueueManager, QueueConfig, ENQUEUE_CHUNK_SIZE, LOAD_TASK_LUA
+
+# Consumer group shared by every worker reading the task streams
+CONSUMER_GROUP = 'workers'
+
+# Priorities get one stream each, read highest first
+PRIORITIES = (QueueConfig.CRITICAL_PRIORITY, QueueConfig.HIGH_PRIORITY,
+              QueueConfig.DEFAULT_PRIORITY)
+
+# Store each encoded task and append it to the stream, unless its dedupe key
+# still points at a task that exists, in which case that task's ID is
+# returned instead. Tasks added are counted in the metrics hash KEYS[2],
+# kept ARGV[3] seconds.
+STREAM_ENQUEUE_SCRIPT = """
+local tasks = cjson.decode(ARGV[1])
+local task_ids = {}
+local added = 0
+for i, task in ipairs(tasks) do
+    local existing = false
+    if task['dedupe_key'] then
+        existing = redis.call('GET', task['dedupe_key'])
+        if existing and redis.call('EXISTS', 'task:' .. existing) == 0 then
+            existing = false
+        end
+    end
+    if existing then
+        task_ids[i] = existing
+    else
+        if task['dedupe_key'] then
+            redis.call('SET', task['dedupe_key'], task['id'], 'EX', ARGV[2])
+        end
+        redis.call('SET', 'task:' .. task['id'], task['task'])
+        redis.call('XADD', KEYS[1], '*', 'task', task['task'])
+        task_ids[i] = task['id']
+        added = added + 1
+    end
+end
+if added > 0 then
+    redis.call('HINCRBY', KEYS[2], 'enqueued', added)
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return task_ids
+"""
+
+# Move up to ARGV[2] delayed tasks that are due (score <= ARGV[1]) onto the
+# stream for their priority, named ARGV[3] .. ':' .. priority.
+STREAM_RELEASE_DUE_SCRIPT = LOAD_TASK_LUA + """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, task_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], task_id)
+    local task = load_task(task_id)
+    if task then
+        local priority = math.max(ARGV[4], math.min(ARGV[5], cjson.decode(task)['priority']))
+        redis.call('XADD', ARGV[3] .. ':' .. priority, '*', 'task', task)
+    end
+end
+return #due
+"""
+
+class StreamQueueManager(QueueManager):
+    """
+    QueueManager backed by Redis Streams and a consumer group.
+
+    Each queue is split into one stream per priority. Delivery tracking is
+    left to the consumer group: a claim is an XREADGROUP, which can block
+    server-side until work arrives, completion is an O(1) XACK, and claims
+    left idle by a dead worker are recovered with XAUTOCLAIM. Retries,
+    completed history and failed task archival work as in QueueManager.
+    """
+
+    blocking_claims = True
+
+    def __init__(self, redis_config: dict, consumer: Optional[str] = None,
+                 block_ms: int = 1000,
+                 claim_timeout: float = QueueConfig.PROCESSING_TIMEOUT):
+        """
+        Args:
+            redis_config: Dictionary containing Redis connection parameters
+            consumer: Consumer name within the group, unique per process
+            block_ms: How long a claim on an empty queue waits for work
+            claim_timeout: Idle seconds before a claim is recovered. Claims
+                          are kept alive by extend_claims, so this applies
+                          to every consumer rather than per claim.
+        """
+        super().__init__(redis_config)
+        self.consumer = consumer or str(uuid.uuid4())
+        self.block_ms = block_ms
+        self.claim_timeout = claim_timeout
+
+        self._stream_enqueue_script = self.redis_client.register_script(STREAM_ENQUEUE_SCRIPT)
+        self._stream_release_script = self.redis_client.register_script(STREAM_RELEASE_DUE_SCRIPT)
+
+        # Stream position of each task this consumer holds, for heartbeats
+        self._claims = {}
+        self._claims_lock = threading.Lock()
+
+        for queue_name in self.task_queues:
+            for priority in PRIORITIES:
+                try:
+                    self.redis_client.xgroup_create(
+                        self._stream_key(queue_name, priority), CONSUMER_GROUP,
+                        id='0', mkstream=True
+                    )
+                except redis.ResponseError as e:
+                    if 'BUSYGROUP' not in str(e):
+                        raise
+
+    def _stream_key(self, queue_name: str, priority: int) -> str:
+        priority = max(min(int(priority), max(PRIORITIES)), min(PRIORITIES))
+        return f"stream:{self.queues[queue_name]}:{priority}"
+
+    def enqueue_tasks(self, queue_name: str, tasks: List[Dict[str, Any]],
+                     priority: int = QueueConfig.DEFAULT_PRIORITY,
+                     dedupe_keys: Optional[List[str]] = None) -> List[str]:
+        """
+        Bulk enqueue tasks onto the stream for their priority.
+
+        Same contract as QueueManager.enqueue_tasks.
+        """
+        if not tasks:
+            return []
+
+        payloads = self._build_payloads(queue_name, tasks, priority, dedupe_keys)
+        metrics_key = self.metrics.key(self.queues[queue_name])
+        pipe = self.redis_client.pipeline(transaction=False)
+        for start in range(0, len(payloads), ENQUEUE_CHUNK_SIZE):
+            self._stream_enqueue_script(
+                keys=[self._stream_key(queue_name, priority), metrics_key],
+                args=[
+                    json.dumps(payloads[start:start + ENQUEUE_CHUNK_SIZE]),
+                    QueueConfig.DEDUPE_TTL,
+                    self.metrics.retention
+                ],
+                client=pipe
+            )
+
+        return [
+            task_id.decode('utf-8')
+            for chunk in pipe.execute()
+            for task_id in chunk
+        ]
+
+    def claim_tasks(self, queue_name: str, count: int = 1,
+                   timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Claim up to count tasks, highest priority stream first.
+
+        If every stream is empty, waits up to block_ms for new entries.
+        Claims expire after the manager's claim_timeout.
+
+        Args:
+            queue_name: Name of the queue to pull from
+            count: Maximum number of tasks to claim
+            timeout: Must match claim_timeout when given
+
+        Returns:
+            tasks: List of task dictionaries
+        """
+        self._check_timeout(timeout)
+        tasks = []
+        for priority in PRIORITIES:
+            if len(tasks) >= count:
+                break
+            tasks.extend(self._read_group(
+                {self._stream_key(queue_name, priority): '>'}, count - len(tasks)
+            ))
+
+        if not tasks and self.block_ms:
+            tasks = self._read_group(
+                {self._stream_key(queue_name, priority): '>' for priority in PRIORITIES},
+                count, block=self.block_ms
+            )
+
+        self._record_claimed(queue_name, tasks)
+        return tasks
+
+    def _check_timeout(self, timeout: Optional[float]) -> None:
+        """Stream claims can't carry their own timeout, refuse one that differs"""
+        if timeout is not None and timeout != self.claim_timeout:
+            raise ValueError(
+                f"Claim timeout {timeout}s differs from this manager's {self.claim_timeout}s, "
+                f"create it with claim_timeout={timeout}"
+            )
+
+    def _read_group(self, streams: Dict[str, str], count: int,
+                    block: Optional[int] = None) -> List[Dict[str, Any]]:
+        reply = self.redis_client.xreadgroup(
+            CONSUMER_GROUP, self.consumer, streams, count=count, block=block
+        )
+        claimed_at = datetime.utcnow().isoformat()
+        tasks = []
+        for stream, entries in reply or []:
+            for entry_id, fields in entries:
+                task = self._claimed_task(stream, entry_id, fields)
+                task['claimed_at'] = claimed_at
+                tasks.append(task)
+        return tasks
+
+    def _claimed_task(self, stream: bytes, entry_id: bytes,
+                      fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        """Decode a delivered entry, remembering where it came from"""
+        task = self._decode_task(fields[b'task'])
+        # The entry is the task as enqueued, a claim time from an earlier
+        # delivery would be stale
+        task.pop('claimed_at', None)
+        task['_stream'] = stream.decode('utf-8')
+        task['_entry'] = entry_id.decode('utf-8')
+        with self._claims_lock:
+            self._claims[task['id']] = (task['_stream'], task['_entry'])
+        return task
+
+    def _ack(self, pipe, task_id: str, task: Dict[str, Any]) -> None:
+        """Acknowledge and drop the entry, so streams only hold live work"""
+        stream, entry_id = task.pop('_stream', None), task.pop('_entry', None)
+        with self._claims_lock:
+            self._claims.pop(task_id, None)
+        if stream:
+            pipe.xack(stream, CONSUMER_GROUP, entry_id)
+            pipe.xdel(stream, entry_id)
+
+    def extend_claims(self, task_ids: List[str],
+                      timeout: Optional[float] = None) -> None:
+        """
+        Reset the idle time of claims held by this consumer.
+
+        Args:
+            task_ids: Tasks currently held by the caller
+            timeout: Must match claim_timeout when given
+        """
+        self._check_timeout(timeout)
+        with self._claims_lock:
+            held = [self._claims[task_id] for task_id in task_ids if task_id in self._claims]
+        if not held:
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for stream, entry_id in held:
+            pipe.xclaim(stream, CONSUMER_GROUP, self.consumer, 0, [entry_id], justid=True)
+        self.metrics.flush(pipe)
+        pipe.execute()
+
+    def release_tasks(self, tasks: List[Dict[str, Any]]) -> None:
+        """
+        Return claimed but unstarted tasks to their streams without
+        counting an attempt.
+
+        Args:
+            tasks: Task details dictionaries
+        """
+        if not tasks:
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for task in tasks:
+            self._ack(pipe, task['id'], task)
+            pipe.xadd(
+                self._stream_key(task['type'], task['priority']),
+                {'task': self._encode_task(task)}
+            )
+        self.metrics.flush(pipe)
+        pipe.execute()
+
+        self.logger.info(f"Released {len(tasks)} unstarted tasks")
+
+    def _adopt_legacy_claims(self, pipe, deadlines: Dict[str, float]) -> None:
+        """
+        Claims from the old processing set belong to no consumer, so they
+        are delayed until their deadline and then released onto their
+        streams by release_due_tasks.
+        """
+        task_ids = list(deadlines)
+        encoded = self.redis_client.mget([f'task:{task_id}' for task_id in task_ids])
+        for task_id, task in zip(task_ids, encoded):
+            if task:
+                pipe.zadd(
+                    self._delayed_key(self._decode_task(task)['type']),
+                    {task_id: deadlines[task_id]}, nx=True
+                )
+
+    def release_due_tasks(self, limit: int = 1000) -> int:
+        """
+        Move retries whose delay has elapsed back onto their streams.
+
+        Unlike QueueManager, claims don't release retries themselves, so a
+        QueueReaper must be running.
+        """
+        now = time.time()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for queue_name in self.task_queues:
+            self._stream_release_script(
+                keys=[self._delayed_key(queue_name)],
+                args=[
+                    now, limit, f"stream:{self.queues[queue_name]}",
+                    min(PRIORITIES), max(PRIORITIES)
+                ],
+                client=pipe
+            )
+        return sum(pipe.execute())
+
+    def reap_expired(self, batch_size: int = 500) -> int:
+        """
+        Recover claims idle for longer than claim_timeout.
+
+        Idle pending entries are taken over with XAUTOCLAIM and failed with
+        a timeout error, so they follow the normal retry/backoff path.
+        """
+        min_idle_ms = int(self.claim_timeout * 1000)
+        reclaimed = 0
+        pipe = self.redis_client.pipeline(transaction=False)
+
+        for queue_name in self.task_queues:
+            for priority in PRIORITIES:
+                stream = self._stream_key(queue_name, priority)
+                reply = self.redis_client.xautoclaim(
+                    stream, CONSUMER_GROUP, self.consumer, min_idle_ms,
+                    start_id='0-0', count=batch_size
+                )
+                for entry_id, fields in reply[1]:
+                    if not fields:
+                        continue
+                    task = self._claimed_task(stream.encode('utf-8'), entry_id, fields)
+                    self._fail_task(pipe, task['id'], task, "Task processing timeout")
+                    reclaimed += 1
+
+        pipe.execute()
+        return reclaimed
+
+    def _oldest_pending_age(self, queue_name: str) -> Optional[float]:
+        """Age of the oldest entry not yet delivered, from its stream ID"""
+        oldest_ms = None
+        for priority in PRIORITIES:
+            stream = self._stream_key(queue_name, priority)
+            groups = self.redis_client.xinfo_groups(stream)
+            last_delivered = next(
+                group['last-delivered-id'].decode('utf-8') for group in groups
+                if group['name'].decode('utf-8') == CONSUMER_GROUP
+            )
+            entries = self.redis_client.xrange(stream, min=f'({last_delivered}', count=1)
+            if entries:
+                entry_ms = int(entries[0][0].decode('utf-8').split('-')[0])
+                oldest_ms = entry_ms if oldest_ms is None else min(oldest_ms, entry_ms)
+        return max(0.0, time.time() - oldest_ms / 1000) if oldest_ms is not None else None
+
+    def _stream_counts(self, queue_name: str) -> Tuple[int, int]:
+        """Total entries and delivered-but-unacked entries across priorities"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for priority in PRIORITIES:
+            stream = self._stream_key(queue_name, priority)
+            pipe.xlen(stream)
+            pipe.xpending(stream, CONSUMER_GROUP)
+        replies = pipe.execute()
+        return (
+            sum(replies[0::2]),
+            sum(pending['pending'] for pending in replies[1::2])
+        )
+
+    def queue_depth(self, queue_name: str) -> int:
+        length, pending = self._stream_counts(queue_name)
+        return length - pending
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about all queues.
+
+        Acked entries are deleted, so a stream's length is its waiting plus
+        claimed tasks; claimed tasks are reported under processing.
+        """
+        stats = {}
+        processing = 0
+
+        for queue_name in self.task_queues:
+            length, pending = self._stream_counts(queue_name)
+            stats[queue_name] = length - pending
+            processing += pending
+
+        stats['failed_tasks'] = self.redis_client.zcard(self.queues['failed_tasks'])
+        stats['processing'] = processing
+        stats['completed'] = self.redis_client.zcard(self.queues['completed'])
+        stats['delayed'] = sum(
+            self.redis_client.zcard(self._delayed_key(queue_name))
+            for queue_name in self.task_queues
+        )
+
+        return stats
+
+    def clear_queues(self) -> None:
+        """Clear all queues, streams are recreated with an empty group"""
+        super().clear_queues()
+        for queue_name in self.task_queues:
+            for priority in PRIORITIES:
+                stream = self._stream_key(queue_name, priority)
+                self.redis_client.delete(stream)
+                self.redis_client.xgroup_create(stream, CONSUMER_GROUP, id='0', mkstream=True)
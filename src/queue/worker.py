@@ -0,0 +1,157 @@
+# src/queue/worker.py
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Any
+import redis
+from .manager import QueueManager
+
+TaskHandler = Callable[[Dict[str, Any]], None]
+
+# Longest wait between claim attempts while Redis is failing
+MAX_CLAIM_BACKOFF = 30.0
+
+class QueueWorker:
+    """
+    Consumes tasks from one or more queues and runs them on a thread pool.
+
+    Up to concurrency tasks run at once, with up to prefetch more claimed
+    ahead of time so a finished slot is refilled without a Redis round
+    trip. Claims are heartbeated while held, so claim_timeout can be short
+    and work from a dead worker is reclaimed quickly by the reaper. On
+    stop(), running tasks finish and prefetched ones are released back to
+    their queues.
+    """
+
+    def __init__(self, queue_manager: QueueManager, handlers: Dict[str, TaskHandler],
+                 concurrency: int = 4, prefetch: int = 4, claim_timeout: float = 300.0,
+                 poll_interval: float = 1.0):
+        """
+        Args:
+            queue_manager: Queue manager to claim tasks from
+            handlers: Handler per queue name, queues are polled in this order
+            concurrency: Maximum number of tasks running at once
+            prefetch: Extra tasks claimed ahead of free slots
+            claim_timeout: Seconds a claim lasts without a heartbeat
+            poll_interval: Seconds to wait when every queue is empty
+        """
+        self.queue_manager = queue_manager
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.prefetch = prefetch
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.stats = {'completed': 0, 'failed': 0}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._prefetched = deque()
+        self._running = {}
+        # IDs of every claim this worker holds, read by the heartbeat thread
+        self._held = set()
+
+    def stop(self) -> None:
+        """Stop claiming work, safe to call from a signal handler"""
+        self._stop.set()
+
+    def run(self) -> None:
+        """Process tasks until stop() is called, then drain and return"""
+        heartbeat = threading.Thread(target=self._heartbeat, name='queue-heartbeat', daemon=True)
+        heartbeat.start()
+
+        self.logger.info(
+            f"Worker consuming {list(self.handlers)} with concurrency {self.concurrency}, "
+            f"prefetch {self.prefetch}"
+        )
+
+        backoff = self.poll_interval
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                while not self._stop.is_set():
+                    try:
+                        self._fill_prefetch()
+                    except redis.RedisError as e:
+                        self.logger.error(f"Claiming tasks failed, retrying in {backoff:.1f}s: {str(e)}")
+                        self._stop.wait(backoff)
+                        backoff = min(backoff * 2, MAX_CLAIM_BACKOFF)
+                        continue
+                    backoff = self.poll_interval
+
+                    while self._prefetched and len(self._running) < self.concurrency:
+                        task = self._prefetched.popleft()
+                        self._running[executor.submit(self._execute, task)] = task
+
+                    if self._running:
+                        done, _ = wait(list(self._running), timeout=self.poll_interval,
+                                       return_when=FIRST_COMPLETED)
+                        for future in done:
+                            del self._running[future]
+                    elif not self.queue_manager.blocking_claims:
+                        self._stop.wait(self.poll_interval)
+
+                # Hand back work that never started, let running tasks finish
+                unstarted = list(self._prefetched)
+                self._prefetched.clear()
+                self.queue_manager.release_tasks(unstarted)
+                self._release_held(unstarted)
+                self.logger.info(f"Draining {len(self._running)} running tasks")
+        finally:
+            # Also ends the heartbeat when the loop above raised
+            self._stop.set()
+            self._running.clear()
+            with self._lock:
+                self._held.clear()
+            heartbeat.join()
+            self.logger.info(f"Worker stopped: {self.stats}")
+
+    def _fill_prefetch(self) -> None:
+        """Claim enough tasks to fill every free slot plus the prefetch buffer"""
+        for queue_name in self.handlers:
+            wanted = self.concurrency + self.prefetch - len(self._running) - len(self._prefetched)
+            if wanted <= 0:
+                return
+            tasks = self.queue_manager.claim_tasks(queue_name, wanted, self.claim_timeout)
+            with self._lock:
+                self._held.update(task['id'] for task in tasks)
+            self._prefetched.extend(tasks)
+
+    def _release_held(self, tasks) -> None:
+        with self._lock:
+            self._held.difference_update(task['id'] for task in tasks)
+
+    def _execute(self, task: Dict[str, Any]) -> None:
+        try:
+            self.handlers[task['type']](task)
+        except Exception as e:
+            self.logger.error(f"Task {task['id']} ({task['type']}) failed: {str(e)}")
+            self.queue_manager.handle_failed_task(task['id'], task, str(e))
+            outcome = 'failed'
+        else:
+            self.queue_manager.complete_task(task['id'], task)
+            outcome = 'completed'
+        finally:
+            self._release_held([task])
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _heartbeat(self) -> None:
+        """Extend every held claim well before it can expire"""
+        interval = self.claim_timeout / 3
+        last_beat = 0.0
+        while True:
+            with self._lock:
+                task_ids = list(self._held)
+            # Keep beating after stop() until the running tasks have drained
+            if self._stop.is_set() and not task_ids:
+                return
+            if time.monotonic() - last_beat >= interval:
+                try:
+                    self.queue_manager.extend_claims(task_ids, self.claim_timeout)
+                except Exception as e:
+                    self.logger.error(f"Heartbeat failed: {str(e)}")
+                last_beat = time.monotonic()
+            time.sleep(min(interval, 1.0))
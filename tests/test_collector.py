@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+import requests
+
+from src.collector.reddit import MeteredRequestor, RedditCollector
+
+
+def make_config(max_workers=2):
+    return SimpleNamespace(
+        client_id='id', client_secret='secret', username='user', password='password',
+        user_agent='Script/1.0 (by /u/user)', requests_per_minute=6000,
+        max_workers=max_workers
+    )
+
+
+@pytest.fixture
+def collector():
+    collector = RedditCollector(make_config(), mock.Mock(), rate_limiter=mock.Mock())
+    yield collector
+    collector.close()
+
+
+def test_every_http_request_takes_a_token(collector):
+    requestor = MeteredRequestor(user_agent='Script/1.0 (by /u/user)',
+                                 before_request=collector._take_request_token)
+
+    collector._local.subreddit = 'python'
+    with mock.patch.object(requests.Session, 'request') as request:
+        requestor.request('GET', 'https://oauth.reddit.com/r/python/new')
+        requestor.request('POST', 'https://oauth.reddit.com/api/morechildren')
+
+    assert request.call_count == 2
+    assert collector.rate_limiter.acquire.call_args_list == [
+        mock.call(subreddit='python'), mock.call(subreddit='python')
+    ]
+
+
+def test_comment_batches_share_one_thread_pool(collector):
+    threads = set()
+
+    def collect_post_comments(post_id, pipeline=None, subreddit_name=None):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.01)
+
+    with mock.patch.object(collector, 'collect_post_comments', side_effect=collect_post_comments):
+        for _ in range(3):
+            collector.collect_comments_for_posts([{'id': 'a'}, {'id': 'b'}])
+
+    # Three batches, but only the collector's two fetch threads
+    assert len(threads) == 2
+    assert all(name.startswith('comment-fetch') for name in threads)
+
+
+def make_post(post_id, created):
+    return SimpleNamespace(
+        id=post_id, created_utc=created.timestamp(), author='someone', title='title',
+        selftext='text', score=1, upvote_ratio=1.0
+    )
+
+
+def test_resume_collects_below_the_checkpoint_and_completes(collector):
+    day = datetime(2024, 1, 1)
+    # Listings are newest first
+    listing = [make_post(f'p{hour}', day + timedelta(hours=hour)) for hour in range(23, -1, -1)]
+    reddit = mock.Mock()
+    reddit.subreddit.return_value.new.return_value = iter(listing)
+    reddit.auth.limits = {}
+    collector._local.reddit = reddit
+    collector.db.batch_insert_posts.return_value = {'inserted': 0, 'updated': 0}
+    start, end = day, day + timedelta(days=1)
+
+    with mock.patch.object(collector, 'get_collection_progress',
+                           return_value={'timestamp': day + timedelta(hours=10), 'post_id': 'p10'}), \
+         mock.patch.object(collector, 'collect_comments_for_posts'), \
+         mock.patch.object(collector, 'update_progress') as update_progress, \
+         mock.patch.object(collector, 'complete_progress') as complete_progress:
+        collector.collect_subreddit_posts('python', start, end, batch_size=5)
+
+    written = [
+        row['id']
+        for call in collector.db.batch_insert_posts.call_args_list
+        for row in call.args[0]
+    ]
+    assert written == [f'p{hour}' for hour in range(10, -1, -1)]
+    # Checkpoints are the oldest committed post and keep the original window
+    assert update_progress.call_args.args[:5] == ('python', day, 'p0', start, end)
+    complete_progress.assert_called_once_with('python', start, end)
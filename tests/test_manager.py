@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from src.queue.manager import QueueConfig, QueueManager
+
+
+def make_queue_manager(types):
+    with mock.patch('redis.Redis') as redis_class:
+        queue_manager = QueueManager({'host': 'localhost', 'port': 6379, 'db': 0})
+    redis_client = redis_class.return_value
+    redis_client.type.side_effect = lambda key: types.get(key, b'none')
+    return queue_manager, redis_client
+
+
+def test_convert_legacy_tasks_converts_hashes_in_batches():
+    queue_manager, redis_client = make_queue_manager({})
+    redis_client.scan_iter.return_value = [b'task:a', b'task:b', b'task:c']
+    queue_manager._convert_script = mock.Mock(side_effect=lambda args: len(args))
+
+    assert queue_manager.convert_legacy_tasks(batch_size=2)['tasks'] == 3
+    redis_client.scan_iter.assert_called_once_with(match='task:*', count=2, _type='hash')
+    assert queue_manager._convert_script.call_args_list == [
+        mock.call(args=['a', 'b']), mock.call(args=['c'])
+    ]
+
+
+def test_convert_legacy_tasks_adopts_old_claims_with_their_deadlines():
+    queue_manager, redis_client = make_queue_manager({'set:processing': b'set'})
+    redis_client.scan_iter.return_value = []
+    redis_client.smembers.return_value = {b'a'}
+    started = datetime(2024, 1, 1, 12, 0)
+    redis_client.mget.return_value = [started.isoformat().encode('utf-8')]
+
+    assert queue_manager.convert_legacy_tasks()['claims'] == 1
+
+    pipe = redis_client.pipeline.return_value
+    deadline = started.replace(tzinfo=timezone.utc).timestamp() + QueueConfig.PROCESSING_TIMEOUT
+    pipe.zadd.assert_called_once_with('zset:processing', {'a': deadline}, nx=True)
+    pipe.delete.assert_called_once_with('set:processing', 'processing:a')
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from src.queue.manager import QueueManager
+from src.queue.metrics import QueueMetrics
+
+
+def test_deferred_updates_are_written_by_the_next_flush():
+    metrics = QueueMetrics(retention=60)
+    with mock.patch('time.time', return_value=600.0):
+        metrics.defer_incr('queue:comments', 'claimed', 2)
+        metrics.defer_observe('queue:comments', 'wait', 3.0)
+
+    pipe = mock.Mock()
+    # A later minute, deferred updates still land in the minute they happened
+    with mock.patch('time.time', return_value=900.0):
+        metrics.flush(pipe)
+
+    assert pipe.mock_calls == [
+        mock.call.hincrby('metrics:queue:comments:10', 'claimed', 2),
+        mock.call.expire('metrics:queue:comments:10', 60),
+        mock.call.hincrby('metrics:queue:comments:10', 'wait:5', 1),
+        mock.call.hincrbyfloat('metrics:queue:comments:10', 'wait_sum', 3.0),
+        mock.call.expire('metrics:queue:comments:10', 60)
+    ]
+
+
+def test_flush_writes_each_update_once():
+    metrics = QueueMetrics()
+    metrics.defer_incr('queue:comments', 'claimed')
+
+    first, second = mock.Mock(), mock.Mock()
+    metrics.flush(first)
+    metrics.flush(second)
+
+    assert first.hincrby.call_count == 1
+    assert not second.mock_calls
+
+
+def test_recording_claims_sends_nothing():
+    with mock.patch('redis.Redis') as redis_class:
+        queue_manager = QueueManager({'host': 'localhost', 'port': 6379, 'db': 0})
+    redis_client = redis_class.return_value
+    redis_client.reset_mock()
+
+    queue_manager._record_claimed('comment_collection', [
+        {'id': 'task-1', 'attempts': 0, 'enqueued_at': '2024-01-01T00:00:00'}
+    ])
+
+    assert not redis_client.mock_calls
@@ -0,0 +1,169 @@
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from unittest import mock
+
+from src.queue.scheduler import FairScheduler, deficit_round_robin
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.redis_client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class FakeRedis:
+    """Just the commands FairScheduler dispatch uses"""
+
+    def __init__(self):
+        self.sets = defaultdict(set)
+        self.lists = defaultdict(list)
+        self.hashes = defaultdict(dict)
+        self.strings = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        return mock.Mock()
+
+    def smembers(self, key):
+        return {member.encode('utf-8') for member in self.sets[key]}
+
+    def sadd(self, key, *members):
+        self.sets[key].update(members)
+
+    def rpush(self, key, *values):
+        self.lists[key].extend(values)
+        return len(self.lists[key])
+
+    def llen(self, key):
+        return len(self.lists[key])
+
+    def lpop(self, key, count):
+        popped, self.lists[key] = self.lists[key][:count], self.lists[key][count:]
+        return popped
+
+    def hgetall(self, key):
+        return {
+            field.encode('utf-8'): str(value).encode('utf-8')
+            for field, value in self.hashes[key].items()
+        }
+
+    def hmget(self, key, *fields):
+        values = [self.hashes[key].get(field) for field in fields]
+        return [str(value).encode('utf-8') if value is not None else None for value in values]
+
+    def hset(self, key, mapping):
+        self.hashes[key].update(mapping)
+
+    def hincrbyfloat(self, key, field, amount):
+        self.hashes[key][field] = self.hashes[key].get(field, 0.0) + amount
+
+    def get(self, key):
+        value = self.strings.get(key)
+        return value.encode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self.strings[key] = value
+
+
+def make_scheduler(subreddit_shares='', max_queue_depth=1):
+    queue_manager = mock.Mock()
+    queue_manager.redis_client = FakeRedis()
+    queue_manager.queues = {'subreddit_collection': 'queue:subreddit_collection'}
+    queue_manager.queue_depth.return_value = 0
+    config = SimpleNamespace(
+        subreddit_shares=subreddit_shares, class_shares='', budget_per_minute=600,
+        max_queue_depth=max_queue_depth
+    )
+    return FairScheduler(queue_manager, config)
+
+
+def dispatched_subreddits(scheduler):
+    counts = Counter()
+    for call in scheduler.queue_manager.enqueue_tasks.call_args_list:
+        counts.update(task['subreddit'] for task in call.args[1])
+    return counts
+
+
+def test_dispatch_rotates_flows_with_room_for_one_task():
+    scheduler = make_scheduler()
+    for subreddit in ('aaa', 'bbb', 'ccc'):
+        scheduler.submit('subreddit_collection', subreddit,
+                         [{'subreddit': subreddit}] * 300)
+
+    for _ in range(300):
+        assert scheduler._dispatch('subreddit_collection') == 1
+
+    assert dispatched_subreddits(scheduler) == {'aaa': 100, 'bbb': 100, 'ccc': 100}
+
+
+def test_dispatch_follows_weights_with_room_for_one_task():
+    scheduler = make_scheduler(subreddit_shares='aaa=2')
+    for subreddit in ('aaa', 'bbb'):
+        scheduler.submit('subreddit_collection', subreddit,
+                         [{'subreddit': subreddit}] * 300)
+
+    for _ in range(300):
+        scheduler._dispatch('subreddit_collection')
+
+    assert dispatched_subreddits(scheduler) == {'aaa': 200, 'bbb': 100}
+
+
+def test_dispatch_stops_at_max_queue_depth():
+    scheduler = make_scheduler(max_queue_depth=10)
+    scheduler.queue_manager.queue_depth.return_value = 10
+    scheduler.submit('subreddit_collection', 'aaa', [{'subreddit': 'aaa'}])
+
+    assert scheduler._dispatch('subreddit_collection') == 0
+    scheduler.queue_manager.enqueue_tasks.assert_not_called()
+
+
+def test_dispatch_holds_api_work_while_budget_is_exhausted():
+    scheduler = make_scheduler(max_queue_depth=10)
+    scheduler.redis_client.hset('sched:budget', mapping={'tokens': -5, 'updated': time.time()})
+    scheduler.submit('subreddit_collection', 'aaa', [{'subreddit': 'aaa'}])
+
+    assert scheduler._dispatch('subreddit_collection') == 0
+    scheduler.queue_manager.enqueue_tasks.assert_not_called()
+
+
+def test_round_robin_splits_by_weight():
+    backlog = {'aaa:collection': 1000, 'bbb:collection': 1000}
+    picks, _ = deficit_round_robin(
+        backlog, {}, {'aaa:collection': 3.0, 'bbb:collection': 1.0}, 400
+    )
+    assert picks == {'aaa:collection': 300, 'bbb:collection': 100}
+
+
+def test_round_robin_gives_unused_share_to_other_flows():
+    backlog = {'aaa:collection': 5, 'bbb:collection': 1000}
+    deficits = {}
+    picks, _ = deficit_round_robin(
+        backlog, deficits, {'aaa:collection': 1.0, 'bbb:collection': 1.0}, 100
+    )
+    assert picks == {'aaa:collection': 5, 'bbb:collection': 95}
+    # An emptied flow doesn't bank credit
+    assert deficits['aaa:collection'] == 0.0
+
+
+def test_round_robin_resumes_at_cursor():
+    weights = {'aaa:collection': 1.0, 'bbb:collection': 1.0, 'ccc:collection': 1.0}
+    backlog = dict.fromkeys(weights, 10)
+    deficits = {}
+    cursor = None
+    served = []
+    for _ in range(6):
+        picks, cursor = deficit_round_robin(backlog, deficits, weights, 1, cursor)
+        served.extend(flow for flow, count in picks.items() if count)
+    assert served == ['aaa:collection', 'bbb:collection', 'ccc:collection'] * 2
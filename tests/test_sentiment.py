@@ -0,0 +1,53 @@
+from unittest import mock
+
+from src.analysis.metrics.sentiment import SentimentAnalyzer
+
+
+def make_analyzer(rows=()):
+    db = mock.MagicMock()
+    cur = db.get_connection.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = list(rows)
+    return SentimentAnalyzer(db), cur
+
+
+def test_claims_count_attempts_and_stop_at_max_attempts():
+    analyzer, cur = make_analyzer()
+    analyzer.get_unprocessed_content()
+
+    sql, params = cur.execute.call_args.args
+    assert 'attempts = q.attempts + 1' in sql
+    assert 'attempts < %(max_attempts)s' in sql
+    assert params['max_attempts'] == 3
+
+
+def test_claimed_rows_without_content_are_deleted():
+    analyzer, cur = make_analyzer([
+        ('post', 'p1', 'hello', 1, False),
+        ('comment', 'c1', None, 1, True),
+        # A post with no body still exists
+        ('post', 'p2', None, 2, False)
+    ])
+
+    with mock.patch('src.analysis.metrics.sentiment.execute_values') as execute_values:
+        content = analyzer.get_unprocessed_content()
+
+    assert [row['content_id'] for row in content] == ['p1', 'p2']
+    assert content[1]['attempts'] == 2
+    sql, keys = execute_values.call_args.args[1:]
+    assert 'DELETE FROM sentiment_pending' in sql
+    assert keys == [('c1', 'comment')]
+
+
+def test_unscored_content_is_left_pending():
+    analyzer, _ = make_analyzer()
+    batch = [
+        {'content_id': 'p1', 'content_type': 'post', 'content': 'a', 'attempts': 1},
+        {'content_id': 'p2', 'content_type': 'post', 'content': 'b', 'attempts': 3}
+    ]
+
+    with mock.patch.object(analyzer, 'store_sentiment_batch') as store, \
+         mock.patch.object(analyzer.logger, 'error') as error:
+        analyzer._store_scored(batch, [{'compound': 0.5}, None])
+
+    assert [result['content_id'] for result in store.call_args.args[0]] == ['p1']
+    assert error.call_args.args[0].endswith('attempt 3/3, giving up')
@@ -0,0 +1,43 @@
+import json
+from unittest import mock
+
+import pytest
+
+from src.analysis.metrics.cache import SentimentCache
+from src.analysis.metrics.scoring import ScoringEngine
+from src.analysis.metrics.sentiment import SentimentAnalyzer
+
+
+def test_shared_keys_are_namespaced_by_engine():
+    redis_client = mock.Mock()
+    redis_client.mget.return_value = [None]
+    vader = SentimentCache(redis_client=redis_client)
+    lexicon = SentimentCache(redis_client=redis_client, engine='lexicon')
+    key = SentimentCache.key('great post')
+
+    vader.put_many({key: {'compound': 0.6}})
+    lexicon.get_many([key])
+
+    pipe = redis_client.pipeline.return_value
+    pipe.set.assert_called_once_with(
+        f'sentiment:vader:{key}', json.dumps({'compound': 0.6}), ex=vader.redis_ttl
+    )
+    redis_client.mget.assert_called_once_with([f'sentiment:lexicon:{key}'])
+
+
+def test_engine_rejects_a_cache_of_another_engine():
+    with pytest.raises(ValueError):
+        ScoringEngine(cache=SentimentCache(engine='lexicon'), engine='vader')
+
+
+def test_analyze_content_uses_the_cache():
+    cache = SentimentCache()
+    analyzer = SentimentAnalyzer(mock.Mock(), cache=cache)
+
+    first = analyzer.analyze_content('great  post')
+    # Same text once whitespace is collapsed
+    second = analyzer.analyze_content(' great post ')
+
+    assert second == first
+    assert cache.stats()['local_hits'] == 1
+    assert cache.stats()['misses'] == 1
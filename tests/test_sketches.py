@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from unittest import mock
+
+import redis
+
+from src.collector.sketches import AuthorSketches
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.redis_client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class FakeRedis:
+    """HyperLogLogs as exact sets, enough to check which keys are used"""
+
+    def __init__(self):
+        self.sketches = defaultdict(set)
+        self.expiry = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pfadd(self, key, *values):
+        before = len(self.sketches[key])
+        self.sketches[key].update(values)
+        return int(len(self.sketches[key]) > before)
+
+    def pfcount(self, *keys):
+        return len(set().union(*(self.sketches.get(key, set()) for key in keys)))
+
+    def pfmerge(self, destination, *keys):
+        self.sketches[destination] = set().union(
+            self.sketches.get(destination, set()),
+            *(self.sketches.get(key, set()) for key in keys)
+        )
+
+    def delete(self, key):
+        self.sketches.pop(key, None)
+
+    def expireat(self, key, when):
+        self.expiry[key] = when
+
+    def expire(self, key, seconds):
+        self.expiry[key] = seconds
+
+
+DAY = datetime(2024, 3, 1)
+
+
+def rows(authors, created=DAY):
+    return [{'author': author, 'created_utc': created} for author in authors]
+
+
+def make_sketches():
+    return AuthorSketches(FakeRedis(), retention_days=30)
+
+
+def test_add_groups_authors_by_subreddit_and_day():
+    sketches = make_sketches()
+    sketches.add('Python', rows(['ann', 'bob']) + rows(['cat'], DAY + timedelta(days=1, hours=5)))
+
+    assert sketches.redis_client.sketches == {
+        'hll:authors:python:20240301': {'ann', 'bob'},
+        'hll:authors:python:20240302': {'cat'}
+    }
+    assert sketches.redis_client.expiry['hll:authors:python:20240301'] == DAY + timedelta(days=31)
+
+
+def test_add_skips_deleted_and_missing_authors():
+    sketches = make_sketches()
+    sketches.add('python', rows(['[deleted]', None, 'ann']) + [{'author': 'bob', 'created_utc': None}])
+
+    assert sketches.count('python', DAY, DAY + timedelta(days=1)) == 1
+
+
+def test_duplicate_authors_count_once():
+    sketches = make_sketches()
+    sketches.add('python', rows(['ann', 'ann', 'bob']))
+    # A retried batch
+    sketches.add('python', rows(['ann', 'bob']))
+    sketches.add('python', rows(['ann'], DAY + timedelta(days=1)))
+
+    assert sketches.count('python', DAY, DAY + timedelta(days=1)) == 2
+    assert sketches.count('python', DAY, DAY + timedelta(days=2)) == 2
+
+
+def test_count_covers_whole_days_in_half_open_range():
+    sketches = make_sketches()
+    for offset, author in enumerate(['ann', 'bob', 'cat']):
+        sketches.add('python', rows([author], DAY + timedelta(days=offset)))
+
+    # Start rounds down to its day, end is exclusive
+    assert sketches.count('python', DAY + timedelta(hours=12), DAY + timedelta(days=2)) == 2
+    assert sketches.count('python', DAY + timedelta(days=1), DAY + timedelta(days=1, hours=1)) == 1
+    assert sketches.count('python', DAY, DAY) == 0
+    assert sketches.daily_counts('python', DAY, DAY + timedelta(days=3)) == {
+        '20240301': 1, '20240302': 1, '20240303': 1
+    }
+
+
+def test_count_unions_subreddits():
+    sketches = make_sketches()
+    sketches.add('python', rows(['ann', 'bob']))
+    sketches.add('rust', rows(['bob', 'cat']))
+
+    assert sketches.count(['python', 'rust'], DAY, DAY + timedelta(days=1)) == 3
+
+
+def test_merge_replaces_destination_with_range_union():
+    sketches = make_sketches()
+    sketches.add('python', rows(['ann']))
+    sketches.add('python', rows(['bob'], DAY + timedelta(days=1)))
+    sketches.add('python', rows(['cat'], DAY + timedelta(days=2)))
+    sketches.redis_client.sketches['hll:dashboard'] = {'stale'}
+
+    count = sketches.merge('hll:dashboard', 'python', DAY, DAY + timedelta(days=2), ttl=600)
+
+    assert count == 2
+    assert sketches.redis_client.sketches['hll:dashboard'] == {'ann', 'bob'}
+    assert sketches.redis_client.expiry['hll:dashboard'] == 600
+
+
+def test_merge_of_empty_range_is_empty():
+    sketches = make_sketches()
+    sketches.redis_client.sketches['hll:dashboard'] = {'stale'}
+
+    assert sketches.merge('hll:dashboard', 'python', DAY, DAY) == 0
+
+
+def test_add_logs_redis_errors():
+    redis_client = mock.Mock()
+    redis_client.pipeline.return_value.execute.side_effect = redis.ConnectionError('down')
+    sketches = AuthorSketches(redis_client)
+
+    # Must not raise, sketches never stop collection
+    sketches.add('python', rows(['ann']))
@@ -0,0 +1,40 @@
+from unittest import mock
+
+import pytest
+
+from src.config import RedisConfig
+from src.queue.factory import create_queue_manager
+
+
+@pytest.fixture(autouse=True)
+def redis_client():
+    with mock.patch('redis.Redis') as redis_class:
+        redis_client = redis_class.return_value
+        redis_client.xautoclaim.return_value = [b'0-0', [], []]
+        yield redis_client
+
+
+def streams_config():
+    return RedisConfig(queue_backend='streams')
+
+
+def test_factory_passes_the_worker_claim_timeout():
+    queue_manager = create_queue_manager(streams_config(), claim_timeout=300)
+    assert queue_manager.claim_timeout == 300
+
+    queue_manager.reap_expired()
+    min_idle_ms = queue_manager.redis_client.xautoclaim.call_args.args[3]
+    assert min_idle_ms == 300000
+
+
+def test_zset_backend_takes_timeouts_per_claim():
+    queue_manager = create_queue_manager(RedisConfig(queue_backend='zset'), claim_timeout=300)
+    assert not hasattr(queue_manager, 'claim_timeout')
+
+
+def test_claim_timeout_mismatch_is_rejected():
+    queue_manager = create_queue_manager(streams_config(), claim_timeout=300)
+    with pytest.raises(ValueError):
+        queue_manager.claim_tasks('comment_collection', 1, timeout=60)
+    with pytest.raises(ValueError):
+        queue_manager.extend_claims(['task-1'], timeout=60)
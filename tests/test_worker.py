@@ -0,0 +1,75 @@
+import threading
+from unittest import mock
+
+import pytest
+import redis
+
+from src.queue.worker import QueueWorker
+
+
+def make_worker(claim_tasks):
+    queue_manager = mock.Mock()
+    queue_manager.blocking_claims = False
+    queue_manager.claim_tasks.side_effect = claim_tasks
+    return QueueWorker(queue_manager, {'comment_collection': mock.Mock()},
+                       claim_timeout=3, poll_interval=0.01)
+
+
+def run_in_thread(worker):
+    errors = []
+
+    def run():
+        try:
+            worker.run()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, errors
+
+
+def test_run_returns_when_the_loop_raises():
+    worker = make_worker(RuntimeError('boom'))
+    thread, errors = run_in_thread(worker)
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert isinstance(errors[0], RuntimeError)
+
+
+def test_run_backs_off_on_redis_errors():
+    attempts = []
+
+    def claim_tasks(queue_name, count, timeout):
+        attempts.append(queue_name)
+        if len(attempts) < 3:
+            raise redis.ConnectionError('connection refused')
+        worker.stop()
+        return [{'id': 'task-1', 'type': 'comment_collection'}]
+
+    worker = make_worker(claim_tasks)
+    thread, errors = run_in_thread(worker)
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert not errors
+    assert len(attempts) == 3
+    # The task claimed once Redis recovered still runs before the drain
+    worker.handlers['comment_collection'].assert_called_once()
+    worker.queue_manager.complete_task.assert_called_once()
+
+
+@pytest.mark.parametrize('outcome', ['completed', 'failed'])
+def test_execute_records_outcome(outcome):
+    worker = make_worker(lambda *args: [])
+    handler = worker.handlers['comment_collection']
+    if outcome == 'failed':
+        handler.side_effect = ValueError('bad task')
+    task = {'id': 'task-1', 'type': 'comment_collection'}
+    worker._held.add('task-1')
+
+    worker._execute(task)
+
+    assert worker.stats[outcome] == 1
+    assert 'task-1' not in worker._held